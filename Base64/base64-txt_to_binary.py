@@ -6,16 +6,135 @@ A production-grade utility that decodes Base64-encoded text files to their origi
 binary format, automatically changing the file extension from .txt to .bin.
 
 Security Note: This script uses atomic file operations to prevent data corruption.
+
+Integrity: Files written by `base64_to_bin.py --checksum` carry the original size
+and SHA-256. They are decoded in a streaming pass that verifies both on the fly
+and refuses to rename the output into place on a mismatch.
 """
 
 import argparse
 import base64
 import binascii
+import hashlib
+import json
 import os
 import sys
 import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterator, Optional, Tuple
+
+CONTAINER_HEADER = "# base64-container: v1"  # Written by base64_to_bin.py --checksum
+CONTAINER_TRAILER = "# sha256:"
+DECODE_BATCH_CHARS = 1024 * 1024  # Text consumed per streaming decode step
+PROGRESS_THRESHOLD = 32 * 1024 * 1024  # Show a progress line for inputs >= 32MB
+PROGRESS_INTERVAL = 0.5  # Seconds between progress redraws
+
+
+class ConversionStats:
+    """
+    Instrumentation for one conversion run.
+    
+    Accumulates wall-clock time per phase (validate, read, transform, checksum,
+    write, fsync, rename), counts bytes in and out, and draws a rate-limited
+    progress line on stderr for large inputs.
+    """
+    
+    def __init__(self, total_bytes: int = 0, show_progress: bool = False) -> None:
+        self.phases: Dict[str, float] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.total_bytes = total_bytes
+        self.show_progress = show_progress
+        self._started = time.perf_counter()
+        self._last_progress = 0.0
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block and adds it to the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+    
+    def progress(self, force: bool = False) -> None:
+        """Redraws the progress line at most every PROGRESS_INTERVAL seconds."""
+        if not self.show_progress or not self.total_bytes:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        
+        done = min(self.bytes_read, self.total_bytes)
+        elapsed = now - self._started
+        print(
+            f"\r⏳ {done / self.total_bytes:6.1%}  {done:,}/{self.total_bytes:,} bytes  "
+            f"{_format_rate(done, elapsed)}",
+            end='\n' if force else '',
+            file=sys.stderr,
+            flush=True
+        )
+    
+    def as_dict(self) -> Dict[str, object]:
+        elapsed = time.perf_counter() - self._started
+        phase_bytes = {'read': self.bytes_read, 'transform': self.bytes_read,
+                       'checksum': self.bytes_read, 'write': self.bytes_written}
+        return {
+            'elapsed_seconds': round(elapsed, 6),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'throughput_bytes_per_sec': round(self.bytes_read / elapsed, 1) if elapsed > 0 else None,
+            'phases': {
+                name: {
+                    'seconds': round(seconds, 6),
+                    'bytes_per_sec': (
+                        round(phase_bytes[name] / seconds, 1)
+                        if name in phase_bytes and seconds > 0 else None
+                    ),
+                }
+                for name, seconds in self.phases.items()
+            },
+        }
+    
+    def print_summary(self) -> None:
+        report = self.as_dict()
+        print("⏱️  Phase timings:")
+        for name, phase in report['phases'].items():
+            rate = phase['bytes_per_sec']
+            rate_text = f"  {_format_rate(rate, 1.0)}" if rate is not None else ""
+            print(f"   {name:<10} {phase['seconds']:9.4f}s{rate_text}")
+        print(
+            f"   {'total':<10} {report['elapsed_seconds']:9.4f}s  "
+            f"{_format_rate(self.bytes_read, report['elapsed_seconds'])}"
+        )
+
+
+def _format_rate(num_bytes: float, seconds: float) -> str:
+    """Human-readable throughput, e.g. '412.7 MB/s'."""
+    if seconds <= 0:
+        return "n/a"
+    rate = num_bytes / seconds
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} GB/s"
+
+
+def write_stats_json(report: Dict[str, object], destination: str) -> Optional[str]:
+    """Writes the stats report as JSON to a file, or to stdout when destination is '-'."""
+    try:
+        text = json.dumps(report, indent=2)
+        if destination == '-':
+            print(text)
+        else:
+            Path(destination).write_text(text + '\n', encoding='utf-8')
+        return None
+    except OSError as e:
+        return f"Cannot write stats JSON to {destination}: {e}"
 
 
 def validate_input_path(input_path: Path) -> Tuple[bool, Optional[str]]:
@@ -65,22 +184,30 @@ def construct_output_path(input_path: Path, force: bool = False) -> Tuple[Option
     return output_path, None
 
 
-def read_base64_file(file_path: Path, verbose: bool = False) -> Tuple[Optional[bytes], Optional[str]]:
+def read_base64_file(
+    file_path: Path,
+    verbose: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Tuple[Optional[bytes], Optional[str]]:
     """
     Reads and validates Base64 content from a text file.
     
     Returns (decoded_bytes, error_message) with robust error handling.
     """
+    stats = stats or ConversionStats()
     try:
         # Read with UTF-8 and replace any malformed characters
-        content = file_path.read_text(encoding='utf-8', errors='replace')
+        with stats.phase('read'):
+            content = file_path.read_text(encoding='utf-8', errors='replace')
+        stats.bytes_read += len(content)
         
         if verbose:
             print(f"📄 Read {len(content)} characters from {file_path}")
         
         # Clean whitespace that might be present (newlines, spaces)
         # This is common in formatted Base64 text files
-        cleaned_content = ''.join(content.split())
+        with stats.phase('transform'):
+            cleaned_content = ''.join(content.split())
         
         if not cleaned_content:
             return None, "Input file is empty after whitespace removal"
@@ -89,7 +216,8 @@ def read_base64_file(file_path: Path, verbose: bool = False) -> Tuple[Optional[b
         # This provides clearer error messages
         try:
             # Validate=True raises binascii.Error for invalid characters
-            decoded_data = base64.b64decode(cleaned_content, validate=True)
+            with stats.phase('transform'):
+                decoded_data = base64.b64decode(cleaned_content, validate=True)
         except binascii.Error as e:
             return None, f"Invalid Base64 data: {e}"
         
@@ -104,12 +232,162 @@ def read_base64_file(file_path: Path, verbose: bool = False) -> Tuple[Optional[b
         return None, f"Unexpected error reading file: {e}"
 
 
-def write_binary_atomic(data: bytes, output_path: Path, verbose: bool = False) -> Optional[str]:
+def read_container_header(file_path: Path) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Checks whether the input is a checksum container.
+    
+    Returns (expected_size, error_message); expected_size is None for plain Base64 files.
+    """
+    try:
+        with file_path.open('r', encoding='utf-8', errors='replace') as f:
+            first_line = f.readline().strip()
+    except Exception as e:
+        return None, f"Unexpected error reading file: {e}"
+    
+    if not first_line.startswith(CONTAINER_HEADER):
+        return None, None
+    
+    fields = dict(
+        field.split('=', 1) for field in first_line[len(CONTAINER_HEADER):].split() if '=' in field
+    )
+    try:
+        expected_size = int(fields['size'])
+    except (KeyError, ValueError):
+        return None, f"Malformed checksum container header: {first_line!r}"
+    
+    if expected_size < 0:
+        return None, f"Malformed checksum container header: {first_line!r}"
+    
+    return expected_size, None
+
+
+def decode_container_atomic(
+    file_path: Path,
+    output_path: Path,
+    expected_size: int,
+    verbose: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Streams a checksum container to binary, verifying size and SHA-256 as it decodes.
+    
+    Decoded data goes to a temporary file next to output_path; it is only renamed
+    into place once the trailer digest and the byte count both match.
+    Returns (decoded_size, error_message).
+    """
+    sha256 = hashlib.sha256()
+    decoded_size = 0
+    expected_digest = None
+    pending = ''
+    padded = False
+    temp_path = None
+    stats = stats or ConversionStats()
+    
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with file_path.open('r', encoding='utf-8', errors='replace') as src, \
+                tempfile.NamedTemporaryFile(mode='wb', dir=output_path.parent, delete=False) as temp_file:
+            temp_path = Path(temp_file.name)
+            stats.bytes_read += len(src.readline())  # Header already parsed by read_container_header()
+            
+            while True:
+                with stats.phase('read'):
+                    lines = src.readlines(DECODE_BATCH_CHARS)
+                if not lines:
+                    break
+                stats.bytes_read += sum(map(len, lines))
+                
+                with stats.phase('transform'):
+                    body = []
+                    for line in lines:
+                        stripped = line.strip()
+                        if expected_digest is not None:
+                            if stripped:
+                                return None, "Unexpected data after checksum trailer"
+                            continue
+                        if stripped.startswith(CONTAINER_TRAILER):
+                            expected_digest = stripped[len(CONTAINER_TRAILER):].strip().lower()
+                            continue
+                        body.append(stripped)
+                    
+                    # Decode whole 4-character quanta as they arrive; carry the remainder
+                    pending += ''.join(''.join(body).split())
+                    usable = len(pending) - len(pending) % 4
+                    if not usable:
+                        continue
+                    if padded:
+                        return None, "Invalid Base64 data: padding before end of data"
+                    
+                    block, pending = pending[:usable], pending[usable:]
+                    try:
+                        data = base64.b64decode(block, validate=True)
+                    except binascii.Error as e:
+                        return None, f"Invalid Base64 data: {e}"
+                    padded = block.endswith('=')
+                
+                with stats.phase('checksum'):
+                    sha256.update(data)
+                with stats.phase('write'):
+                    temp_file.write(data)
+                decoded_size += len(data)
+                stats.bytes_written += len(data)
+                stats.progress()
+            stats.progress(force=True)
+            
+            if expected_digest is None:
+                return None, "Checksum trailer missing: input is truncated"
+            if pending:
+                return None, "Invalid Base64 data: incomplete final quantum"
+            
+            with stats.phase('write'):
+                temp_file.flush()
+            with stats.phase('fsync'):
+                os.fsync(temp_file.fileno())
+        
+        if verbose:
+            print(f"🔍 Decoded {decoded_size:,} bytes, verifying against container checksum")
+        
+        if decoded_size != expected_size:
+            return None, f"Size mismatch: expected {expected_size:,} bytes, decoded {decoded_size:,}"
+        
+        actual_digest = sha256.hexdigest()
+        if actual_digest != expected_digest:
+            return None, f"SHA-256 mismatch: expected {expected_digest}, got {actual_digest}"
+        
+        with stats.phase('rename'):
+            os.replace(temp_path, output_path)
+        temp_path = None
+        
+        if verbose:
+            print(f"✅ Checksum verified, atomically moved to: {output_path}")
+        
+        return decoded_size, None
+    
+    except PermissionError:
+        return None, f"Permission denied: cannot write to {output_path}"
+    except OSError as e:
+        return None, f"OS error during file write: {e}"
+    except Exception as e:
+        return None, f"Unexpected error decoding container: {e}"
+    finally:
+        if temp_path is not None and temp_path.exists():
+            temp_path.unlink(missing_ok=True)
+
+
+def write_binary_atomic(
+    data: bytes,
+    output_path: Path,
+    verbose: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Optional[str]:
     """
     Writes binary data atomically using temporary file and rename.
     
     Prevents data corruption if script is interrupted during write.
+    The temp file is fsynced before the rename.
     """
+    stats = stats or ConversionStats()
     try:
         # Ensure parent directory exists
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -117,13 +395,20 @@ def write_binary_atomic(data: bytes, output_path: Path, verbose: bool = False) -
         # Write to temp file in same directory for atomic rename
         with tempfile.NamedTemporaryFile(mode='wb', dir=output_path.parent, delete=False) as temp_file:
             temp_path = Path(temp_file.name)
-            temp_file.write(data)
+            with stats.phase('write'):
+                temp_file.write(data)
+                temp_file.flush()
+            stats.bytes_written += len(data)
+            
+            with stats.phase('fsync'):
+                os.fsync(temp_file.fileno())
             
             if verbose:
                 print(f"💾 Wrote {len(data)} bytes to temporary file: {temp_path}")
         
         # Atomic replace (works on both Unix and Windows)
-        os.replace(temp_path, output_path)
+        with stats.phase('rename'):
+            os.replace(temp_path, output_path)
         
         if verbose:
             print(f"✅ Atomically moved to: {output_path}")
@@ -169,6 +454,9 @@ def main(argv: Optional[list[str]] = None) -> int:
   # Verbose output for debugging
   python base64_to_bin.py encoded.txt -v
   
+  # Per-phase timings and throughput as JSON (use - for stdout)
+  python base64_to_bin.py encoded.txt --stats-json stats.json
+  
   # Using with uv
   uv run base64_to_bin.py encoded.txt
         """
@@ -192,53 +480,96 @@ def main(argv: Optional[list[str]] = None) -> int:
         help='Enable detailed progress output'
     )
     
+    parser.add_argument(
+        '--stats-json',
+        metavar='PATH',
+        help="Write per-phase timings and throughput as JSON to PATH ('-' for stdout)"
+    )
+    
     args = parser.parse_args(argv)
+    stats = ConversionStats()
     
     # Phase 1: Input Validation
     if args.verbose:
         print(f"🔍 Validating input: {args.input_file}")
     
-    is_valid, error_msg = validate_input_path(args.input_file)
+    with stats.phase('validate'):
+        is_valid, error_msg = validate_input_path(args.input_file)
     if not is_valid:
         print(f"❌ Error: {error_msg}", file=sys.stderr)
         return 2
     
+    stats.total_bytes = args.input_file.stat().st_size
+    stats.show_progress = stats.total_bytes >= PROGRESS_THRESHOLD and sys.stderr.isatty()
+    
     # Phase 2: Output Path Construction
-    output_path, error_msg = construct_output_path(args.input_file, args.force)
+    with stats.phase('validate'):
+        output_path, error_msg = construct_output_path(args.input_file, args.force)
     if error_msg:
         return 1
     
     if args.verbose:
         print(f"📂 Output will be written to: {output_path}")
     
-    # Phase 3: Read and Decode
-    if args.verbose:
-        print("⏳ Reading and decoding Base64 content...")
-    
-    decoded_data, error_msg = read_base64_file(args.input_file, args.verbose)
+    with stats.phase('validate'):
+        expected_size, error_msg = read_container_header(args.input_file)
     if error_msg:
         print(f"❌ Error: {error_msg}", file=sys.stderr)
         return 1
     
-    # Phase 4: Atomic Write
-    if args.verbose:
-        print("💿 Writing binary data...")
-    
-    error_msg = write_binary_atomic(decoded_data, output_path, args.verbose)
-    if error_msg:
-        print(f"❌ Error: {error_msg}", file=sys.stderr)
-        return 1
+    if expected_size is not None:
+        # Phase 3+4: Streaming decode with integrity verification
+        if args.verbose:
+            print(f"🔏 Checksum container detected ({expected_size:,} bytes expected)")
+        
+        decoded_size, error_msg = decode_container_atomic(
+            args.input_file, output_path, expected_size, args.verbose, stats
+        )
+        if error_msg:
+            print(f"❌ Error: {error_msg}", file=sys.stderr)
+            return 1
+    else:
+        # Phase 3: Read and Decode
+        if args.verbose:
+            print("⏳ Reading and decoding Base64 content...")
+        
+        decoded_data, error_msg = read_base64_file(args.input_file, args.verbose, stats)
+        if error_msg:
+            print(f"❌ Error: {error_msg}", file=sys.stderr)
+            return 1
+        
+        # Phase 4: Atomic Write
+        if args.verbose:
+            print("💿 Writing binary data...")
+        
+        error_msg = write_binary_atomic(decoded_data, output_path, args.verbose, stats)
+        if error_msg:
+            print(f"❌ Error: {error_msg}", file=sys.stderr)
+            return 1
+        decoded_size = len(decoded_data)
     
     # Success Summary
-    compression_ratio = len(decoded_data) / args.input_file.stat().st_size
+    compression_ratio = decoded_size / args.input_file.stat().st_size
     print(
         f"✅ Successfully converted: {args.input_file}\n"
         f"   → {output_path}\n"
         f"   Input size: {args.input_file.stat().st_size:,} bytes\n"
-        f"   Output size: {len(decoded_data):,} bytes\n"
+        f"   Output size: {decoded_size:,} bytes\n"
         f"   Compression ratio: {compression_ratio:.2f}x"
+        + ("\n   Integrity: size and SHA-256 verified" if expected_size is not None else "")
     )
     
+    if args.verbose:
+        stats.print_summary()
+    
+    if args.stats_json:
+        report = {'tool': 'base64_to_bin', 'input': str(args.input_file),
+                  'output': str(output_path), **stats.as_dict()}
+        error_msg = write_stats_json(report, args.stats_json)
+        if error_msg:
+            print(f"❌ Error: {error_msg}", file=sys.stderr)
+            return 1
+    
     return 0
 
 
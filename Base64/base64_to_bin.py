@@ -9,21 +9,161 @@ Security Note: Implements heuristic detection to warn if input appears to be tex
 preventing user error.
 
 RFC 2045 Compliance: Base64 output is wrapped at 76 characters per line.
+
+Integrity: With --checksum the output is wrapped in a small container - a
+`# base64-container:` header carrying the original size and a `# sha256:`
+trailer computed while the input is read - which the decoder verifies in a
+single streaming pass.
+
+Resumability: With --resume the output is written in fsynced, line-aligned
+segments tracked by a journal next to the partial file, so an interrupted
+multi-GB run continues from its last verified segment instead of from zero.
 """
 
 import argparse
 import base64
+import hashlib
+import json
 import os
 import sys
 import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # Configuration constants
 LARGE_FILE_THRESHOLD = 100 * 1024 * 1024  # 100MB
-CHUNK_SIZE = 64 * 1024  # 64KB chunks for streaming
 BASE64_LINE_LENGTH = 76  # RFC 2045 standard
+BASE64_LINE_BYTES = 57  # Raw bytes encoded into one 76-character line
+CHUNK_SIZE = BASE64_LINE_BYTES * 1024  # ~57KB chunks: whole lines, no mid-stream padding
 TEXT_DETECTION_THRESHOLD = 0.95  # 95% printable ASCII = likely text file
+CONTAINER_HEADER = "# base64-container: v1"  # '#' is outside the Base64 alphabet
+CONTAINER_TRAILER = "# sha256:"
+PROGRESS_THRESHOLD = 32 * 1024 * 1024  # Show a progress line for inputs >= 32MB
+PROGRESS_INTERVAL = 0.5  # Seconds between progress redraws
+SEGMENT_LINES = 256 * 1024  # Base64 lines per resumable segment
+SEGMENT_BYTES = BASE64_LINE_BYTES * SEGMENT_LINES  # ~14MB of input per segment
+SEGMENT_OUTPUT_BYTES = (BASE64_LINE_LENGTH + 1) * SEGMENT_LINES  # ~19MB of output per segment
+PARTIAL_SUFFIX = '.partial'
+JOURNAL_SUFFIX = '.journal'
+
+
+class StreamDigest:
+    """SHA-256 and byte count of the original binary, updated chunk by chunk while reading."""
+
+    def __init__(self) -> None:
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk: bytes) -> None:
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+
+
+class ConversionStats:
+    """
+    Instrumentation for one conversion run.
+    
+    Accumulates wall-clock time per phase (validate, read, transform, checksum,
+    write, fsync, rename, and verify when resuming), counts bytes in and out,
+    and draws a rate-limited progress line on stderr for large inputs.
+    """
+    
+    def __init__(self, total_bytes: int = 0, show_progress: bool = False) -> None:
+        self.phases: Dict[str, float] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.total_bytes = total_bytes
+        self.show_progress = show_progress
+        self._started = time.perf_counter()
+        self._last_progress = 0.0
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times the enclosed block and adds it to the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+    
+    def progress(self, force: bool = False) -> None:
+        """Redraws the progress line at most every PROGRESS_INTERVAL seconds."""
+        if not self.show_progress or not self.total_bytes:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        
+        done = min(self.bytes_read, self.total_bytes)
+        elapsed = now - self._started
+        print(
+            f"\r⏳ {done / self.total_bytes:6.1%}  {done:,}/{self.total_bytes:,} bytes  "
+            f"{_format_rate(done, elapsed)}",
+            end='\n' if force else '',
+            file=sys.stderr,
+            flush=True
+        )
+    
+    def as_dict(self) -> Dict[str, object]:
+        elapsed = time.perf_counter() - self._started
+        phase_bytes = {'read': self.bytes_read, 'transform': self.bytes_read,
+                       'checksum': self.bytes_read, 'write': self.bytes_written}
+        return {
+            'elapsed_seconds': round(elapsed, 6),
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'throughput_bytes_per_sec': round(self.bytes_read / elapsed, 1) if elapsed > 0 else None,
+            'phases': {
+                name: {
+                    'seconds': round(seconds, 6),
+                    'bytes_per_sec': (
+                        round(phase_bytes[name] / seconds, 1)
+                        if name in phase_bytes and seconds > 0 else None
+                    ),
+                }
+                for name, seconds in self.phases.items()
+            },
+        }
+    
+    def print_summary(self) -> None:
+        report = self.as_dict()
+        print("⏱️  Phase timings:")
+        for name, phase in report['phases'].items():
+            rate = phase['bytes_per_sec']
+            rate_text = f"  {_format_rate(rate, 1.0)}" if rate is not None else ""
+            print(f"   {name:<10} {phase['seconds']:9.4f}s{rate_text}")
+        print(
+            f"   {'total':<10} {report['elapsed_seconds']:9.4f}s  "
+            f"{_format_rate(self.bytes_read, report['elapsed_seconds'])}"
+        )
+
+
+def _format_rate(num_bytes: float, seconds: float) -> str:
+    """Human-readable throughput, e.g. '412.7 MB/s'."""
+    if seconds <= 0:
+        return "n/a"
+    rate = num_bytes / seconds
+    for unit in ('B/s', 'KB/s', 'MB/s'):
+        if rate < 1024:
+            return f"{rate:.1f} {unit}"
+        rate /= 1024
+    return f"{rate:.1f} GB/s"
+
+
+def write_stats_json(report: Dict[str, object], destination: str) -> Optional[str]:
+    """Writes the stats report as JSON to a file, or to stdout when destination is '-'."""
+    try:
+        text = json.dumps(report, indent=2)
+        if destination == '-':
+            print(text)
+        else:
+            Path(destination).write_text(text + '\n', encoding='utf-8')
+        return None
+    except OSError as e:
+        return f"Cannot write stats JSON to {destination}: {e}"
 
 
 def validate_input_path(input_path: Path) -> Tuple[bool, Optional[str]]:
@@ -68,7 +208,8 @@ def _detect_text_content(file_path: Path, sample_size: int = 1024) -> float:
     Heuristic detection: returns ratio of printable ASCII characters in first sample_size bytes.
     """
     try:
-        sample = file_path.read_bytes()[:sample_size]
+        with file_path.open('rb') as f:
+            sample = f.read(sample_size)
         if not sample:
             return 0.0
         
@@ -102,20 +243,36 @@ def construct_output_path(input_path: Path, force: bool = False) -> Tuple[Option
     return output_path, None
 
 
-def encode_file_to_base64(input_path: Path, verbose: bool = False) -> Tuple[Optional[bytes], Optional[str]]:
+def encode_file_to_base64(
+    input_path: Path,
+    verbose: bool = False,
+    checksum: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Tuple[Optional[bytes], Optional[str]]:
     """
     Encodes binary file to RFC 2045 compliant Base64 text.
     
     Returns: (encoded_bytes, error_message)
     Strategy: Small files → read all; Large files → chunked processing
+    With checksum=True the SHA-256 is computed on the same read and the
+    result is wrapped in a checksum container.
     """
     file_size = input_path.stat().st_size
+    digest = StreamDigest() if checksum else None
+    stats = stats or ConversionStats()
     
     try:
         if file_size < LARGE_FILE_THRESHOLD:
-            return _encode_small_file(input_path, verbose)
+            encoded_data, error_msg = _encode_small_file(input_path, verbose, digest, stats)
         else:
-            return _encode_large_file(input_path, verbose)
+            encoded_data, error_msg = _encode_large_file(input_path, verbose, digest, stats)
+        
+        if error_msg or digest is None:
+            return encoded_data, error_msg
+        
+        with stats.phase('transform'):
+            container = wrap_checksum_container(encoded_data, digest, verbose)
+        return container, None
     
     except MemoryError:
         return None, "Memory error: file too large to process. Use a machine with more RAM."
@@ -125,18 +282,31 @@ def encode_file_to_base64(input_path: Path, verbose: bool = False) -> Tuple[Opti
         return None, f"Unexpected error during encoding: {e}"
 
 
-def _encode_small_file(input_path: Path, verbose: bool) -> Tuple[bytes, Optional[str]]:
+def _encode_small_file(
+    input_path: Path,
+    verbose: bool,
+    digest: Optional[StreamDigest] = None,
+    stats: Optional[ConversionStats] = None
+) -> Tuple[bytes, Optional[str]]:
     """Optimized path for files < 100MB: read entire file into memory."""
+    stats = stats or ConversionStats()
     if verbose:
         print(f"📄 Reading entire file ({input_path.stat().st_size:,} bytes)...")
     
-    binary_data = input_path.read_bytes()
+    with stats.phase('read'):
+        binary_data = input_path.read_bytes()
+    stats.bytes_read += len(binary_data)
+    
+    if digest is not None:
+        with stats.phase('checksum'):
+            digest.update(binary_data)
     
     if verbose:
         print(f"🔐 Encoding to Base64...")
     
     # Encode and wrap at 76 characters per RFC 2045
-    encoded_lines = base64.encodebytes(binary_data).decode('ascii')
+    with stats.phase('transform'):
+        encoded_lines = base64.encodebytes(binary_data).decode('ascii')
     
     if verbose:
         line_count = len(encoded_lines.splitlines())
@@ -145,13 +315,22 @@ def _encode_small_file(input_path: Path, verbose: bool) -> Tuple[bytes, Optional
     return encoded_lines.encode('utf-8'), None
 
 
-def _encode_large_file(input_path: Path, verbose: bool) -> Tuple[bytes, Optional[str]]:
+def _encode_large_file(
+    input_path: Path,
+    verbose: bool,
+    digest: Optional[StreamDigest] = None,
+    stats: Optional[ConversionStats] = None
+) -> Tuple[bytes, Optional[str]]:
     """
-    Streaming path for large files: processes in 64KB chunks.
+    Streaming path for large files: processes in ~57KB chunks.
+    
+    CHUNK_SIZE is a multiple of 3 (and of the 57-byte line), so per-chunk
+    Base64 output concatenates without padding in the middle of the stream.
     
     Note: This builds the complete output in memory due to Base64 padding requirements.
     For files >1GB, a fully streaming solution would require custom buffering logic.
     """
+    stats = stats or ConversionStats()
     if verbose:
         print(f"📄 Large file detected. Processing in {CHUNK_SIZE // 1024}KB chunks...")
     
@@ -159,19 +338,28 @@ def _encode_large_file(input_path: Path, verbose: bool) -> Tuple[bytes, Optional
     
     with input_path.open('rb') as f:
         while True:
-            chunk = f.read(CHUNK_SIZE)
+            with stats.phase('read'):
+                chunk = f.read(CHUNK_SIZE)
             if not chunk:
                 break
+            stats.bytes_read += len(chunk)
+            if digest is not None:
+                with stats.phase('checksum'):
+                    digest.update(chunk)
             # Process final chunk with proper padding
-            encoded_chunk = base64.b64encode(chunk).decode('ascii')
+            with stats.phase('transform'):
+                encoded_chunk = base64.b64encode(chunk).decode('ascii')
             encoded_chunks.append(encoded_chunk)
+            stats.progress()
+    stats.progress(force=True)
     
     # Join and format according to RFC 2045
-    raw_b64 = ''.join(encoded_chunks)
-    wrapped_lines = '\n'.join(
-        raw_b64[i:i + BASE64_LINE_LENGTH] 
-        for i in range(0, len(raw_b64), BASE64_LINE_LENGTH)
-    )
+    with stats.phase('transform'):
+        raw_b64 = ''.join(encoded_chunks)
+        wrapped_lines = '\n'.join(
+            raw_b64[i:i + BASE64_LINE_LENGTH] 
+            for i in range(0, len(raw_b64), BASE64_LINE_LENGTH)
+        )
     
     if verbose:
         print(f"✂️  Wrapped into {wrapped_lines.count(chr(10)) + 1} lines of Base64 text")
@@ -179,13 +367,43 @@ def _encode_large_file(input_path: Path, verbose: bool) -> Tuple[bytes, Optional
     return wrapped_lines.encode('utf-8'), None
 
 
-def write_text_atomic(data: bytes, output_path: Path, verbose: bool = False) -> Optional[str]:
+def wrap_checksum_container(encoded_data: bytes, digest: StreamDigest, verbose: bool = False) -> bytes:
+    """
+    Wraps encoded Base64 text in the checksum container.
+    
+    Layout:
+        # base64-container: v1 size=<original bytes>
+        <RFC 2045 Base64 lines>
+        # sha256: <hex digest of original bytes>
+    """
+    if encoded_data and not encoded_data.endswith(b'\n'):
+        encoded_data += b'\n'
+    
+    sha256_hex = digest.sha256.hexdigest()
+    header = f"{CONTAINER_HEADER} size={digest.size}\n".encode('ascii')
+    trailer = f"{CONTAINER_TRAILER} {sha256_hex}\n".encode('ascii')
+    
+    if verbose:
+        print(f"🔏 Embedded size {digest.size:,} and SHA-256 {sha256_hex}")
+    
+    return header + encoded_data + trailer
+
+
+def write_text_atomic(
+    data: bytes,
+    output_path: Path,
+    verbose: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Optional[str]:
     """
     Writes text data atomically using temporary file and rename.
     
     Prevents data corruption and ensures file appears only when complete.
+    The temp file is fsynced before the rename so the rename never exposes
+    a file whose contents are still only in the page cache.
     """
     temp_path = None
+    stats = stats or ConversionStats()
     
     try:
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -198,7 +416,13 @@ def write_text_atomic(data: bytes, output_path: Path, verbose: bool = False) ->
             delete=False
         ) as temp_file:
             temp_path = Path(temp_file.name)
-            temp_file.write(data)
+            with stats.phase('write'):
+                temp_file.write(data)
+                temp_file.flush()
+            stats.bytes_written += len(data)
+            
+            with stats.phase('fsync'):
+                os.fsync(temp_file.fileno())
             
             if verbose:
                 print(f"💾 Wrote {len(data):,} bytes to temporary file: {temp_path}")
@@ -209,7 +433,8 @@ def write_text_atomic(data: bytes, output_path: Path, verbose: bool = False) ->
             return "Failed to write data: temp file is empty"
         
         # Atomic rename (overwrites if exists, atomic on POSIX)
-        os.replace(temp_path, output_path)
+        with stats.phase('rename'):
+            os.replace(temp_path, output_path)
         
         if verbose:
             print(f"✅ Atomically renamed to: {output_path}")
@@ -232,6 +457,190 @@ def write_text_atomic(data: bytes, output_path: Path, verbose: bool = False) ->
         return f"Unexpected error writing file: {e}"
 
 
+def _resume_paths(output_path: Path) -> Tuple[Path, Path]:
+    """Deterministic partial-output and journal paths, so a rerun can find them."""
+    partial_path = output_path.with_name(output_path.name + PARTIAL_SUFFIX)
+    journal_path = output_path.with_name(output_path.name + PARTIAL_SUFFIX + JOURNAL_SUFFIX)
+    return partial_path, journal_path
+
+
+def _write_journal(journal_path: Path, journal: Dict[str, object]) -> None:
+    """
+    Replaces the journal atomically; the segment data it describes is already fsynced.
+
+    The temp file is fsynced before the rename, as in write_text_atomic, so a crash
+    can never leave an empty or truncated journal in place of the previous one.
+    """
+    temp_path = journal_path.with_name(journal_path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as temp_file:
+        temp_file.write(json.dumps(journal))
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+    os.replace(temp_path, journal_path)
+
+
+def _load_resume_point(
+    input_path: Path,
+    partial_path: Path,
+    journal_path: Path,
+    identity: Dict[str, object],
+    verbose: bool = False
+) -> Tuple[int, List[str]]:
+    """
+    Finds the last verified segment of an interrupted run.
+    
+    Returns (header_length, segment_digests) for the segments that can be kept;
+    an empty list means start from scratch. A journal written for a different
+    input, input version, segment size or checksum mode is discarded. Segments
+    are re-hashed from the partial file, newest first, until one matches.
+    """
+    if not journal_path.exists() or not partial_path.exists():
+        return 0, []
+    
+    try:
+        journal = json.loads(journal_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        print("⚠️  Resume journal is unreadable; starting from the beginning.", file=sys.stderr)
+        return 0, []
+    
+    if any(journal.get(key) != value for key, value in identity.items()):
+        print(f"⚠️  Resume journal does not match {input_path}; starting from the beginning.",
+              file=sys.stderr)
+        return 0, []
+    
+    header_length = journal.get('header_length', 0)
+    digests = list(journal.get('segments', []))
+    partial_size = partial_path.stat().st_size
+    
+    with partial_path.open('rb') as f:
+        while digests:
+            segment_end = header_length + len(digests) * SEGMENT_OUTPUT_BYTES
+            if partial_size >= segment_end:
+                f.seek(segment_end - SEGMENT_OUTPUT_BYTES)
+                if hashlib.sha256(f.read(SEGMENT_OUTPUT_BYTES)).hexdigest() == digests[-1]:
+                    break
+            if verbose:
+                print(f"⚠️  Segment {len(digests)} failed verification; discarding it")
+            digests.pop()
+    
+    return header_length, digests
+
+
+def encode_file_resumable(
+    input_path: Path,
+    output_path: Path,
+    checksum: bool = False,
+    verbose: bool = False,
+    stats: Optional[ConversionStats] = None
+) -> Optional[str]:
+    """
+    Encodes in checkpointed segments that survive interruption.
+    
+    Output is appended to `<output>.partial` one segment at a time. Each segment
+    is SEGMENT_LINES full Base64 lines (57 bytes in, 77 bytes out per line), so
+    segment boundaries map exactly between input and output offsets. After each
+    segment is fsynced, its SHA-256 is recorded in `<output>.partial.journal`.
+    Rerunning with --resume truncates back to the last verified segment and
+    continues from there; the final rename only happens once everything is written.
+    With --checksum the input prefix that was already encoded is re-hashed on resume.
+    """
+    stats = stats or ConversionStats()
+    partial_path, journal_path = _resume_paths(output_path)
+    input_stat = input_path.stat()
+    identity = {
+        'version': 1,
+        'input': str(input_path.resolve()),
+        'input_size': input_stat.st_size,
+        'input_mtime_ns': input_stat.st_mtime_ns,
+        'segment_bytes': SEGMENT_BYTES,
+        'checksum': checksum,
+    }
+    
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with stats.phase('verify'):
+            header_length, digests = _load_resume_point(
+                input_path, partial_path, journal_path, identity, verbose
+            )
+        resume_offset = len(digests) * SEGMENT_BYTES
+        stats.total_bytes = max(input_stat.st_size - resume_offset, 0)
+        
+        digest = StreamDigest() if checksum else None
+        
+        with input_path.open('rb') as src, \
+                partial_path.open('r+b' if digests else 'wb') as out:
+            if digests:
+                out.truncate(header_length + len(digests) * SEGMENT_OUTPUT_BYTES)
+                out.seek(0, os.SEEK_END)
+                if verbose:
+                    print(f"♻️  Resuming after segment {len(digests)} "
+                          f"({resume_offset:,} of {input_stat.st_size:,} bytes already encoded)")
+                if digest is not None:
+                    # hashlib state cannot be persisted, so rebuild it from the input prefix
+                    with stats.phase('checksum'):
+                        while digest.size < resume_offset:
+                            digest.update(src.read(min(CHUNK_SIZE, resume_offset - digest.size)))
+                src.seek(resume_offset)
+            elif digest is not None:
+                header = f"{CONTAINER_HEADER} size={input_stat.st_size}\n".encode('ascii')
+                out.write(header)
+                header_length = len(header)
+            
+            while True:
+                with stats.phase('read'):
+                    segment = src.read(SEGMENT_BYTES)
+                if not segment:
+                    break
+                stats.bytes_read += len(segment)
+                if digest is not None:
+                    with stats.phase('checksum'):
+                        digest.update(segment)
+                
+                with stats.phase('transform'):
+                    encoded = base64.encodebytes(segment)
+                with stats.phase('write'):
+                    out.write(encoded)
+                    out.flush()
+                stats.bytes_written += len(encoded)
+                with stats.phase('fsync'):
+                    os.fsync(out.fileno())
+                stats.progress()
+                
+                if len(segment) < SEGMENT_BYTES:
+                    break  # Short final segment is only committed by the rename
+                digests.append(hashlib.sha256(encoded).hexdigest())
+                with stats.phase('fsync'):
+                    _write_journal(journal_path, {
+                        **identity, 'header_length': header_length, 'segments': digests
+                    })
+            stats.progress(force=True)
+            
+            if digest is not None:
+                if digest.size != input_stat.st_size:
+                    return f"Input changed during encoding ({digest.size:,} of {input_stat.st_size:,} bytes)"
+                out.write(f"{CONTAINER_TRAILER} {digest.sha256.hexdigest()}\n".encode('ascii'))
+                out.flush()
+                with stats.phase('fsync'):
+                    os.fsync(out.fileno())
+        
+        with stats.phase('rename'):
+            os.replace(partial_path, output_path)
+        journal_path.unlink(missing_ok=True)
+        
+        if verbose:
+            print(f"✅ All segments written, atomically renamed to: {output_path}")
+        
+        return None
+    
+    except PermissionError:
+        return f"Permission denied: cannot write to {output_path}"
+    except OSError as e:
+        return f"OS error during resumable encode: {e} (rerun with --resume to continue)"
+    except Exception as e:
+        return f"Unexpected error during resumable encode: {e} (rerun with --resume to continue)"
+
+
 def main(argv: Optional[list[str]] = None) -> int:
     """
     Main entry point with production-grade error handling.
@@ -254,6 +663,15 @@ def main(argv: Optional[list[str]] = None) -> int:
   # Verbose mode for debugging
   python bin_to_base64.py data.bin -v
   
+  # Embed size + SHA-256 so the decoder can verify the round trip
+  python bin_to_base64.py data.bin --checksum
+  
+  # Per-phase timings and throughput as JSON (use - for stdout)
+  python bin_to_base64.py data.bin --stats-json stats.json
+  
+  # Checkpointed multi-GB encode; rerun the same command after an interruption
+  python bin_to_base64.py huge.bin --resume
+  
   # Using with uv for modern Python management
   uv run bin_to_base64.py data.bin
         """
@@ -277,19 +695,43 @@ def main(argv: Optional[list[str]] = None) -> int:
         help='Enable detailed progress and diagnostic output'
     )
     
+    parser.add_argument(
+        '--checksum', '-c',
+        action='store_true',
+        help='Wrap output in a container carrying the original size and SHA-256'
+    )
+    
+    parser.add_argument(
+        '--stats-json',
+        metavar='PATH',
+        help="Write per-phase timings and throughput as JSON to PATH ('-' for stdout)"
+    )
+    
+    parser.add_argument(
+        '--resume', '-r',
+        action='store_true',
+        help='Write in checkpointed segments and continue an interrupted run from its last verified segment'
+    )
+    
     args = parser.parse_args(argv)
+    stats = ConversionStats()
     
     # Phase 1: Input Validation
     if args.verbose:
         print(f"🔍 Validating input file: {args.input_file}")
     
-    is_valid, error_msg = validate_input_path(args.input_file)
+    with stats.phase('validate'):
+        is_valid, error_msg = validate_input_path(args.input_file)
     if not is_valid:
         print(f"❌ Validation Error: {error_msg}", file=sys.stderr)
         return 2
     
+    stats.total_bytes = args.input_file.stat().st_size
+    stats.show_progress = stats.total_bytes >= PROGRESS_THRESHOLD and sys.stderr.isatty()
+    
     # Phase 2: Output Path Construction
-    output_path, error_msg = construct_output_path(args.input_file, args.force)
+    with stats.phase('validate'):
+        output_path, error_msg = construct_output_path(args.input_file, args.force)
     if error_msg:
         print(f"❌ Output Error: {error_msg}", file=sys.stderr)
         return 1
@@ -297,23 +739,33 @@ def main(argv: Optional[list[str]] = None) -> int:
     if args.verbose:
         print(f"📂 Output will be written to: {output_path}")
     
-    # Phase 3: Encode Binary to Base64
-    if args.verbose:
-        print(f"⏳ Encoding {args.input_file.stat().st_size:,} bytes to Base64...")
-    
-    encoded_data, error_msg = encode_file_to_base64(args.input_file, args.verbose)
-    if error_msg:
-        print(f"❌ Encoding Error: {error_msg}", file=sys.stderr)
-        return 1
-    
-    # Phase 4: Atomic Write
-    if args.verbose:
-        print("💿 Writing Base64 text to disk...")
-    
-    error_msg = write_text_atomic(encoded_data, output_path, args.verbose)
-    if error_msg:
-        print(f"❌ Write Error: {error_msg}", file=sys.stderr)
-        return 1
+    if args.resume:
+        # Phase 3+4: Segmented encode with checkpoints, then atomic rename
+        if args.verbose:
+            print(f"⏳ Encoding {args.input_file.stat().st_size:,} bytes in resumable segments...")
+        
+        error_msg = encode_file_resumable(args.input_file, output_path, args.checksum, args.verbose, stats)
+        if error_msg:
+            print(f"❌ Encoding Error: {error_msg}", file=sys.stderr)
+            return 1
+    else:
+        # Phase 3: Encode Binary to Base64
+        if args.verbose:
+            print(f"⏳ Encoding {args.input_file.stat().st_size:,} bytes to Base64...")
+        
+        encoded_data, error_msg = encode_file_to_base64(args.input_file, args.verbose, args.checksum, stats)
+        if error_msg:
+            print(f"❌ Encoding Error: {error_msg}", file=sys.stderr)
+            return 1
+        
+        # Phase 4: Atomic Write
+        if args.verbose:
+            print("💿 Writing Base64 text to disk...")
+        
+        error_msg = write_text_atomic(encoded_data, output_path, args.verbose, stats)
+        if error_msg:
+            print(f"❌ Write Error: {error_msg}", file=sys.stderr)
+            return 1
     
     # Phase 5: Success Summary
     input_size = args.input_file.stat().st_size
@@ -328,6 +780,17 @@ def main(argv: Optional[list[str]] = None) -> int:
         f"   Size increase: {expansion_ratio:.2f}x ({expansion_ratio * 100 - 100:+.1f}%)"
     )
     
+    if args.verbose:
+        stats.print_summary()
+    
+    if args.stats_json:
+        report = {'tool': 'bin_to_base64', 'input': str(args.input_file),
+                  'output': str(output_path), **stats.as_dict()}
+        error_msg = write_stats_json(report, args.stats_json)
+        if error_msg:
+            print(f"❌ Stats Error: {error_msg}", file=sys.stderr)
+            return 1
+    
     return 0
 
 
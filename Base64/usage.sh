@@ -22,11 +22,23 @@ uv run base64_to_bin.py favicon.txt --force
 # Verify files are identical
 diff favicon.ico favicon.bin  # Should show no differences
 
+# Embed original size + SHA-256; the decoder verifies them while streaming
+# and refuses to produce favicon.bin if either does not match
+uv run bin_to_base64.py favicon.ico --checksum
+uv run base64_to_bin.py favicon.txt --force
+
 # Force overwrite in automation scripts
 uv run bin_to_base64.py data.bin --force --verbose
 
 # Handle large files with streaming
-uv run bin_to_base64.py video.bin -v  # Shows chunk processing details
+uv run bin_to_base64.py video.bin -v  # Shows chunk processing details and phase timings
+
+# Find the bottleneck: per-phase seconds (validate/read/transform/write/fsync/rename) and bytes/sec
+uv run base64_to_bin.py video.txt --force --stats-json video-stats.json
+
+# Multi-GB inputs: checkpoint every ~14MB of input; if the run is killed,
+# the same command picks up after the last verified segment
+uv run bin_to_base64.py huge.bin --resume --checksum
 
 ---
 
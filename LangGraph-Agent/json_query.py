@@ -0,0 +1,300 @@
+"""
+Incremental JSON path queries over large files, for the agent's query_json tool.
+
+The file is scanned in fixed-size chunks; values on the way to the requested path
+are skipped by a character scanner without being built, and only the selected
+values are parsed. Reading stops as soon as the selection is complete, so
+`users[0:50].email` on a 1 GB file reads little more than the first 50 users.
+
+Path syntax:
+    users            object member (also .users or ["users"] for keys with odd characters)
+    users[3]         array element
+    users[0:50]      array slice (start and stop optional, no negative indices)
+    users[*]         every element
+    users[0:50].email   members of every selected element
+
+A path of member names only that ends at an array (`users`, or the empty path on a
+top-level array) yields the array's elements one by one, so pagination and size limits
+apply to the elements rather than to one huge value. Once a path has gone through an
+index, slice or [*], every selected value is returned whole: `users[0:3].tags` yields
+one tags array per user, empty ones included, so each result maps back to its element.
+"""
+from typing import Any, Iterator, List, Optional, Tuple, Union
+import json
+import re
+
+CHUNK_CHARS = 1 << 16
+FAST_SKIP_CHARS = 1 << 18  # Containers are skipped with the C decoder while they fit in this much buffer
+DECODER = json.JSONDecoder()
+STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*')
+STRUCTURAL = re.compile(r'[\[\]{}"]')
+SCALAR = re.compile(r'[^,\]}\s]+')
+WHITESPACE = re.compile(r'\s*')
+PATH_STEP = re.compile(
+    r'\.?(?P<key>[A-Za-z_$][\w$-]*)'
+    r'|\[(?P<index>\d+)\]'
+    r'|\[(?P<start>\d*):(?P<stop>\d*)\]'
+    r'|\[(?P<star>\*)\]'
+    r'|\[(?P<quoted>"(?:[^"\\]|\\.)*")\]'
+)
+
+Step = Union[str, Tuple[int, Optional[int]]]  # Member name, or (start, stop) element range
+
+
+class JsonQueryError(ValueError):
+    """Invalid path, or a file that is not valid JSON where the query needed it."""
+
+
+class ValueTooLarge:
+    """Stands in for a selected value whose JSON text exceeds the capture limit."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+
+def parse_path(path: str) -> List[Step]:
+    """Parse a path expression into member names and (start, stop) element ranges."""
+    steps: List[Step] = []
+    position = 0
+    path = path.strip()
+    while position < len(path):
+        match = PATH_STEP.match(path, position)
+        if match is None or (match.group("key") and position and path[position] != "."):
+            raise JsonQueryError(f"invalid path '{path}' at position {position}")
+        if match.group("key"):
+            steps.append(match.group("key"))
+        elif match.group("quoted"):
+            steps.append(json.loads(match.group("quoted")))
+        elif match.group("index"):
+            index = int(match.group("index"))
+            steps.append((index, index + 1))
+        elif match.group("star"):
+            steps.append((0, None))
+        else:
+            start, stop = match.group("start"), match.group("stop")
+            steps.append((int(start) if start else 0, int(stop) if stop else None))
+        position = match.end()
+    return steps
+
+
+class JsonStream:
+    """
+    Forward-only JSON scanner over a text file with a bounded buffer.
+    """
+
+    def __init__(self, f, chunk_chars: int = CHUNK_CHARS):
+        self.f = f
+        self.chunk_chars = chunk_chars
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.offset = 0  # File position (in characters) of buffer[0]
+        self.capture_from: Optional[int] = None  # Buffer index where the value being captured starts
+        self.capture_limit = 0
+        self.key_from: Optional[int] = None  # Buffer index of the object key being read
+        self.chars_read = 0
+        self.skip_results = 0  # Selected values to skip (not parse) before yielding, for pagination
+
+    def _fill(self) -> bool:
+        """Read the next chunk, dropping consumed text that no capture still needs."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.chars_read += len(chunk)
+        keep = self.pos
+        if self.capture_from is not None:
+            if len(self.buffer) - self.capture_from > self.capture_limit:
+                self.capture_from = None  # Too large to return; stop holding it in memory
+            else:
+                keep = self.capture_from
+        if self.key_from is not None:
+            keep = min(keep, self.key_from)
+        if keep:
+            self.buffer = self.buffer[keep:]
+            self.offset += keep
+            self.pos -= keep
+            if self.capture_from is not None:
+                self.capture_from -= keep
+            if self.key_from is not None:
+                self.key_from -= keep
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> Optional[str]:
+        """Next non-whitespace character (not consumed), or None at the end of the file."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise JsonQueryError(f"expected '{char}' but found {found!r} after {self.chars_read} characters")
+        self.pos += 1
+
+    def _skip_string(self) -> None:
+        self.pos += 1  # Opening quote
+        while True:
+            end = STRING_BODY.match(self.buffer, self.pos).end()
+            if end < len(self.buffer) and self.buffer[end] == '"':
+                self.pos = end + 1
+                return
+            self.pos = end  # Stopped at the buffer end, possibly before a lone backslash
+            if not self._fill():
+                raise JsonQueryError("unterminated string")
+
+    def skip_value(self) -> None:
+        char = self.peek()
+        if char is None:
+            raise JsonQueryError("unexpected end of file")
+        if char == '"':
+            self._skip_string()
+        elif char in "[{":
+            # Small containers (typically array elements) go through the C decoder in one call;
+            # one that does not fit in FAST_SKIP_CHARS of buffer is walked child by child instead.
+            while True:
+                try:
+                    self.pos = DECODER.raw_decode(self.buffer, self.pos)[1]
+                    return
+                except json.JSONDecodeError as e:
+                    if len(self.buffer) - self.pos >= FAST_SKIP_CHARS or not self._fill():
+                        if self.eof and len(self.buffer) - self.pos < FAST_SKIP_CHARS:
+                            raise JsonQueryError(f"invalid JSON: {e.msg}") from None
+                        break
+            children = self._elements() if char == "[" else self._members()
+            for _ in children:
+                self.skip_value()
+        else:
+            while True:
+                end = SCALAR.match(self.buffer, self.pos).end()
+                if end < len(self.buffer) or not self._fill():
+                    self.pos = end
+                    return
+
+    def capture_value(self, limit: int) -> Any:
+        """Parse the next value, or return ValueTooLarge if its text exceeds limit characters."""
+        self.peek()
+        start = self.offset + self.pos
+        self.capture_from, self.capture_limit = self.pos, limit
+        try:
+            self.skip_value()
+            text = self.buffer[self.capture_from:self.pos] if self.capture_from is not None else None
+        finally:
+            self.capture_from = None
+        size = self.offset + self.pos - start
+        if text is None or size > limit:
+            return ValueTooLarge(size)
+        return json.loads(text)
+
+    def _emit(self, limit: int) -> Iterator[Any]:
+        if self.skip_results:
+            self.skip_results -= 1
+            self.skip_value()
+            return
+        yield self.capture_value(limit)
+
+    def _elements(self) -> Iterator[int]:
+        """Step through an array, yielding each element's index with the stream positioned on it."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            separator = self.peek()
+            self.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise JsonQueryError(f"expected ',' or ']' in array, found {separator!r}")
+
+    def _members(self) -> Iterator[str]:
+        """Step through an object, yielding each key with the stream positioned on its value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise JsonQueryError("expected an object key")
+            self.key_from = self.pos  # Keep the key's text in the buffer while it is scanned
+            try:
+                self._skip_string()
+                key = json.loads(self.buffer[self.key_from:self.pos])
+            finally:
+                self.key_from = None
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise JsonQueryError(f"expected ',' or '}}' in object, found {separator!r}")
+
+    def select(self, steps: List[Step], limit: int, tail: bool = True, expand: bool = True) -> Iterator[Any]:
+        """
+        Yield the values selected by steps, parsing only those. With tail=True the
+        stream is abandoned once the selection is complete instead of being read to
+        the end of the enclosing value (nothing after it is needed). With expand=True
+        (no element range on the path so far) a selected array yields its elements.
+        """
+        if not steps:
+            if expand and self.peek() == "[":
+                for _ in self._elements():
+                    yield from self._emit(limit)
+            else:
+                yield from self._emit(limit)
+            return
+
+        step, rest = steps[0], steps[1:]
+        char = self.peek()
+        if isinstance(step, str):
+            if char != "{":
+                self.skip_value()
+                return
+            for key in self._members():
+                if key == step:
+                    yield from self.select(rest, limit, tail, expand)
+                    if tail:
+                        return
+                else:
+                    self.skip_value()
+            return
+
+        start, stop = step
+        if char != "[":
+            self.skip_value()
+            return
+        for index in self._elements():
+            if stop is not None and index >= stop:
+                if tail:
+                    return
+                self.skip_value()
+            elif index >= start:
+                last = tail and stop is not None and index + 1 >= stop  # Nothing after it is needed
+                yield from self.select(rest, limit, last, expand=False)
+                if last:
+                    return
+            else:
+                self.skip_value()
+
+
+def query_file(filepath: str, path: str, limit: int, offset: int = 0) -> Iterator[Any]:
+    """
+    Yield the values selected by path in a JSON file, after skipping the first offset
+    of them unparsed; values whose text exceeds limit characters come back as ValueTooLarge.
+    """
+    steps = parse_path(path)
+    with open(filepath, "r", encoding="utf-8") as f:
+        stream = JsonStream(f)
+        stream.skip_results = offset
+        yield from stream.select(steps, limit)
@@ -0,0 +1,164 @@
+"""
+SQLite-backed response cache for the DataGen agent's chat model, with record/replay.
+
+Plugs into LangChain's cache slot (ChatOpenAI(cache=...)), so every model call made by
+the agent - including the ones inside LangGraph's ReAct loop - goes through it. Entries
+are keyed by a SHA-256 of the model parameters and bound tools (LangChain's llm_string)
+plus the messages as the provider sees them: run ids and response metadata that change
+between otherwise identical runs are left out of the key.
+
+Modes (DATAGEN_LLM_CACHE):
+    off     - no cache, every call is live
+    record  - serve hits from the cache, call the model on a miss and store the answer
+    replay  - serve hits from the cache, fail on a miss; never touches the network
+
+Replay is deterministic as long as tool results are: a follow-up step whose prompt
+contains freshly generated random users will miss and must be re-recorded.
+"""
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+CACHE_MODES = ("off", "record", "replay")
+DEFAULT_CACHE_MODE = "off"
+DEFAULT_CACHE_PATH = "llm_cache.db"
+
+MESSAGE_FIELDS = ("type", "content", "name", "tool_call_id")  # What the provider sees of a message
+TOOL_CALL_FIELDS = ("name", "args", "id")
+
+warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a model call has no recorded response."""
+
+
+def canonical_prompt(prompt: str) -> str:
+    """
+    Reduce LangChain's serialised message list to the fields sent to the provider,
+    dropping message ids, usage and response metadata.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    canonical = []
+    for message in messages:
+        fields = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        entry = {key: fields[key] for key in MESSAGE_FIELDS if fields.get(key) is not None}
+        tool_calls = fields.get("tool_calls")
+        if tool_calls:
+            entry["tool_calls"] = [{key: call.get(key) for key in TOOL_CALL_FIELDS} for call in tool_calls]
+        canonical.append(entry)
+    return json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\0{canonical_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseCache(BaseCache):
+    """
+    Chat model response cache in an SQLite file, with hit/miss and latency metrics.
+
+    Live call latency is measured between a missed lookup and the matching update and
+    stored with the response, so hits can report the model time they saved.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = "record"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cache mode '{mode}' (choose from: record, replay)")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, generations TEXT NOT NULL, latency_ms REAL, created REAL NOT NULL)"
+            )
+        self._pending: Dict[str, float] = {}  # key -> time of the missed lookup
+        self.hits = 0
+        self.misses = 0
+        self.lookup_ms = 0.0
+        self.live_ms = 0.0
+        self.saved_ms = 0.0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        start = time.perf_counter()
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._db.execute("SELECT generations, latency_ms FROM responses WHERE key = ?", (key,)).fetchone()
+            self.lookup_ms += (time.perf_counter() - start) * 1000
+            if row is None:
+                self.misses += 1
+                self._pending[key] = time.perf_counter()
+            else:
+                self.hits += 1
+                self.saved_ms += row[1] or 0.0
+        if row is None:
+            if self.mode == "replay":
+                raise CacheMissError(f"no recorded response for this model call in '{self.path}' "
+                                     f"(run with DATAGEN_LLM_CACHE=record to record it)")
+            return None
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = cache_key(prompt, llm_string)
+        with self._lock:
+            started = self._pending.pop(key, None)
+            latency_ms = (time.perf_counter() - started) * 1000 if started is not None else None
+            if latency_ms is not None:
+                self.live_ms += latency_ms
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                                 (key, dumps(return_val), latency_ms, time.time()))
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    def count(self) -> int:  # Not __len__: LangChain tests the cache for truthiness
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": self.count(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_lookup_ms": self.lookup_ms / lookups if lookups else 0.0,
+            "avg_live_ms": self.live_ms / self.misses if self.misses else 0.0,
+            "saved_ms": self.saved_ms,
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def cache_from_env() -> Optional[SQLiteResponseCache]:
+    """Build the cache selected by DATAGEN_LLM_CACHE / DATAGEN_LLM_CACHE_PATH, or None for "off"."""
+    mode = os.environ.get("DATAGEN_LLM_CACHE", DEFAULT_CACHE_MODE).strip().lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"DATAGEN_LLM_CACHE must be one of: {', '.join(CACHE_MODES)} (got '{mode}')")
+    if mode == "off":
+        return None
+    return SQLiteResponseCache(os.environ.get("DATAGEN_LLM_CACHE_PATH", DEFAULT_CACHE_PATH), mode)
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    return (f"LLM cache ({stats['mode']}): {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), lookup {stats['avg_lookup_ms']:.1f} ms avg, "
+            f"live call {stats['avg_live_ms']:.0f} ms avg, {stats['saved_ms'] / 1000:.1f}s of model time saved")
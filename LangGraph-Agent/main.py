@@ -1,15 +1,24 @@
-from typing import List
+from typing import Callable, Iterator, List, Optional, Tuple
+import argparse
+import asyncio
 import json
+import os
+import sys
+import time
 import random
 import string
 from datetime import datetime, timedelta
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
-from langchain_core.tools import tool
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.tools import BaseTool, StructuredTool, tool
 from langgraph.prebuilt import create_react_agent
 
 from dotenv import load_dotenv
 
+from json_query import JsonQueryError, ValueTooLarge, query_file
+from llm_cache import cache_from_env, format_stats
+from tracing import AgentTracer, format_breakdown
+
 load_dotenv()
 
 
@@ -18,17 +27,28 @@ load_dotenv()
 def write_json(filepath: str, data: dict) -> str:
     """Write a Python dictionary as JSON to a file with pretty formatting."""
     try:
+        text = json.dumps(data, indent=2, ensure_ascii=False)  # Serialise once; the length comes for free
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        return f"Successfully wrote JSON data to '{filepath}' ({len(json.dumps(data))} characters)."
+            f.write(text)
+        return f"Successfully wrote JSON data to '{filepath}' ({len(text)} characters)."
     except Exception as e:
         return f"Error writing JSON: {str(e)}"
 
 
+READ_JSON_MAX_BYTES = 100_000  # Larger files must be read with query_json
+QUERY_DEFAULT_LIMIT = 50
+QUERY_MAX_LIMIT = 1000
+QUERY_MAX_CHARS = 20_000  # Characters of results returned to the model per call
+
+
 @tool
 def read_json(filepath: str) -> str:
-    """Read and return the contents of a JSON file."""
+    """Read and return the contents of a small JSON file. Use query_json for large files."""
     try:
+        size = os.path.getsize(filepath)
+        if size > READ_JSON_MAX_BYTES:
+            return (f"Error: '{filepath}' is {size} bytes, too large to read whole "
+                    f"(limit {READ_JSON_MAX_BYTES}). Use query_json with a path such as 'users[0:20]'.")
         with open(filepath, 'r', encoding='utf-8') as f:
             data = json.load(f)
         return json.dumps(data, indent=2)
@@ -40,6 +60,65 @@ def read_json(filepath: str) -> str:
         return f"Error reading JSON: {str(e)}"
 
 
+@tool
+def query_json(
+        filepath: str,
+        path: str = "",
+        offset: int = 0,
+        limit: int = QUERY_DEFAULT_LIMIT,
+        max_chars: int = QUERY_MAX_CHARS
+) -> str:
+    """
+    Read part of a JSON file of any size by path, with pagination. The file is parsed
+    incrementally and only the selected values are returned.
+
+    Args:
+        filepath: Path of the JSON file
+        path: Selection, e.g. "users", "users[0:50].email", "users[3]", "users[*].age", "count".
+            Empty selects the whole document. A path of names only ending at an array
+            (e.g. "users") returns its elements; after an index, slice or [*] each selected
+            value is returned whole, so "users[0:3].tags" gives one tags list per user.
+        offset: Number of selected values to skip (use next_offset from the previous call)
+        limit: Maximum number of values to return
+        max_chars: Maximum characters of returned values
+
+    Returns:
+        JSON with 'results', 'returned', 'has_more' and 'next_offset', or an error message
+    """
+    if offset < 0 or not 1 <= limit <= QUERY_MAX_LIMIT or not 1 <= max_chars <= QUERY_MAX_CHARS:
+        return (f"Error: offset must be >= 0, limit between 1 and {QUERY_MAX_LIMIT}, "
+                f"max_chars between 1 and {QUERY_MAX_CHARS}")
+    results = []
+    used = 0
+    has_more = False
+    try:
+        values = query_file(filepath, path, max_chars, offset)
+        for value in values:
+            if len(results) == limit:
+                has_more = True
+                break
+            if isinstance(value, ValueTooLarge):
+                value = f"<value of {value.size} characters exceeds max_chars; query a narrower path>"
+            size = len(json.dumps(value, ensure_ascii=False))
+            if results and used + size > max_chars:
+                has_more = True
+                break
+            results.append(value)
+            used += size
+        values.close()
+    except FileNotFoundError:
+        return f"Error: File '{filepath}' not found."
+    except (JsonQueryError, UnicodeDecodeError) as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error reading JSON: {str(e)}"
+
+    response = {"path": path, "offset": offset, "returned": len(results), "results": results, "has_more": has_more}
+    if has_more:
+        response["next_offset"] = offset + len(results)
+    return json.dumps(response, ensure_ascii=False)
+
+
 @tool
 def generate_sample_users(
         first_names: List[str],
@@ -61,20 +140,13 @@ def generate_sample_users(
     Returns:
         Dictionary with 'users' array or 'error' message
     """
-    # Validation
-    if not first_names:
-        return {"error": "first_names list cannot be empty"}
-    if not last_names:
-        return {"error": "last_names list cannot be empty"}
-    if not domains:
-        return {"error": "domains list cannot be empty"}
-    if min_age > max_age:
-        return {"error": f"min_age ({min_age}) cannot be greater than max_age ({max_age})"}
-    if min_age < 0 or max_age < 0:
-        return {"error": "ages must be non-negative"}
+    error = validate_user_params(first_names, last_names, domains, min_age, max_age)
+    if error:
+        return {"error": error}
 
     users = []
     count = len(first_names)
+    now = datetime.now()
 
     for i in range(count):
         first = first_names[i]
@@ -89,34 +161,359 @@ def generate_sample_users(
             "email": email,
             "username": f"{first.lower()}{random.randint(100, 999)}",
             "age": random.randint(min_age, max_age),
-            "registeredAt": (datetime.now() - timedelta(days=random.randint(1, 365))).isoformat()
+            "registeredAt": (now - timedelta(days=random.randint(1, 365))).isoformat()
         }
         users.append(user)
 
     return {"users": users, "count": len(users)}
 
 
-TOOLS = [write_json, read_json, generate_sample_users]
+# -------- Bulk generation --------
+BULK_BATCH_SIZE = 10_000  # Users drawn and written per batch
+BULK_MAX_COUNT = 50_000_000
+BULK_FORMATS = ("jsonl", "json")
+
+
+def validate_user_params(first_names: List[str], last_names: List[str], domains: List[str],
+                         min_age: int, max_age: int) -> Optional[str]:
+    """Return an error message for invalid user generation parameters, or None."""
+    if not first_names:
+        return "first_names list cannot be empty"
+    if not last_names:
+        return "last_names list cannot be empty"
+    if not domains:
+        return "domains list cannot be empty"
+    if min_age > max_age:
+        return f"min_age ({min_age}) cannot be greater than max_age ({max_age})"
+    if min_age < 0 or max_age < 0:
+        return "ages must be non-negative"
+    return None
+
+
+def _escaped(text: str) -> str:
+    """JSON string body without the quotes; escaped fragments concatenate into valid JSON."""
+    return json.dumps(text, ensure_ascii=False)[1:-1]
+
+
+def iter_user_batches(
+        count: int,
+        first_names: List[str],
+        last_names: List[str],
+        domains: List[str],
+        min_age: int,
+        max_age: int,
+        batch_size: int = BULK_BATCH_SIZE,
+        seed: Optional[int] = None
+) -> Iterator[List[str]]:
+    """
+    Yield batches of users as serialised JSON objects (same fields as generate_sample_users).
+
+    Names, domains, ages, username suffixes and registration dates are drawn for a whole
+    batch at once with random.choices(k=...), and every distinct name, domain and date is
+    escaped or formatted only once, so no dict or json.dumps call is made per user.
+    """
+    rng = random.Random(seed)
+    firsts = [(_escaped(name), _escaped(name.lower())) for name in first_names]
+    lasts = [(_escaped(name), _escaped(name.lower())) for name in last_names]
+    escaped_domains = [_escaped(domain) for domain in domains]
+    ages = range(min_age, max_age + 1)
+    suffixes = range(100, 1000)
+    now = datetime.now()
+    dates = [(now - timedelta(days=days)).isoformat() for days in range(1, 366)]
+
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        rows = zip(
+            range(start + 1, start + size + 1),
+            rng.choices(firsts, k=size),
+            rng.choices(lasts, k=size),
+            rng.choices(escaped_domains, k=size),
+            rng.choices(suffixes, k=size),
+            rng.choices(ages, k=size),
+            rng.choices(dates, k=size),
+        )
+        yield [
+            f'{{"id": {user_id}, "firstName": "{first}", "lastName": "{last}", '
+            f'"email": "{first_lower}.{last_lower}@{domain}", "username": "{first_lower}{suffix}", '
+            f'"age": {age}, "registeredAt": "{registered}"}}'
+            for user_id, (first, first_lower), (last, last_lower), domain, suffix, age, registered in rows
+        ]
+
+
+def stream_users_to_file(filepath: str, count: int, first_names: List[str], last_names: List[str],
+                         domains: List[str], min_age: int, max_age: int, output_format: str = "jsonl",
+                         seed: Optional[int] = None) -> int:
+    """
+    Write count users to filepath batch by batch, so memory stays flat for any count.
+
+    "jsonl" writes one user per line; "json" writes {"users": [...], "count": N}, the same
+    document generate_sample_users + write_json produce. Returns the number of bytes written.
+    Users are written to filepath + ".tmp", which replaces filepath only once complete, so
+    a failed run leaves any existing file untouched.
+    """
+    batches = iter_user_batches(count, first_names, last_names, domains, min_age, max_age, seed=seed)
+    temp_path = filepath + ".tmp"
+    f = open(temp_path, 'w', encoding='utf-8')  # If this fails there is nothing of ours to clean up
+    try:
+        with f:
+            if output_format == "jsonl":
+                for batch in batches:
+                    f.write("\n".join(batch))
+                    f.write("\n")
+            else:
+                f.write('{"users": [')
+                separator = "\n"
+                for batch in batches:
+                    f.write(separator)
+                    f.write(",\n".join(batch))
+                    separator = ",\n"
+                f.write(f'\n], "count": {count}}}\n')
+            size = f.tell()
+        os.replace(temp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(temp_path)  # Only this call's own partial output, never filepath
+        except OSError:
+            pass
+        raise
+    return size
+
 
-llm = ChatOpenAI(model="gpt-4", temperature=0)
+@tool
+def generate_users_to_file(
+        filepath: str,
+        count: int,
+        first_names: List[str],
+        last_names: List[str],
+        domains: List[str],
+        min_age: int,
+        max_age: int,
+        output_format: str = "jsonl"
+) -> str:
+    """
+    Generate a large number of sample users and stream them straight to a file.
+    Use this instead of generate_sample_users + write_json for more than a few dozen users.
+
+    Args:
+        filepath: Output file path
+        count: Number of users to generate (independent of the length of the name lists)
+        first_names: First names to draw from at random
+        last_names: Last names to draw from at random
+        domains: Email domains to draw from at random
+        min_age: Minimum age for users
+        max_age: Maximum age for users
+        output_format: "jsonl" (one user per line) or "json" ({"users": [...], "count": N})
+
+    Returns:
+        Summary of what was written, or an error message
+    """
+    error = validate_user_params(first_names, last_names, domains, min_age, max_age)
+    if error is None and not 1 <= count <= BULK_MAX_COUNT:
+        error = f"count must be between 1 and {BULK_MAX_COUNT}"
+    if error is None and output_format not in BULK_FORMATS:
+        error = f"output_format must be one of: {', '.join(BULK_FORMATS)}"
+    if error:
+        return f"Error: {error}"
+    try:
+        size = stream_users_to_file(filepath, count, first_names, last_names, domains, min_age, max_age,
+                                    output_format)
+        return f"Successfully wrote {count} users to '{filepath}' as {output_format} ({size / 2 ** 20:.1f} MiB)."
+    except Exception as e:
+        return f"Error writing users: {str(e)}"
+
+
+# -------- Async tool variants --------
+# Used by the async runner: LangGraph awaits all tool calls of one model turn together,
+# so file I/O runs in worker threads and independent calls overlap.
+async def awrite_json(filepath: str, data: dict) -> str:
+    return await asyncio.to_thread(write_json.func, filepath, data)
+
+
+async def aread_json(filepath: str) -> str:
+    return await asyncio.to_thread(read_json.func, filepath)
+
+
+async def aquery_json(
+        filepath: str,
+        path: str = "",
+        offset: int = 0,
+        limit: int = QUERY_DEFAULT_LIMIT,
+        max_chars: int = QUERY_MAX_CHARS
+) -> str:
+    return await asyncio.to_thread(query_json.func, filepath, path, offset, limit, max_chars)
+
+
+async def agenerate_sample_users(
+        first_names: List[str],
+        last_names: List[str],
+        domains: List[str],
+        min_age: int,
+        max_age: int
+) -> dict:
+    # CPU-only and fast; no thread hop needed
+    return generate_sample_users.func(first_names, last_names, domains, min_age, max_age)
+
+
+async def agenerate_users_to_file(
+        filepath: str,
+        count: int,
+        first_names: List[str],
+        last_names: List[str],
+        domains: List[str],
+        min_age: int,
+        max_age: int,
+        output_format: str = "jsonl"
+) -> str:
+    return await asyncio.to_thread(generate_users_to_file.func, filepath, count, first_names, last_names,
+                                   domains, min_age, max_age, output_format)
+
+
+def with_coroutine(sync_tool: BaseTool, coroutine: Callable) -> StructuredTool:
+    """Return a copy of a sync tool that also has a native async implementation."""
+    return StructuredTool.from_function(
+        func=sync_tool.func,
+        coroutine=coroutine,
+        name=sync_tool.name,
+        description=sync_tool.description,
+        args_schema=sync_tool.args_schema,
+    )
+
+
+TOOLS = [
+    with_coroutine(write_json, awrite_json),
+    with_coroutine(read_json, aread_json),
+    with_coroutine(query_json, aquery_json),
+    with_coroutine(generate_sample_users, agenerate_sample_users),
+    with_coroutine(generate_users_to_file, agenerate_users_to_file),
+]
+
+# Response cache: DATAGEN_LLM_CACHE=off|record|replay, DATAGEN_LLM_CACHE_PATH (default llm_cache.db)
+LLM_CACHE = cache_from_env()
+REPLAY_ONLY = LLM_CACHE is not None and LLM_CACHE.mode == "replay" and not os.environ.get("OPENAI_API_KEY")
+
+llm = ChatOpenAI(
+    model="gpt-4",
+    temperature=0,
+    cache=LLM_CACHE,
+    api_key="replay-only" if REPLAY_ONLY else None,  # Replay never reaches the API
+)
 
 SYSTEM_MESSAGE = (
     "You are DataGen, a helpful assistant that generates sample data for applications. "
     "To generate users, you need: first_names (list), last_names (list), domains (list), min_age, max_age. "
     "Fill in these values yourself without asking for them "
     "When asked to save users, first generate them with the tool, then immediately use write_json with the result. "
+    "For more than 50 users, or when the user gives a count, use generate_users_to_file with that count instead. "
+    "To inspect large JSON files use query_json with a path and page through results with next_offset. "
     "If the user refers to 'those users' from a previous request, ask them to specify the details again."
 )
 
 agent = create_react_agent(llm, TOOLS, prompt=SYSTEM_MESSAGE)
 
 
-def run_agent(user_input: str, history: List[BaseMessage]) -> AIMessage:
+# -------- Conversation history --------
+HISTORY_TOKEN_BUDGET = 3000  # Tokens of history resent per turn (gpt-4 has an 8k context)
+HISTORY_KEEP_TURNS = 6  # Most recent turns always kept verbatim, budget permitting
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and DataGen, a sample data "
+    "generator. Merge the new turns into the existing summary. Keep file names, field values, counts "
+    "and user preferences; drop pleasantries. Answer with the updated summary only, under 150 words."
+)
+
+
+class ConversationHistory:
+    """
+    Conversation history bounded by a token budget.
+
+    The last keep_turns turns are kept verbatim; older turns (and more, while the
+    history is over budget) are folded into a running summary by the model. Each
+    message is counted once when it is added, so the total is kept incrementally.
+    """
+
+    def __init__(self, model=llm, token_budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS):
+        self.model = model
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.turns: List[Tuple[HumanMessage, AIMessage, int]] = []  # (user, reply, tokens)
+        self.summary: Optional[SystemMessage] = None
+        self.summary_tokens = 0
+        self.total_tokens = 0
+
+    def count_tokens(self, messages: List[BaseMessage]) -> int:
+        try:
+            return self.model.get_num_tokens_from_messages(messages)
+        except Exception:
+            return sum(len(str(message.content)) for message in messages) // 4  # ~4 characters per token
+
+    def messages(self) -> List[BaseMessage]:
+        """Messages to send with the next turn: the summary, then the verbatim turns."""
+        messages: List[BaseMessage] = [self.summary] if self.summary else []
+        for user, reply, _ in self.turns:
+            messages += [user, reply]
+        return messages
+
+    def _append(self, user_input: str, response: AIMessage) -> None:
+        user = HumanMessage(content=user_input)
+        tokens = self.count_tokens([user, response])
+        self.turns.append((user, response, tokens))
+        self.total_tokens += tokens
+
+    def _overflow(self) -> List[Tuple[HumanMessage, AIMessage, int]]:
+        """Remove and return the oldest turns that no longer fit; the latest turn always stays."""
+        folded = []
+        while len(self.turns) > 1 and (len(self.turns) > self.keep_turns or self.total_tokens > self.token_budget):
+            turn = self.turns.pop(0)
+            self.total_tokens -= turn[2]
+            folded.append(turn)
+        return folded
+
+    def _summary_request(self, folded: List[Tuple[HumanMessage, AIMessage, int]]) -> List[BaseMessage]:
+        transcript = "\n".join(f"User: {user.content}\nDataGen: {reply.content}" for user, reply, _ in folded)
+        previous = self.summary.content if self.summary else "(none)"
+        return [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS),
+            HumanMessage(content=f"Existing summary:\n{previous}\n\nNew turns:\n{transcript}"),
+        ]
+
+    def _set_summary(self, text: str) -> None:
+        self.total_tokens -= self.summary_tokens
+        self.summary = SystemMessage(content=f"Summary of the earlier conversation: {text}")
+        self.summary_tokens = self.count_tokens([self.summary])
+        self.total_tokens += self.summary_tokens
+
+    def add_turn(self, user_input: str, response: AIMessage) -> None:
+        self._append(user_input, response)
+        folded = self._overflow()
+        if folded:
+            try:
+                self._set_summary(self.model.invoke(self._summary_request(folded)).content)
+            except Exception as e:
+                print(f"WARNING: Could not summarise {len(folded)} earlier turn(s); they were dropped ({e}).")
+
+    async def aadd_turn(self, user_input: str, response: AIMessage) -> None:
+        self._append(user_input, response)
+        folded = self._overflow()
+        if folded:
+            try:
+                self._set_summary((await self.model.ainvoke(self._summary_request(folded))).content)
+            except Exception as e:
+                print(f"WARNING: Could not summarise {len(folded)} earlier turn(s); they were dropped ({e}).")
+
+
+def run_config(callbacks: Optional[list] = None) -> dict:
+    config = {"recursion_limit": 50}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+
+def run_agent(user_input: str, history: List[BaseMessage], callbacks: Optional[list] = None) -> AIMessage:
     """Single-turn agent runner with automatic tool execution via LangGraph."""
     try:
         result = agent.invoke(
             {"messages": history + [HumanMessage(content=user_input)]},
-            config={"recursion_limit": 50}
+            config=run_config(callbacks)
         )
         # Return the last AI message
         return result["messages"][-1]
@@ -125,7 +522,172 @@ def run_agent(user_input: str, history: List[BaseMessage]) -> AIMessage:
         return AIMessage(content=f"Error: {str(e)}\n\nPlease try rephrasing your request or provide more specific details.")
 
 
-if __name__ == "__main__":
+async def arun_agent(
+        user_input: str,
+        history: List[BaseMessage],
+        on_token: Optional[Callable[[str], None]] = None,
+        callbacks: Optional[list] = None,
+        raise_errors: bool = False
+) -> AIMessage:
+    """
+    Async single-turn agent runner. Independent tool calls from one model turn run
+    concurrently; if on_token is given, model tokens are passed to it as they arrive.
+    Errors are returned as an AI message unless raise_errors is set.
+    """
+    inputs = {"messages": history + [HumanMessage(content=user_input)]}
+    config = run_config(callbacks)
+    try:
+        if on_token is None:
+            result = await agent.ainvoke(inputs, config=config)
+            return result["messages"][-1]
+
+        result = None
+        async for mode, payload in agent.astream(inputs, config=config, stream_mode=["messages", "values"]):
+            if mode == "values":
+                result = payload
+                continue
+            chunk, _metadata = payload
+            if isinstance(chunk, AIMessageChunk) and isinstance(chunk.content, str) and chunk.content:
+                on_token(chunk.content)
+        return result["messages"][-1]
+    except Exception as e:
+        if raise_errors:
+            raise
+        return AIMessage(content=f"Error: {str(e)}\n\nPlease try rephrasing your request or provide more specific details.")
+
+
+# -------- Batch mode --------
+BATCH_DEFAULT_CONCURRENCY = 4
+BATCH_DEFAULT_TIMEOUT = 300.0  # Seconds per job
+
+
+def read_jobs(path: str) -> Iterator[dict]:
+    """
+    Yield jobs from a prompts file: one prompt per line (blank lines and # comments
+    skipped), or for *.jsonl one object per line with "prompt" or "prompts" (a list
+    run as turns of one conversation) and an optional "id".
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not path.endswith(".jsonl"):
+                yield {"id": line_number, "prompts": [line]}
+                continue
+            try:
+                record = json.loads(line)
+                prompts = record["prompts"] if "prompts" in record else [record["prompt"]]
+                if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) for p in prompts):
+                    raise ValueError("'prompts' must be a non-empty list of strings and 'prompt' a string")
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"WARNING: Skipping {path}:{line_number}: expected an object with 'prompt' or 'prompts' ({e})")
+                continue
+            yield {"id": record.get("id", line_number), "prompts": prompts}
+
+
+async def run_job(job: dict, timeout: float, callbacks: Optional[list] = None) -> dict:
+    """
+    Run one job with its own conversation history; the timeout covers all its turns.
+    A timed-out job's running tool threads cannot be interrupted and finish in the background.
+    """
+    history = ConversationHistory()
+    turns = []
+    start = time.perf_counter()
+    result = {"id": job["id"], "status": "ok", "turns": turns}
+
+    async def run_turns():
+        for prompt in job["prompts"]:
+            turn_start = time.perf_counter()
+            response = await arun_agent(prompt, history.messages(), callbacks=callbacks, raise_errors=True)
+            turns.append({"prompt": prompt, "response": response.content,
+                          "elapsed_ms": round((time.perf_counter() - turn_start) * 1000, 1)})
+            await history.aadd_turn(prompt, response)
+
+    try:
+        await asyncio.wait_for(run_turns(), timeout)
+    except asyncio.TimeoutError:
+        result.update(status="timeout", error=f"timed out after {timeout:g}s")
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    result["response"] = turns[-1]["response"] if turns else None
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def run_batch(prompts_path: str, output_path: str, concurrency: int, timeout: float,
+                    callbacks: Optional[list] = None) -> int:
+    """
+    Run every job in prompts_path on `concurrency` workers and append one JSON line per
+    finished job to output_path, in completion order. Returns the number of failed jobs.
+    The prompts file is checked to be readable UTF-8 before output_path is truncated.
+    """
+    with open(prompts_path, 'r', encoding='utf-8') as f:
+        for _ in f:  # Streams: raises OSError/UnicodeDecodeError now rather than mid-batch
+            pass
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)  # Jobs are read as workers free up
+    counts = {"ok": 0, "error": 0, "timeout": 0}
+    latencies: List[float] = []
+    start = time.perf_counter()
+
+    async def worker(output) -> None:
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            result = await run_job(job, timeout, callbacks)
+            counts[result["status"]] += 1
+            latencies.append(result["elapsed_ms"])
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            print(f"[{result['status']}] job {result['id']} in {result['elapsed_ms'] / 1000:.1f}s")
+
+    with open(output_path, 'w', encoding='utf-8') as output:
+        workers = [asyncio.create_task(worker(output)) for _ in range(concurrency)]
+        for job in read_jobs(prompts_path):
+            await queue.put(job)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"Batch done: {total} job(s) in {time.perf_counter() - start:.1f}s - "
+          f"{counts['ok']} ok, {counts['error']} error(s), {counts['timeout']} timeout(s)")
+    if latencies:
+        print(f"Job latency: median {latencies[total // 2] / 1000:.1f}s, "
+              f"p95 {latencies[min(int(total * 0.95), total - 1)] / 1000:.1f}s. Results in '{output_path}'.")
+    return counts["error"] + counts["timeout"]
+
+
+class TokenPrinter:
+    """Prints streamed tokens as they arrive and remembers whether any were printed."""
+
+    def __init__(self):
+        self.printed = False
+
+    def __call__(self, token: str) -> None:
+        print(token, end="", flush=True)
+        self.printed = True
+
+
+async def main(args: argparse.Namespace) -> None:
+    tracer = AgentTracer(args.trace) if args.trace or args.profile else None
+    callbacks = [tracer] if tracer else None
+
+    if args.batch:
+        try:
+            failures = await run_batch(args.batch, args.output, args.concurrency, args.timeout, callbacks)
+        except (OSError, ValueError) as e:  # ValueError covers UnicodeDecodeError
+            print(f"Error: {e}")
+            sys.exit(1)
+        finally:
+            if LLM_CACHE is not None:
+                print(format_stats(LLM_CACHE.stats()))
+            if tracer:
+                tracer.close()
+        sys.exit(1 if failures else 0)
+
     print("=" * 60)
     print("DataGen Agent - Sample Data Generator")
     print("=" * 60)
@@ -139,20 +701,51 @@ if __name__ == "__main__":
     print("Commands: 'quit' or 'exit' to end")
     print("=" * 60)
 
-    history: List[BaseMessage] = []
+    history = ConversationHistory()
 
     while True:
-        user_input = input("You: ").strip()
+        user_input = (await asyncio.to_thread(input, "You: ")).strip()
 
         # Check for exit commands
         if user_input.lower() in ['quit', 'exit', 'q', ""]:
+            if LLM_CACHE is not None:
+                print(format_stats(LLM_CACHE.stats()))
+            if tracer:
+                tracer.close()
+                if args.trace:
+                    print(f"Trace written to '{args.trace}'.")
             print("Goodbye!")
             break
 
         print("Agent: ", end="", flush=True)
-        response = run_agent(user_input, history)
-        print(response.content)
+        printer = TokenPrinter()
+        response = await arun_agent(user_input, history.messages(), on_token=printer, callbacks=callbacks)
+        if not printer.printed:
+            print(response.content, end="")  # Nothing streamed, e.g. an error reply
         print()
+        if args.profile and tracer.turn_breakdown():
+            print(format_breakdown(tracer.turn_breakdown()))
+        print()
+
+        # Update conversation history (older turns are folded into a summary)
+        await history.aadd_turn(user_input, response)
 
-        # Update conversation history
-        history += [HumanMessage(content=user_input), response]
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="DataGen agent - sample data generator.")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Write a step-level trace: Chrome trace format for *.json, JSON Lines otherwise")
+    parser.add_argument("--profile", action="store_true", help="Print a latency breakdown after every turn")
+    parser.add_argument("--batch", metavar="PROMPTS",
+                        help="Run the prompts in this file non-interactively (one per line, or JSONL jobs)")
+    parser.add_argument("--output", default="results.jsonl", help="Batch results file (JSON Lines)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_DEFAULT_CONCURRENCY, help="Batch jobs run at once")
+    parser.add_argument("--timeout", type=float, default=BATCH_DEFAULT_TIMEOUT, help="Seconds allowed per batch job")
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.timeout <= 0:
+        parser.error("--concurrency must be at least 1 and --timeout positive")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
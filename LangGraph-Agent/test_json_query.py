@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from json_query import ValueTooLarge, query_file
+
+USERS = {"users": [{"id": 1, "tags": [1, 2]}, {"id": 2, "tags": []}, {"id": 3, "tags": [3]}], "matrix": [[1, 2], [3]]}
+
+
+@pytest.fixture
+def users_file(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(USERS), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("users[0:3].tags", [[1, 2], [], [3]]),
+    ("users[*].tags", [[1, 2], [], [3]]),
+    ("users[1].tags", [[]]),
+    ("matrix[0:2]", [[1, 2], [3]]),
+    ("matrix", [[1, 2], [3]]),
+    ("users[0].tags[0:2]", [1, 2]),
+])
+def test_array_valued_projections_are_returned_whole(users_file, path, expected):
+    assert list(query_file(users_file, path, 1000)) == expected
+
+
+def test_names_only_path_expands_terminal_array(users_file):
+    assert list(query_file(users_file, "users", 1000)) == USERS["users"]
+    assert list(query_file(users_file, "users[0].tags", 1000)) == [[1, 2]]
+
+
+def test_offset_pages_over_projected_arrays(users_file):
+    assert list(query_file(users_file, "users[*].tags", 1000, offset=1)) == [[], [3]]
+
+
+def test_projected_array_over_limit_is_too_large(users_file):
+    (value,) = query_file(users_file, "users[0].tags", 3)
+    assert isinstance(value, ValueTooLarge) and value.size == len("[1, 2]")
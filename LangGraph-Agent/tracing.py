@@ -0,0 +1,246 @@
+"""
+Step-level tracing and latency profiling for the DataGen agent.
+
+AgentTracer is a LangChain callback handler: pass it in the run config
+(config={"callbacks": [tracer]}) and it records a span for every agent turn (the
+LangGraph run), every graph node step (agent, tools), every chat model call (with
+token counts) and every tool call, plus retries and errors.
+
+Spans are streamed to a trace file as they finish:
+    *.json  - Chrome trace event format (open in chrome://tracing or ui.perfetto.dev);
+              written as a JSON array whose closing bracket is optional, so a trace
+              from a crashed run still loads
+    other   - JSON Lines, one span per line
+
+turn_breakdown() splits a turn's wall time into model time, tool time (concurrent
+tool calls counted once) and the remaining graph overhead.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import json
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TURN, NODE, LLM, TOOL = "turn", "node", "llm", "tool"
+
+
+def _interval_union(intervals: List[Tuple[float, float]]) -> float:
+    """Total length covered by (start, end) intervals, overlaps counted once."""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+class AgentTracer(BaseCallbackHandler):
+    """
+    Records per-turn, per-node, per-model-call and per-tool spans of agent runs.
+
+    Safe to share between concurrent runs: spans are grouped by the turn (root run)
+    they belong to.
+    """
+
+    run_inline = True  # Keep event order in async runs; the handler only does bookkeeping
+
+    def __init__(self, trace_path: Optional[str] = None):
+        self.trace_path = trace_path
+        self.chrome = trace_path is not None and trace_path.endswith(".json")
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open: Dict[UUID, Dict[str, Any]] = {}  # run_id -> open span
+        self._root_of: Dict[UUID, UUID] = {}  # run_id -> turn run_id, for every run seen
+        self._turn_spans: Dict[UUID, List[Dict[str, Any]]] = {}  # turn run_id -> finished spans
+        self._lanes: List[float] = []  # Chrome thread lanes for tool calls: end time of the last span
+        self.turns: List[Dict[str, Any]] = []  # Finished turn breakdowns, in completion order
+        self._file = None
+        if trace_path:
+            self._file = open(trace_path, "w", encoding="utf-8")
+            if self.chrome:
+                self._file.write("[\n")
+
+    # -------- Span bookkeeping --------
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._origin) * 1000
+
+    def _register(self, run_id: UUID, parent_run_id: Optional[UUID]) -> UUID:
+        root = self._root_of.get(parent_run_id, parent_run_id) if parent_run_id else run_id
+        self._root_of[run_id] = root
+        return root
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind: str, name: str, **fields: Any) -> None:
+        with self._lock:
+            root = self._register(run_id, parent_run_id)
+            self._open[run_id] = {"kind": kind, "name": name, "run_id": str(run_id), "turn": str(root),
+                                  "start_ms": self._now_ms(), "retries": 0, **fields}
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **fields: Any) -> None:
+        with self._lock:
+            span = self._open.pop(run_id, None)
+            root = self._root_of.get(run_id)
+            if span is None:
+                if run_id != root:
+                    self._root_of.pop(run_id, None)
+                return
+            span["duration_ms"] = self._now_ms() - span["start_ms"]
+            span.update(fields)
+            if error is not None:
+                span["error"] = f"{type(error).__name__}: {error}"
+            self._turn_spans.setdefault(root, []).append(span)
+            self._write(span)
+            if span["kind"] == TURN:
+                self.turns.append(self._breakdown(self._turn_spans.pop(root)))
+                self._root_of = {run: turn for run, turn in self._root_of.items() if turn != root}
+
+    def _write(self, span: Dict[str, Any]) -> None:
+        if self._file is None:
+            return
+        if self.chrome:
+            event = {"name": span["name"], "cat": span["kind"], "ph": "X", "pid": 1, "tid": self._lane(span),
+                     "ts": round(span["start_ms"] * 1000), "dur": round(span["duration_ms"] * 1000),
+                     "args": {key: value for key, value in span.items()
+                              if key not in ("name", "kind", "start_ms", "duration_ms")}}
+            self._file.write(json.dumps(event) + ",\n")
+        else:
+            self._file.write(json.dumps(span) + "\n")
+        self._file.flush()
+
+    def _lane(self, span: Dict[str, Any]) -> int:
+        """Turns, nodes and model calls nest on lane 1; overlapping tool calls get their own lanes."""
+        if span["kind"] != TOOL:
+            return 1
+        for lane, busy_until in enumerate(self._lanes):
+            if busy_until <= span["start_ms"]:
+                break
+        else:
+            lane = len(self._lanes)
+            self._lanes.append(0.0)
+        self._lanes[lane] = span["start_ms"] + span["duration_ms"]
+        return lane + 2
+
+    # -------- Callbacks --------
+    def on_chain_start(self, serialized: Optional[Dict[str, Any]], inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        metadata = metadata or {}
+        if parent_run_id is None:
+            self._start(run_id, None, TURN, kwargs.get("name") or "agent")
+        elif parent_run_id == self._root_of.get(parent_run_id) and "langgraph_node" in metadata:
+            self._start(run_id, parent_run_id, NODE, metadata["langgraph_node"], step=metadata.get("langgraph_step"))
+        else:
+            with self._lock:
+                self._register(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized: Optional[Dict[str, Any]], messages: List[List[Any]], *,
+                            run_id: UUID, parent_run_id: Optional[UUID] = None,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        self._start(run_id, parent_run_id, LLM, metadata.get("ls_model_name") or kwargs.get("name") or "chat_model",
+                    step=metadata.get("langgraph_step"), messages=sum(len(batch) for batch in messages))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not input_tokens and not output_tokens:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens, output_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Optional[Dict[str, Any]], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, TOOL, name, input_chars=len(input_str))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, output_chars=len(str(getattr(output, "content", output))))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            if run_id in self._open:
+                self._open[run_id]["retries"] += 1
+
+    # -------- Reporting --------
+    def _breakdown(self, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        turn = next(span for span in spans if span["kind"] == TURN)
+        llm = [span for span in spans if span["kind"] == LLM]
+        tools = [span for span in spans if span["kind"] == TOOL]
+        node_intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for span in spans:
+            if span["kind"] == NODE:  # Parallel tool calls run as concurrent "tools" node tasks
+                interval = (span["start_ms"], span["start_ms"] + span["duration_ms"])
+                node_intervals.setdefault(span["name"], []).append(interval)
+        per_tool: Dict[str, List[float]] = {}
+        for span in tools:
+            per_tool.setdefault(span["name"], []).append(span["duration_ms"])
+        llm_ms = sum(span["duration_ms"] for span in llm)
+        tool_wall_ms = _interval_union([(span["start_ms"], span["start_ms"] + span["duration_ms"]) for span in tools])
+        return {
+            "turn": turn["turn"],
+            "total_ms": turn["duration_ms"],
+            "llm_ms": llm_ms,
+            "llm_calls": len(llm),
+            "input_tokens": sum(span.get("input_tokens", 0) for span in llm),
+            "output_tokens": sum(span.get("output_tokens", 0) for span in llm),
+            "tool_ms": tool_wall_ms,
+            "tool_calls": len(tools),
+            "overhead_ms": max(turn["duration_ms"] - llm_ms - tool_wall_ms, 0.0),
+            "nodes_ms": {name: _interval_union(intervals) for name, intervals in node_intervals.items()},
+            "tools_ms": {name: sum(durations) for name, durations in per_tool.items()},
+            "tools_count": {name: len(durations) for name, durations in per_tool.items()},
+            "retries": sum(span["retries"] for span in spans),
+            "errors": sum(1 for span in spans if "error" in span),
+            "error": turn.get("error"),
+        }
+
+    def turn_breakdown(self) -> Optional[Dict[str, Any]]:
+        """Breakdown of the most recently finished turn, or None."""
+        with self._lock:
+            return self.turns[-1] if self.turns else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def format_breakdown(breakdown: Dict[str, Any]) -> str:
+    """Multi-line, human-readable latency breakdown of one turn."""
+    lines = [
+        f"Turn: {breakdown['total_ms'] / 1000:.2f}s total | "
+        f"LLM {breakdown['llm_ms'] / 1000:.2f}s ({breakdown['llm_calls']} calls, "
+        f"{breakdown['input_tokens']} in / {breakdown['output_tokens']} out tokens) | "
+        f"tools {breakdown['tool_ms'] / 1000:.2f}s ({breakdown['tool_calls']} calls) | "
+        f"graph overhead {breakdown['overhead_ms'] / 1000:.2f}s"
+    ]
+    if breakdown["nodes_ms"]:
+        lines.append("  nodes: " + ", ".join(f"{name} {ms / 1000:.2f}s" for name, ms in breakdown["nodes_ms"].items()))
+    for name, ms in breakdown["tools_ms"].items():
+        lines.append(f"  tool {name}: {breakdown['tools_count'][name]} call(s), {ms / 1000:.2f}s")
+    if breakdown["retries"] or breakdown["errors"]:
+        lines.append(f"  retries: {breakdown['retries']}, errors: {breakdown['errors']}")
+    return "\n".join(lines)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Script: bench_embeddings.py
+Description:
+  Benchmarks the embedding models tried in vector.py on this machine, to pick the
+  default model for CPU-only nodes from measurements instead of guesswork.
+
+  For each model it records:
+    * load time and resident memory added by loading the model (the one-time import
+      of torch and sentence-transformers is measured and reported separately, so the
+      first model is not charged for it);
+    * encode throughput (texts/sec) for every combination of --batch-sizes and
+      --threads (torch intra-op threads);
+    * retrieval quality on the bundled labelled set retrieval_eval.json:
+      recall@1, recall@3 and mean reciprocal rank (MRR).
+
+  Models are only loaded from the local Hugging Face cache, never downloaded. A
+  model whose weights are not cached (or when sentence-transformers is missing) is
+  replaced by a deterministic stub encoder - hashed bag-of-words vectors - so the
+  harness itself always runs; stub rows are marked and never recommended.
+
+Usage:
+  $ python bench_embeddings.py [--models M1 M2 ...] [--batch-sizes 1 16 64] [--threads 1 2 4]
+        [--texts N] [--json results.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_MODELS = (
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "google/embeddinggemma-300m",
+    "Qwen/Qwen3-Embedding-0.6B",
+)
+DEFAULT_BATCH_SIZES = (1, 16, 64)
+DEFAULT_THREADS = (1, os.cpu_count() or 1)
+DEFAULT_THROUGHPUT_TEXTS = 256
+EVAL_SET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_eval.json")
+STUB_DIMENSION = 384
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer: each word maps to a fixed
+    pseudo-random vector (seeded by its hash) and a text is the normalised sum of
+    its words. Word overlap therefore still ranks documents sensibly.
+    """
+
+    def __init__(self, dimension=STUB_DIMENSION):
+        self.dimension = dimension
+        self._word_vectors = {}
+
+    def _word_vector(self, word):
+        vector = self._word_vectors.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            self._word_vectors[word] = vector
+        return vector
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD_PATTERN.findall(text.lower()):
+                vectors[row] += self._word_vector(word)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+def resident_memory_bytes():
+    """
+    Returns the current resident set size of this process, or None if unknown.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def weights_cached(model_name):
+    """
+    True if the model's files are in the local Hugging Face cache.
+    """
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    return isinstance(try_to_load_from_cache(model_name, "config.json"), str)
+
+
+def import_library():
+    """
+    Imports sentence_transformers (and with it torch) ahead of the first timed load.
+
+    Returns:
+        (import seconds, resident bytes added or None), or None if the import failed
+    """
+    before = resident_memory_bytes()
+    start = time.perf_counter()
+    try:
+        import sentence_transformers  # noqa: F401
+    except Exception as e:
+        print(f"WARNING: Could not import sentence-transformers ({e}); cached models will use the stub encoder.")
+        return None
+    import_seconds = time.perf_counter() - start
+    after = resident_memory_bytes()
+    return import_seconds, (after - before if before is not None and after is not None else None)
+
+
+def load_encoder(model_name):
+    """
+    Loads a model from local files only, falling back to the stub encoder.
+
+    Returns:
+        (encoder, is_stub, load seconds, resident bytes added or None)
+    """
+    cached = weights_cached(model_name)
+    before = resident_memory_bytes()
+    start = time.perf_counter()
+    encoder, is_stub = None, True
+    if cached:
+        try:
+            from sentence_transformers import SentenceTransformer
+            encoder = SentenceTransformer(model_name, device="cpu", local_files_only=True)
+            is_stub = False
+        except Exception as e:
+            print(f"WARNING: Could not load '{model_name}' from the local cache ({e}); using the stub encoder.")
+    if encoder is None:
+        encoder = StubEncoder()
+    load_seconds = time.perf_counter() - start
+    after = resident_memory_bytes()
+    return encoder, is_stub, load_seconds, (after - before if before is not None and after is not None else None)
+
+
+def set_threads(count):
+    """
+    Sets torch's intra-op thread count, if torch is loaded.
+
+    Returns:
+        True if the setting took effect.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return False
+    torch.set_num_threads(count)
+    return True
+
+
+def measure_throughput(encoder, texts, batch_size):
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # Warm-up
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def evaluate_retrieval(encoder, eval_set):
+    """
+    Ranks every document for every labelled query by cosine similarity.
+
+    Returns:
+        Dict with recall@1, recall@3 and MRR over the queries.
+    """
+    documents = eval_set["documents"]
+    doc_ids = np.array([document["id"] for document in documents])
+    doc_vectors = np.asarray(encoder.encode([document["text"] for document in documents]), dtype=np.float32)
+    query_vectors = np.asarray(encoder.encode([query["text"] for query in eval_set["queries"]]), dtype=np.float32)
+    doc_vectors /= np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    recall_1 = recall_3 = reciprocal_rank = 0.0
+    for query, ranking in zip(eval_set["queries"], np.argsort(-(query_vectors @ doc_vectors.T), axis=1)):
+        ranked_ids = doc_ids[ranking]
+        relevant = set(query["relevant"])
+        recall_1 += len(relevant & set(ranked_ids[:1])) / len(relevant)
+        recall_3 += len(relevant & set(ranked_ids[:3])) / min(len(relevant), 3)
+        first_hit = next(rank for rank, doc_id in enumerate(ranked_ids, 1) if doc_id in relevant)
+        reciprocal_rank += 1 / first_hit
+    count = len(eval_set["queries"])
+    return {"recall@1": recall_1 / count, "recall@3": recall_3 / count, "mrr": reciprocal_rank / count}
+
+
+def benchmark_model(model_name, eval_set, batch_sizes, threads, throughput_texts):
+    print(f"INFO: Benchmarking '{model_name}'...")
+    encoder, is_stub, load_seconds, memory_bytes = load_encoder(model_name)
+    corpus = [document["text"] for document in eval_set["documents"]]
+    texts = [corpus[i % len(corpus)] + f" ({i})" for i in range(throughput_texts)]  # Defeat any caching
+
+    throughput = []
+    for thread_count in threads:
+        threads_applied = set_threads(thread_count)
+        for batch_size in batch_sizes:
+            rate = measure_throughput(encoder, texts, batch_size)
+            throughput.append({"threads": thread_count if threads_applied else None,
+                               "batch_size": batch_size, "texts_per_sec": rate})
+        if not threads_applied:
+            break  # Thread count has no effect without torch; measure once
+
+    return {
+        "model": model_name,
+        "stub": is_stub,
+        "load_seconds": load_seconds,
+        "memory_mb": memory_bytes / 2 ** 20 if memory_bytes is not None else None,
+        "throughput": throughput,
+        "quality": evaluate_retrieval(encoder, eval_set),
+    }
+
+
+def print_report(results):
+    print(f"\n{'model':<48}{'load s':>8}{'mem MB':>9}{'best texts/s':>14}{'R@1':>7}{'R@3':>7}{'MRR':>7}")
+    for result in results:
+        best = max(result["throughput"], key=lambda row: row["texts_per_sec"])
+        name = result["model"] + (" [stub]" if result["stub"] else "")
+        memory = f"{result['memory_mb']:.0f}" if result["memory_mb"] is not None else "n/a"
+        quality = result["quality"]
+        print(f"{name:<48}{result['load_seconds']:>8.2f}{memory:>9}{best['texts_per_sec']:>14.1f}"
+              f"{quality['recall@1']:>7.2f}{quality['recall@3']:>7.2f}{quality['mrr']:>7.2f}")
+
+    print(f"\n{'model':<48}{'threads':>8}{'batch':>7}{'texts/s':>10}")
+    for result in results:
+        for row in result["throughput"]:
+            threads = row["threads"] if row["threads"] is not None else "-"
+            print(f"{result['model']:<48}{threads:>8}{row['batch_size']:>7}{row['texts_per_sec']:>10.1f}")
+
+
+def recommend(results):
+    """
+    Picks the real (non-stub) model with the best MRR; among models within 0.02 MRR
+    of it, the fastest wins.
+
+    Returns:
+        The chosen result dict, or None if no real model was measured.
+    """
+    real = [result for result in results if not result["stub"]]
+    if not real:
+        return None
+    best_mrr = max(result["quality"]["mrr"] for result in real)
+    contenders = [result for result in real if result["quality"]["mrr"] >= best_mrr - 0.02]
+    return max(contenders, key=lambda result: max(row["texts_per_sec"] for row in result["throughput"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding models: load time, memory, throughput, retrieval quality.")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), help="Hugging Face model ids")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(DEFAULT_BATCH_SIZES), help="Encode batch sizes")
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted(set(DEFAULT_THREADS)), help="Torch thread counts")
+    parser.add_argument("--texts", type=int, default=DEFAULT_THROUGHPUT_TEXTS, help="Texts per throughput measurement")
+    parser.add_argument("--eval-set", default=EVAL_SET_PATH, help="Labelled retrieval set (JSON)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the raw results as JSON")
+    args = parser.parse_args()
+    if min(args.batch_sizes + args.threads + [args.texts]) < 1:
+        parser.error("--batch-sizes, --threads and --texts must be at least 1")
+
+    try:
+        with open(args.eval_set, "r", encoding="utf-8") as f:
+            eval_set = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Cannot read evaluation set '{args.eval_set}'. Exception: {e}")
+        sys.exit(1)
+
+    if any(weights_cached(model) for model in args.models):
+        imported = import_library()
+        if imported is not None:
+            import_seconds, memory_bytes = imported
+            memory = f"+{memory_bytes / 2 ** 20:.0f} MB resident" if memory_bytes is not None else "memory not measured"
+            print(f"INFO: Imported torch and sentence-transformers in {import_seconds:.2f}s ({memory}); "
+                  f"not included in the per-model load figures.")
+
+    results = [benchmark_model(model, eval_set, args.batch_sizes, args.threads, args.texts) for model in args.models]
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nINFO: Raw results written to '{args.json}'.")
+
+    choice = recommend(results)
+    if choice is None:
+        print("\nWARNING: No model weights found in the local cache; only the stub encoder was measured.")
+    else:
+        best = max(choice["throughput"], key=lambda row: row["texts_per_sec"])
+        print(f"\nSUCCESS: Recommended default: '{choice['model']}' (MRR {choice['quality']['mrr']:.2f}, "
+              f"{best['texts_per_sec']:.0f} texts/s at batch {best['batch_size']}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Script: chunker.py
+Description:
+  Document chunking with per-chunk content hashes, and the bookkeeping that lets a
+  slowly changing corpus be re-ingested in time proportional to what changed.
+
+  Chunker splits text into overlapping windows of characters, sentences or tokens
+  (whitespace-delimited words, a close and dependency-free proxy for model tokens).
+  Each chunk's ID is derived from its document key and the SHA-256 of its text, so
+  an unchanged chunk keeps its ID even when an edit elsewhere shifts its position.
+  Chunk metadata gains two reserved fields, "_chunk" (position) and "_document"
+  (document key); input metadata using either name is rejected.
+
+  ChunkManifest (SQLite) remembers, per document, a hash of its text and chunking
+  settings and the IDs of its chunks. plan_document() compares a document against
+  the manifest and returns only the work to do:
+    * nothing, if the document hash is unchanged;
+    * new chunks to embed and upsert;
+    * chunks that only moved (or whose document metadata changed), whose metadata is
+      updated without re-embedding;
+    * stale chunk IDs to delete.
+
+Usage (show how a file would be chunked):
+  $ python chunker.py FILE [--chunk-by sentences|tokens|chars] [--size N] [--overlap N]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+
+CHUNK_MODES = ("chars", "sentences", "tokens")
+DEFAULT_CHUNK_MODE = "chars"
+DEFAULT_SIZES = {"chars": (1000, 200), "sentences": (5, 1), "tokens": (200, 40)}  # (size, overlap) per mode
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")  # After terminal punctuation, or a blank line
+TOKEN_PATTERN = re.compile(r"\S+")
+CHUNK_FIELD = "_chunk"  # Reserved chunk metadata: position within the document
+DOCUMENT_FIELD = "_document"  # Reserved chunk metadata: document key
+
+
+class Chunk:
+    """
+    One unit of ingest: the text that is embedded, its stable ID and its metadata.
+    """
+
+    __slots__ = ("id", "text", "metadata", "document_id")
+
+    def __init__(self, id, text, metadata, document_id):
+        self.id = id
+        self.text = text
+        self.metadata = metadata
+        self.document_id = document_id
+
+
+def content_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(document_key, text, occurrence=0):
+    """
+    Returns a chunk ID that only depends on the document and the chunk's content
+    (occurrence tells apart identical chunks within one document).
+    """
+    prefix = hashlib.sha1(document_key.encode("utf-8")).hexdigest()[:16]
+    suffix = f"-{occurrence}" if occurrence else ""
+    return f"{prefix}-{content_digest(text)[:16]}{suffix}"
+
+
+def chunk_chars(text, size, overlap):
+    """
+    Splits text into windows of at most `size` characters, each starting `overlap`
+    characters before the previous one ended. Window ends are moved back to the
+    last whitespace when there is one, so words are not cut.
+    """
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            space = max(text.rfind(" ", start + overlap + 1, end), text.rfind("\n", start + overlap + 1, end))
+            if space != -1:
+                end = space
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+
+def windows(units, size, overlap, separator):
+    """
+    Joins consecutive units into windows of `size` units that share `overlap` units.
+    """
+    step = size - overlap
+    for start in range(0, len(units), step):
+        yield separator.join(units[start:start + size])
+        if start + size >= len(units):
+            break
+
+
+class Chunker:
+    """
+    Splits documents into overlapping chunks by characters, sentences or tokens.
+    """
+
+    def __init__(self, mode=DEFAULT_CHUNK_MODE, size=None, overlap=None):
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"unknown chunk mode '{mode}' (choose from: {', '.join(CHUNK_MODES)})")
+        default_size, default_overlap = DEFAULT_SIZES[mode]
+        self.mode = mode
+        self.size = default_size if size is None else size
+        self.overlap = default_overlap if overlap is None else overlap
+        if self.size < 1 or not 0 <= self.overlap < self.size:
+            raise ValueError("chunk size must be at least 1 and overlap between 0 and size - 1")
+
+    def settings(self):
+        """Identifies the chunking settings; changing them re-chunks every document."""
+        return f"{self.mode}:{self.size}:{self.overlap}"
+
+    def split(self, text):
+        if self.mode == "chars":
+            return list(chunk_chars(text, self.size, self.overlap))
+        if self.mode == "sentences":
+            return list(windows(split_sentences(text), self.size, self.overlap, " "))
+        return list(windows(TOKEN_PATTERN.findall(text), self.size, self.overlap, " "))
+
+    def chunks(self, document_key, text, metadata):
+        """
+        Returns the document's chunks with content-derived IDs; metadata gains the
+        chunk position (CHUNK_FIELD) and the document key (DOCUMENT_FIELD).
+
+        Raises:
+            ValueError: if metadata already uses one of those reserved names.
+        """
+        reserved = [field for field in (CHUNK_FIELD, DOCUMENT_FIELD) if field in metadata]
+        if reserved:
+            raise ValueError(f"document '{document_key}' has metadata field(s) reserved for chunking: "
+                             f"{', '.join(reserved)}")
+        occurrences = {}
+        chunks = []
+        for index, piece in enumerate(self.split(text)):
+            occurrence = occurrences[piece] = occurrences.get(piece, -1) + 1
+            chunks.append(Chunk(chunk_id(document_key, piece, occurrence), piece,
+                                dict(metadata, **{CHUNK_FIELD: index, DOCUMENT_FIELD: document_key}), document_key))
+        return chunks
+
+
+class ChunkManifest:
+    """
+    Per-document record of what is in the collection: document hash, metadata
+    (as canonical JSON) and {chunk ID: position}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " key TEXT PRIMARY KEY, hash TEXT NOT NULL, metadata TEXT NOT NULL, chunks TEXT NOT NULL)"
+            )
+
+    def get(self, key):
+        """
+        Returns:
+            (document hash, metadata JSON, {chunk ID: position}), or (None, None, {})
+            for an unknown document.
+        """
+        row = self._db.execute("SELECT hash, metadata, chunks FROM documents WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1], json.loads(row[2])) if row else (None, None, {})
+
+    def put_many(self, entries):
+        """Stores (key, document hash, metadata JSON, {chunk ID: position}) entries in one transaction."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                ((key, digest, metadata, json.dumps(chunks)) for key, digest, metadata, chunks in entries),
+            )
+
+    def delete_many(self, keys):
+        with self._db:
+            self._db.executemany("DELETE FROM documents WHERE key = ?", ((key,) for key in keys))
+
+    def keys(self):
+        return [key for (key,) in self._db.execute("SELECT key FROM documents")]
+
+    def close(self):
+        self._db.close()
+
+
+class DocumentPlan:
+    """
+    The changes needed to bring one document's chunks in the collection up to date.
+    """
+
+    __slots__ = ("key", "unchanged", "new_chunks", "moved", "stale_ids", "entry")
+
+    def __init__(self, key, unchanged, new_chunks=(), moved=(), stale_ids=(), entry=None):
+        self.key = key
+        self.unchanged = unchanged
+        self.new_chunks = list(new_chunks)  # Dropped (set to None) by the caller once upserted
+        self.moved = list(moved)  # (chunk ID, metadata) of stored chunks whose position or metadata changed
+        self.stale_ids = list(stale_ids)
+        self.entry = entry  # Manifest entry to store once the changes are applied
+
+
+def plan_document(key, text, metadata, chunker, manifest):
+    """
+    Compares a document with its manifest entry.
+
+    Returns:
+        DocumentPlan describing the chunks to embed, re-position and delete.
+    """
+    metadata_json = json.dumps(metadata, sort_keys=True)
+    digest = content_digest(f"{chunker.settings()}\n{metadata_json}\n{text}")
+    stored_digest, stored_metadata, stored_chunks = manifest.get(key)
+    if digest == stored_digest:
+        return DocumentPlan(key, unchanged=True)
+
+    chunks = chunker.chunks(key, text, metadata)
+    positions = {chunk.id: chunk.metadata[CHUNK_FIELD] for chunk in chunks}
+    new_chunks = [chunk for chunk in chunks if chunk.id not in stored_chunks]
+    moved = [(chunk.id, chunk.metadata) for chunk in chunks if chunk.id in stored_chunks
+             and (stored_chunks[chunk.id] != positions[chunk.id] or stored_metadata != metadata_json)]
+    stale_ids = [id for id in stored_chunks if id not in positions]
+    return DocumentPlan(key, False, new_chunks, moved, stale_ids, (key, digest, metadata_json, positions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how a text file is split into chunks.")
+    parser.add_argument("path", help="Text file to chunk")
+    parser.add_argument("--chunk-by", choices=CHUNK_MODES, default=DEFAULT_CHUNK_MODE, help="Window unit")
+    parser.add_argument("--size", type=int, default=None, help="Units per chunk (default depends on --chunk-by)")
+    parser.add_argument("--overlap", type=int, default=None, help="Units shared by adjacent chunks")
+    args = parser.parse_args()
+    try:
+        chunker = Chunker(args.chunk_by, args.size, args.overlap)
+        with open(args.path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    for chunk in chunker.chunks(args.path, text, {}):
+        print(f"--- {chunk.id} (chunk {chunk.metadata[CHUNK_FIELD]}, {len(chunk.text)} chars)")
+        print(chunk.text)
+
+
+if __name__ == "__main__":
+    main()
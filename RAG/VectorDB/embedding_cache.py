@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Script: embedding_cache.py
+Description:
+  A batched, cached embedding layer for the ChromaDB examples in vector.py.
+
+  Every text is identified by (model name, SHA-256 of its UTF-8 content). Vectors
+  are kept in an SQLite file as raw float32 blobs, so re-ingesting the same
+  documents - in this process or the next - only runs the model on text it has
+  never seen. Within one call duplicate texts are embedded once, and the misses
+  are sent to the model in fixed-size batches.
+
+  CachedEmbeddingFunction fits Chroma's `embedding_function` slot:
+
+      from embedding_cache import CachedEmbeddingFunction
+
+      embedding_function = CachedEmbeddingFunction("all-MiniLM-L6-v2", cache_path="embeddings.db")
+      collection = chroma_client.get_or_create_collection(
+          name="my_rag_collection", embedding_function=embedding_function
+      )
+
+Usage (demo: embeds the given texts twice and reports cache hits):
+  $ python embedding_cache.py [--model NAME] [--cache PATH] [--batch-size N] "text one" "text two" ...
+"""
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from embedding_server import load_encoder
+
+try:
+    from chromadb.api.types import EmbeddingFunction
+except ImportError:  # Chroma is optional; the cache works with any caller
+    EmbeddingFunction = object
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_CACHE_PATH = "embeddings.db"
+DEFAULT_BATCH_SIZE = 64
+SQLITE_MAX_VARIABLES = 900  # Stay under SQLite's bound-parameter limit in IN (...) lookups
+
+
+def content_hash(text):
+    """
+    Returns the SHA-256 digest identifying a text's content.
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    On-disk vector store keyed by (model, content hash), backed by SQLite.
+
+    One connection is shared by all threads, serialised by a lock.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, hashes):
+        """
+        Looks up stored vectors.
+
+        Returns:
+            Dict of hash -> float32 vector for the hashes that are stored.
+        """
+        found = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), SQLITE_MAX_VARIABLES):
+            chunk = hashes[start:start + SQLITE_MAX_VARIABLES]
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                    (model, *chunk),
+                ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """
+        Stores (hash, vector) pairs in one transaction.
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                ((model, digest, np.asarray(vector, dtype=np.float32).tobytes()) for digest, vector in items),
+            )
+
+    def close(self):
+        self._db.close()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma-compatible embedding function that consults an EmbeddingStore first.
+
+    The encoder comes from embedding_server.load_encoder: a running embedding
+    daemon if there is one, else a model that is only loaded when a text misses
+    the cache, so a fully cached re-ingest never pays the model load time. Safe
+    to call from several threads at once.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, cache_path=DEFAULT_CACHE_PATH, batch_size=DEFAULT_BATCH_SIZE,
+                 normalize_embeddings=False, store=None, encoder=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize_embeddings = normalize_embeddings
+        self.store = store if store is not None else EmbeddingStore(cache_path)
+        self._encoder = encoder
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def encoder(self):
+        with self._lock:
+            if self._encoder is None:
+                self._encoder = load_encoder(self.model_name)
+        return self._encoder
+
+    def _encode(self, texts):
+        start = time.perf_counter()
+        vectors = self.encoder.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=self.normalize_embeddings,
+            convert_to_numpy=True, show_progress_bar=False,
+        )
+        with self._lock:
+            self.encode_seconds += time.perf_counter() - start
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed(self, texts):
+        """
+        Embeds texts, reusing cached vectors and embedding each distinct miss once.
+
+        Returns:
+            List of float32 vectors, one per input text, in input order.
+        """
+        hashes = [content_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))  # In-call dedup, first occurrence wins
+        vectors = self.store.get_many(self.model_name, unique)
+        missing = [digest for digest in unique if digest not in vectors]
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            encoded = self._encode([unique[digest] for digest in batch])
+            self.store.put_many(self.model_name, zip(batch, encoded))
+            vectors.update(zip(batch, encoded))
+        return [vectors[digest] for digest in hashes]
+
+    def __call__(self, input):
+        return self.embed(list(input))
+
+    @staticmethod
+    def name():
+        return "cached_sentence_transformer"
+
+    def get_config(self):
+        return {"model_name": self.model_name, "cache_path": self.store.path, "batch_size": self.batch_size,
+                "normalize_embeddings": self.normalize_embeddings}
+
+    @staticmethod
+    def build_from_config(config):
+        return CachedEmbeddingFunction(**config)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "stored_vectors": len(self.store),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed texts through the on-disk embedding cache.")
+    parser.add_argument("texts", nargs="+", help="Texts to embed")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"SentenceTransformer model (default: {DEFAULT_MODEL})")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help=f"SQLite cache file (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Texts per model call")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    embedding_function = CachedEmbeddingFunction(args.model, args.cache, args.batch_size)
+    for attempt in ("first", "second"):
+        start = time.perf_counter()
+        vectors = embedding_function(args.texts)
+        print(f"INFO: {attempt} pass: {len(vectors)} vector(s) of dimension {len(vectors[0])} "
+              f"in {time.perf_counter() - start:.3f}s")
+    print(f"INFO: Cache stats: {embedding_function.stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Script: embedding_server.py
+Description:
+  Lazy model loading and a resident embedding daemon for the scripts in this folder.
+
+  Importing torch and sentence_transformers and loading the weights takes seconds,
+  which dominates short CLI runs and worker processes. This module removes that cost
+  in two steps:
+
+  * LazyModel imports sentence_transformers and loads the model on the first
+    encode() call, not at construction, so code paths that never embed (cache hits,
+    --help, argument errors) never pay for it.
+  * `python embedding_server.py serve` keeps models resident behind a Unix socket.
+    EmbeddingClient talks to it with the same encode() signature as a
+    SentenceTransformer, so a short-lived script gets vectors in milliseconds.
+
+  load_encoder(model_name) returns an EmbeddingClient when a daemon is listening on
+  the socket (EMBEDDING_SOCKET, or DEFAULT_SOCKET_PATH) and a LazyModel otherwise;
+  embedding_cache.CachedEmbeddingFunction uses it, so ingest.py and friends pick up a
+  running daemon with no code changes. Texts are only sent to a socket owned by the
+  current user with mode 0600, so another local user cannot pose as the daemon by
+  creating the path in a shared directory such as /tmp first.
+
+  Wire format (both directions): 4-byte big-endian header length, JSON header, then
+  for responses the float32 vectors as raw bytes (header: {"shape": [rows, dim]}).
+
+Usage:
+  $ python embedding_server.py serve [--models M1 M2 ...] [--socket PATH] [--threads N]
+  $ python embedding_server.py encode [--model NAME] [--socket PATH] "text one" "text two" ...
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", f"embedding-{os.getuid()}.sock")
+SOCKET_ENV = "EMBEDDING_SOCKET"  # Overrides DEFAULT_SOCKET_PATH for clients and the server
+HEADER = struct.Struct(">I")
+MAX_HEADER_BYTES = 64 * 2 ** 20  # Requests carry the texts in the JSON header
+CONNECT_TIMEOUT = 0.2  # Seconds to wait for a daemon before falling back to a local model
+
+
+def socket_path(path=None):
+    return path or os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET_PATH
+
+
+class LazyModel:
+    """
+    SentenceTransformer stand-in that imports the library and loads the weights on
+    first use. encode() calls on one model are serialised.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, device=None):
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+                self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        model = self.load()
+        with self._lock:
+            vectors = model.encode(list(texts), batch_size=batch_size, normalize_embeddings=normalize_embeddings,
+                                   convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def send_message(connection, header, payload=b""):
+    data = json.dumps(header).encode("utf-8")
+    connection.sendall(HEADER.pack(len(data)) + data + payload)
+
+
+def receive_exactly(connection, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = connection.recv(min(size - len(buffer), 2 ** 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def receive_header(connection):
+    (size,) = HEADER.unpack(receive_exactly(connection, HEADER.size))
+    if size > MAX_HEADER_BYTES:
+        raise ValueError(f"message header of {size} bytes exceeds the {MAX_HEADER_BYTES} byte limit")
+    return json.loads(receive_exactly(connection, size))
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serves encode requests on one connection until the client closes it.
+    """
+
+    def handle(self):
+        while True:
+            try:
+                request = receive_header(self.request)
+            except (ConnectionError, struct.error):
+                return
+            except ValueError as e:
+                send_message(self.request, {"error": str(e)})
+                return
+            try:
+                if request.get("op") == "ping":
+                    send_message(self.request, {"models": self.server.loaded_models()})
+                    continue
+                model = self.server.model(request.get("model") or DEFAULT_MODEL)
+                vectors = model.encode(request["texts"], batch_size=request.get("batch_size", 32),
+                                       normalize_embeddings=request.get("normalize", False))
+            except Exception as e:
+                send_message(self.request, {"error": f"{type(e).__name__}: {e}"})
+                continue
+            send_message(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket daemon keeping one LazyModel per model name resident.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, models=()):
+        self._models = {}
+        self._models_lock = threading.Lock()
+        for name in models:
+            self.model(name).load()  # Warm start: pay the load before accepting clients
+        if os.path.exists(path):
+            if is_listening(path):
+                raise OSError(f"an embedding daemon is already listening on '{path}'")
+            os.unlink(path)  # Stale socket left by a daemon that did not shut down cleanly
+        previous_umask = os.umask(0o177)  # Socket is only usable by this user
+        try:
+            super().__init__(path, EmbeddingRequestHandler)
+        finally:
+            os.umask(previous_umask)
+
+    def model(self, name):
+        with self._models_lock:
+            if name not in self._models:
+                self._models[name] = LazyModel(name)
+            return self._models[name]
+
+    def loaded_models(self):
+        with self._models_lock:
+            return [name for name, model in self._models.items() if model.loaded]
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+class EmbeddingClient:
+    """
+    Encoder backed by a running embedding daemon; encode() mirrors SentenceTransformer.
+    One connection is kept open and shared by all threads, serialised by a lock.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, path=None, timeout=None):
+        self.model_name = model_name
+        self.path = socket_path(path)
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.path)
+            self._connection = connection
+        return self._connection
+
+    def request(self, header):
+        """
+        Sends one request and returns (response header, payload bytes).
+        """
+        with self._lock:
+            connection = self._connect()
+            try:
+                send_message(connection, header)
+                response = receive_header(connection)
+                payload = b""
+                if "shape" in response:
+                    rows, dimension = response["shape"]
+                    payload = receive_exactly(connection, rows * dimension * 4)
+            except (OSError, ValueError):
+                self.close()
+                raise
+        if "error" in response:
+            raise RuntimeError(f"embedding daemon error: {response['error']}")
+        return response, payload
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        response, payload = self.request({"op": "encode", "model": self.model_name, "texts": texts,
+                                          "batch_size": batch_size, "normalize": normalize_embeddings})
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+    def ping(self):
+        """Returns the names of the models the daemon has loaded."""
+        return self.request({"op": "ping"})[0]["models"]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def is_listening(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(CONNECT_TIMEOUT)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def is_private_socket(path):
+    """
+    True if path is a socket (not a symlink) owned by this user with mode 0600,
+    i.e. one that only this user's daemon can have created.
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid() and stat.S_IMODE(info.st_mode) == 0o600
+
+
+def load_encoder(model_name=DEFAULT_MODEL, path=None):
+    """
+    Returns an EmbeddingClient if this user's daemon is listening, else a LazyModel;
+    neither imports torch here.
+    """
+    path = socket_path(path)
+    if os.path.exists(path):
+        if not is_private_socket(path):
+            print(f"WARNING: Ignoring embedding socket '{path}': it must be a socket owned by this user "
+                  f"with mode 0600. Loading the model locally.")
+        elif is_listening(path):
+            return EmbeddingClient(model_name, path)
+    return LazyModel(model_name)
+
+
+def serve(args):
+    try:
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)  # Before any model loads, so preloaded ones use it too
+        server = EmbeddingServer(args.socket, args.models)
+    except Exception as e:
+        print(f"ERROR: Could not start the embedding daemon. Exception: {e}")
+        sys.exit(1)
+    print(f"INFO: Embedding daemon listening on '{args.socket}' with model(s): "
+          f"{', '.join(server.loaded_models()) or 'none preloaded'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("INFO: Shutting down.")
+    finally:
+        server.server_close()
+
+
+def encode(args):
+    start = time.perf_counter()
+    encoder = load_encoder(args.model, args.socket)
+    source = "daemon" if isinstance(encoder, EmbeddingClient) else "local model"
+    try:
+        vectors = encoder.encode(args.texts)
+    except Exception as e:
+        print(f"ERROR: Embedding failed. Exception: {e}")
+        sys.exit(1)
+    print(f"INFO: {len(vectors)} vector(s) of dimension {vectors.shape[1]} from the {source} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident embedding daemon on a Unix socket, and a client for it.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument("--models", nargs="*", default=[DEFAULT_MODEL], help="Models to load at startup")
+    serve_parser.add_argument("--socket", default=socket_path(), help="Unix socket path")
+    serve_parser.add_argument("--threads", type=int, default=None, help="Torch intra-op threads")
+
+    encode_parser = subparsers.add_parser("encode", help="Embed texts (through the daemon if one is running)")
+    encode_parser.add_argument("texts", nargs="+", help="Texts to embed")
+    encode_parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model name (default: {DEFAULT_MODEL})")
+    encode_parser.add_argument("--socket", default=socket_path(), help="Unix socket path")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        if args.threads is not None and args.threads < 1:
+            parser.error("--threads must be at least 1")
+        serve(args)
+    else:
+        encode(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Script: hybrid.py
+Description:
+  Hybrid lexical + dense retrieval for the RAG examples in vector.py.
+
+  BM25Index is an incrementally updated inverted index: each term keeps compact
+  postings (document numbers and term frequencies in typed arrays), so add/upsert/
+  delete only touch the terms of the changed documents, and a query only touches
+  the postings of its own terms. Deleted documents are tombstoned and swept out by
+  compact() once they make up a quarter of the index; a live-document mask keeps
+  them out of results and document frequencies in the meantime. Documents carry the
+  same ids and metadata as the Chroma collection, and `where` filters use the same
+  syntax; the rows matching recent filters are cached and kept up to date as
+  documents are added, so a repeated filter costs no Python work per document.
+
+  HybridRetriever combines BM25 with a dense backend (a Chroma collection or a
+  NumpyVectorIndex) in two ways:
+    * mode="rrf": both retrievers rank independently and the lists are merged with
+      reciprocal-rank fusion, score = sum of 1 / (RRF_K + rank);
+    * mode="rerank": BM25 acts as a cheap candidate generator and only its top
+      `candidates` documents are scored by the dense model, shrinking the dense pass
+      from the whole corpus to a few hundred rows.
+
+  from hybrid import BM25Index, ChromaDense, HybridRetriever
+  bm25 = BM25Index()
+  bm25.upsert(ids, documents_to_add, metadatas)
+  retriever = HybridRetriever(bm25, ChromaDense(collection))
+  results = retriever.query("What is the capital of France?", n_results=2, where={"source": "wikipedia"})
+"""
+
+import copy
+import json
+import math
+import pickle
+import re
+from array import array
+
+import numpy as np
+
+from npy_index import matches_filter, top_k
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")  # Keeps identifiers such as gpt-4o or v1.2.3 whole
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+DEFAULT_CANDIDATES = 200
+COMPACT_THRESHOLD = 0.25  # Fraction of tombstoned documents that triggers compaction
+FILTER_CACHE_SIZE = 64  # `where` filters whose matching rows are kept
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index over documents with string ids and metadata.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> (array of document numbers, array of term frequencies)
+        self.ids = []  # document number -> id (None once deleted)
+        self.metadatas = []
+        self.lengths = array("I")
+        self.number_of = {}  # id -> document number
+        self.live = array("B")  # document number -> 1 while not deleted
+        self.total_length = 0
+        self.deleted = 0
+        self._filter_rows = {}  # filter key -> array("B") of matching document numbers
+
+    def __len__(self):
+        return len(self.number_of)
+
+    def _add(self, id, text, metadata):
+        number = len(self.ids)
+        terms = tokenize(text)
+        frequencies = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = (array("I"), array("I"))
+            postings[0].append(number)
+            postings[1].append(frequency)
+        self.ids.append(id)
+        self.metadatas.append(metadata or {})
+        self.live.append(1)
+        for where, rows in self._filter_rows.values():
+            rows.append(matches_filter(self.metadatas[number], where))
+        self.lengths.append(len(terms))
+        self.number_of[id] = number
+        self.total_length += len(terms)
+
+    def delete(self, ids):
+        """
+        Removes documents by id (unknown ids are ignored). Their postings stay in
+        place as tombstones until the next compaction.
+        """
+        for id in ids:
+            number = self.number_of.pop(id, None)
+            if number is None:
+                continue
+            self.ids[number] = None
+            self.metadatas[number] = None
+            self.live[number] = 0
+            self.total_length -= self.lengths[number]
+            self.deleted += 1
+        if self.deleted > COMPACT_THRESHOLD * max(len(self.ids), 1):
+            self.compact()
+
+    def upsert(self, ids, documents, metadatas=None):
+        """
+        Adds documents, replacing any existing documents with the same ids.
+        """
+        ids = list(ids)
+        self.delete(id for id in ids if id in self.number_of)
+        for id, text, metadata in zip(ids, documents, metadatas or [None] * len(ids)):
+            self._add(id, text, metadata)
+
+    add = upsert
+
+    def compact(self):
+        """
+        Renumbers the live documents and drops tombstoned postings.
+        """
+        renumber = np.full(len(self.ids), -1, dtype=np.int64)
+        live = np.flatnonzero(self._live_mask())
+        renumber[live] = np.arange(len(live))
+        for term in list(self.postings):
+            numbers, frequencies = self.postings[term]
+            new_numbers = renumber[np.frombuffer(numbers, dtype=np.uint32)]
+            keep = new_numbers >= 0
+            if not keep.any():
+                del self.postings[term]
+                continue
+            self.postings[term] = (array("I", new_numbers[keep].astype(np.uint32).tobytes()),
+                                   array("I", np.frombuffer(frequencies, dtype=np.uint32)[keep].tobytes()))
+        self.ids = [self.ids[number] for number in live]
+        self.metadatas = [self.metadatas[number] for number in live]
+        self.lengths = array("I", np.frombuffer(self.lengths, dtype=np.uint32)[live].tobytes())
+        self.live = array("B", bytes([1]) * len(live))
+        for key, (where, rows) in self._filter_rows.items():
+            self._filter_rows[key] = (where, array("B", np.frombuffer(rows, dtype=np.uint8)[live].tobytes()))
+        self.number_of = {id: number for number, id in enumerate(self.ids)}
+        self.deleted = 0
+
+    def _live_mask(self):
+        return np.frombuffer(self.live, dtype=np.uint8).view(bool)
+
+    def _filter_mask(self, where):
+        """
+        Boolean mask of the document numbers whose metadata matches where. Computed
+        once per distinct filter, then extended by _add() as documents arrive.
+        """
+        key = json.dumps(where, sort_keys=True, default=repr)
+        cached = self._filter_rows.pop(key, None)
+        if cached is None:
+            rows = array("B", (metadata is not None and matches_filter(metadata, where) for metadata in self.metadatas))
+            cached = (copy.deepcopy(where), rows)  # The caller may reuse and mutate its dict
+        self._filter_rows[key] = cached  # Most recently used last
+        while len(self._filter_rows) > FILTER_CACHE_SIZE:
+            del self._filter_rows[next(iter(self._filter_rows))]
+        return np.frombuffer(cached[1], dtype=np.uint8).view(bool)
+
+    def scores(self, query, where=None, ids=None):
+        """
+        BM25 score of every document number for the query (0 for no match, -inf for
+        deleted or filtered-out documents).
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        if not self.number_of:
+            return scores
+        live = self._live_mask()
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32).astype(np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / (self.total_length / len(self.number_of)))
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            numbers = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+            live_count = np.count_nonzero(live[numbers])  # Tombstones do not count towards df
+            idf = math.log(1 + (len(self.number_of) - live_count + 0.5) / (live_count + 0.5))
+            scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + length_norm[numbers])
+
+        excluded = ~live
+        if where:
+            excluded |= ~self._filter_mask(where)
+        if ids is not None:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[[self.number_of[id] for id in ids if id in self.number_of]] = True
+            excluded |= ~allowed
+        scores[excluded] = -np.inf
+        return scores
+
+    def query(self, query, n_results=10, where=None, ids=None):
+        """
+        Returns [(id, score)] of the best-matching documents, best first; documents
+        sharing no term with the query are not returned.
+        """
+        scores = self.scores(query, where, ids)
+        numbers, best = top_k(scores[np.newaxis, :], n_results)
+        return [(self.ids[number], float(score)) for number, score in zip(numbers[0], best[0]) if score > 0]
+
+    def save(self, path):
+        state = {key: value for key, value in self.__dict__.items() if key != "_filter_rows"}
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index written by save() (pickle: only load files you wrote)."""
+        index = cls.__new__(cls)
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        if "live" not in index.__dict__:  # Saved before the live mask existed
+            index.live = array("B", (id is not None for id in index.ids))
+        index._filter_rows = {}
+        return index
+
+
+class ChromaDense:
+    """
+    Dense backend over a Chroma collection (which embeds the query itself).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def search(self, query, n_results, where=None, ids=None):
+        if ids is not None and not ids:
+            return []
+        results = self.collection.query(query_texts=[query], n_results=n_results, where=where, ids=ids,
+                                        include=["distances"])
+        return list(zip(results["ids"][0], results["distances"][0]))
+
+
+class NumpyDense:
+    """
+    Dense backend over a NumpyVectorIndex; embed(texts) must return query vectors.
+    """
+
+    def __init__(self, index, embed, nprobe=None):
+        self.index = index
+        self.embed = embed
+        self.nprobe = nprobe
+
+    def search(self, query, n_results, where=None, ids=None):
+        results = self.index.query(self.embed([query]), n_results, where=where, ids=ids,
+                                   nprobe=None if ids is not None else self.nprobe)
+        return list(zip(results["ids"][0], results["distances"][0]))
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuses ranked id lists: each id scores sum(1 / (k + rank)) over the lists it is in.
+
+    Returns:
+        [(id, fused score)] best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, id in enumerate(ranking, 1):
+            fused[id] = fused.get(id, 0.0) + 1 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """
+    BM25 + dense retrieval over the same document ids and metadata.
+    """
+
+    def __init__(self, bm25, dense, candidates=DEFAULT_CANDIDATES, rrf_k=RRF_K):
+        self.bm25 = bm25
+        self.dense = dense
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def query(self, query, n_results=10, where=None, mode="rrf"):
+        """
+        Returns [(id, score)] best first. In "rrf" mode the score is the fused RRF
+        score; in "rerank" mode it is the dense distance of the BM25 candidates
+        (smaller is closer). "rerank" falls back to a plain dense search when BM25
+        finds no candidates (e.g. a query sharing no words with the corpus).
+        """
+        lexical = [id for id, _ in self.bm25.query(query, self.candidates, where)]
+        if mode == "rerank":
+            if not lexical:
+                return self.dense.search(query, n_results, where)
+            return self.dense.search(query, n_results, where, ids=lexical)
+        if mode != "rrf":
+            raise ValueError(f"unknown mode '{mode}' (choose from: rrf, rerank)")
+        dense = [id for id, _ in self.dense.search(query, self.candidates, where)]
+        return reciprocal_rank_fusion([lexical, dense], self.rrf_k)[:n_results]
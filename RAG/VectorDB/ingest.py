@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Script: ingest.py
+Description:
+  Streaming bulk ingest into a ChromaDB collection.
+
+  Documents are read lazily from plain-text files (one document per file) or JSONL
+  files (one JSON object per line, text in --text-field, every other field becomes
+  metadata), split into overlapping windows of characters, sentences or tokens by
+  chunker.Chunker, and grouped into fixed-size batches. Batches are embedded on a
+  thread pool while the main thread upserts the batches that are already embedded;
+  at most --max-pending batches are in flight, so a slow database throttles reading
+  instead of letting memory grow.
+
+  Chunk IDs are derived from the document's identity (its JSONL id, or file path and
+  line) and the chunk's content, so unchanged chunks are upserted in place instead of
+  duplicated. Because an edited chunk gets a new ID, the chunks left over from an earlier
+  run are looked up by their "_document" metadata (one query per LOOKUP_DOCUMENTS
+  documents) and deleted before the new chunks are upserted, so re-ingesting an edited
+  file never leaves outdated text in the collection. This still re-chunks and queries
+  for the whole input; use --manifest to make re-runs cost only what changed.
+  Embeddings go through embedding_cache.CachedEmbeddingFunction, so unchanged chunks
+  are not re-embedded either.
+
+  With --manifest PATH the run is incremental and needs no lookup per document:
+  documents whose text, metadata and chunking are unchanged since the last run are
+  skipped outright, only new chunks of changed documents are embedded and upserted,
+  chunks that merely moved get their metadata updated, and chunks that disappeared
+  are deleted. --prune also deletes the chunks of documents that are no longer in
+  the input.
+
+Usage:
+  $ python ingest.py docs/*.txt corpus.jsonl [--collection NAME] [--db DIR]
+        [--batch-size N] [--workers N] [--max-pending N]
+        [--chunk-by chars|sentences|tokens] [--chunk-size N] [--overlap N] [--manifest PATH [--prune]]
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import time
+
+import chromadb
+
+from chunker import CHUNK_MODES, DEFAULT_CHUNK_MODE, DOCUMENT_FIELD, ChunkManifest, Chunker, plan_document
+from embedding_cache import DEFAULT_BATCH_SIZE, DEFAULT_CACHE_PATH, DEFAULT_MODEL, CachedEmbeddingFunction
+
+DEFAULT_COLLECTION = "my_rag_collection"
+DEFAULT_DB_PATH = "./chroma_db_data"
+DEFAULT_WORKERS = 2
+REPORT_INTERVAL = 5.0  # Seconds between progress lines
+LOOKUP_DOCUMENTS = 100  # Documents whose existing chunks are looked up in one query without a manifest
+
+
+def read_documents(paths, text_field="text", id_field="id"):
+    """
+    Lazily yields (document key, text, metadata) for every document in the given files.
+
+    The key identifies the document across runs: the JSONL id field when present,
+    otherwise the file path (plus line number for JSONL).
+    """
+    for path in paths:
+        if path.endswith((".jsonl", ".ndjson")):
+            with open(path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        print(f"WARNING: Skipping {path}:{line_number}: invalid JSON ({e})")
+                        continue
+                    text = record.pop(text_field, None)
+                    if not isinstance(text, str) or not text.strip():
+                        print(f"WARNING: Skipping {path}:{line_number}: no '{text_field}' text")
+                        continue
+                    key = str(record.pop(id_field)) if id_field in record else f"{path}:{line_number}"
+                    metadata = {name: value for name, value in record.items()
+                                if isinstance(value, (str, int, float, bool))}
+                    metadata.setdefault("source", path)
+                    yield key, text, metadata
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            if text.strip():
+                yield path, text, {"source": path}
+
+
+def replace_chunks(collection, documents, chunker, report, group_size=LOOKUP_DOCUMENTS):
+    """
+    Yields every chunk of every document, after deleting the documents' chunks from
+    earlier runs that are not among them (for runs without a manifest). Documents are
+    handled group_size at a time, with one lookup of their stored chunks per group.
+    """
+    for group in batched(documents, group_size):
+        keys, chunks = [], []
+        for key, text, metadata in group:
+            report.seen.add(key)
+            keys.append(key)
+            chunks.extend(chunker.chunks(key, text, metadata))
+        existing = collection.get(where={DOCUMENT_FIELD: {"$in": keys}}, include=[])["ids"]
+        stale_ids = sorted(set(existing).difference(chunk.id for chunk in chunks))
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+            report.deleted += len(stale_ids)
+        yield from chunks
+
+
+class SyncReport:
+    """
+    What a run found and changed, collected while the chunks stream by.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.unchanged = 0
+        self.plans = []
+        self.deleted = 0  # Stale chunks deleted by replace_chunks()
+
+    def entries(self):
+        return [plan.entry for plan in self.plans]
+
+
+def changed_chunks(documents, chunker, manifest, report):
+    """
+    Yields only the chunks that need embedding; everything else about each
+    changed document is recorded in report for apply_sync().
+    """
+    for key, text, metadata in documents:
+        report.seen.add(key)
+        plan = plan_document(key, text, metadata, chunker, manifest)
+        if plan.unchanged:
+            report.unchanged += 1
+            continue
+        report.plans.append(plan)
+        yield from plan.new_chunks
+        plan.new_chunks = None  # Only ids, metadata and the manifest entry are kept for apply_sync()
+
+
+def apply_sync(collection, manifest, report, batch_size, prune=False):
+    """
+    After the new chunks are upserted: updates the metadata of chunks that moved,
+    deletes stale chunks (and, with prune, all chunks of documents no longer in the
+    input), then records the new state in the manifest.
+
+    Returns:
+        (chunks re-positioned, chunks deleted, documents pruned)
+    """
+    moved = [item for plan in report.plans for item in plan.moved]
+    for batch in batched(moved, batch_size):
+        collection.update(ids=[id for id, _ in batch], metadatas=[metadata for _, metadata in batch])
+    stale_ids = [id for plan in report.plans for id in plan.stale_ids]
+    pruned = [key for key in manifest.keys() if key not in report.seen] if prune else []
+    for key in pruned:
+        stale_ids.extend(manifest.get(key)[2])
+    for batch in batched(stale_ids, batch_size):
+        collection.delete(ids=batch)
+    manifest.put_many(report.entries())
+    manifest.delete_many(pruned)
+    return len(moved), len(stale_ids), len(pruned)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class IngestStats:
+    """
+    Running totals and throughput for an ingest.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.documents = 0
+        self.chunks = 0
+        self.upsert_seconds = 0.0
+        self._last_document = None
+        self._last_report = self.start
+
+    def add_batch(self, batch, upsert_seconds):
+        self.chunks += len(batch)
+        self.upsert_seconds += upsert_seconds
+        for chunk in batch:
+            if chunk.document_id != self._last_document:
+                self.documents += 1
+                self._last_document = chunk.document_id
+
+    def rates(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return elapsed, self.documents / elapsed, self.chunks / elapsed
+
+    def report(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_report < REPORT_INTERVAL:
+            return
+        self._last_report = now
+        elapsed, docs_rate, chunk_rate = self.rates()
+        print(f"INFO: {self.documents} docs / {self.chunks} chunks in {elapsed:.1f}s "
+              f"({docs_rate:.1f} docs/sec, {chunk_rate:.1f} chunks/sec)")
+
+
+def ingest(collection, chunks, embedding_function, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+           max_pending=None):
+    """
+    Embeds chunks in batches on a thread pool and upserts them in order.
+
+    Embedding of later batches overlaps with the upsert of earlier ones; no more
+    than max_pending batches (default: 2 per worker) are embedded or waiting.
+
+    Returns:
+        IngestStats for the run.
+    """
+    max_pending = max_pending or 2 * workers
+    stats = IngestStats()
+    pending = collections.deque()
+
+    def upsert_oldest():
+        batch, future = pending.popleft()
+        embeddings = future.result()
+        start = time.perf_counter()
+        collection.upsert(
+            ids=[chunk.id for chunk in batch],
+            documents=[chunk.text for chunk in batch],
+            metadatas=[chunk.metadata for chunk in batch],
+            embeddings=embeddings,
+        )
+        stats.add_batch(batch, time.perf_counter() - start)
+        stats.report()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in batched(chunks, batch_size):
+            if len(pending) >= max_pending:
+                upsert_oldest()  # Back-pressure: wait for the oldest batch before reading more
+            pending.append((batch, executor.submit(embedding_function, [chunk.text for chunk in batch])))
+        while pending:
+            upsert_oldest()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream documents from text/JSONL files into a Chroma collection.")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="Text files (one document each) or .jsonl files")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION, help=f"Collection name (default: {DEFAULT_COLLECTION})")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Chroma persistence directory (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"SentenceTransformer model (default: {DEFAULT_MODEL})")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help=f"Embedding cache file (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks per embed/upsert batch")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Embedding threads")
+    parser.add_argument("--max-pending", type=int, default=None, help="Batches in flight (default: 2 x workers)")
+    parser.add_argument("--chunk-by", choices=CHUNK_MODES, default=DEFAULT_CHUNK_MODE, help="Chunk window unit")
+    parser.add_argument("--chunk-size", "--chunk-chars", type=int, default=None,
+                        help="Units per chunk (default: 1000 chars, 5 sentences or 200 tokens)")
+    parser.add_argument("--overlap", type=int, default=None,
+                        help="Units shared by adjacent chunks (default: 200 chars, 1 sentence or 40 tokens)")
+    parser.add_argument("--manifest", metavar="PATH", help="Chunk manifest for incremental re-ingest (SQLite)")
+    parser.add_argument("--prune", action="store_true",
+                        help="With --manifest, delete chunks of documents missing from this run's input")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the document text")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding a stable document ID")
+    args = parser.parse_args()
+    if min(args.batch_size, args.workers) < 1 or (args.max_pending is not None and args.max_pending < 1):
+        parser.error("--batch-size, --workers and --max-pending must be at least 1")
+    if args.prune and not args.manifest:
+        parser.error("--prune requires --manifest")
+    try:
+        chunker = Chunker(args.chunk_by, args.chunk_size, args.overlap)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for path in args.paths:
+        if not os.path.isfile(path):
+            print(f"ERROR: The file '{path}' does not exist or is not a valid file.")
+            sys.exit(1)
+
+    embedding_function = CachedEmbeddingFunction(args.model, args.cache, args.batch_size)
+    client = chromadb.PersistentClient(path=args.db)
+    collection = client.get_or_create_collection(name=args.collection, embedding_function=embedding_function)
+
+    documents = read_documents(args.paths, args.text_field, args.id_field)
+    report = SyncReport()
+    if args.manifest:
+        manifest = ChunkManifest(args.manifest)
+        chunks = changed_chunks(documents, chunker, manifest, report)
+    else:
+        chunks = replace_chunks(collection, documents, chunker, report)
+    try:
+        stats = ingest(collection, chunks, embedding_function, args.batch_size, args.workers, args.max_pending)
+    except ValueError as e:  # Reserved chunk metadata in the input
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    stats.report(force=True)
+    if args.manifest:
+        moved, deleted, pruned = apply_sync(collection, manifest, report, args.batch_size, args.prune)
+        manifest.close()
+        print(f"INFO: {report.unchanged} unchanged and {len(report.plans)} changed document(s); "
+              f"{stats.chunks} chunk(s) embedded, {moved} re-positioned, {deleted} deleted"
+              + (f", {pruned} document(s) pruned." if args.prune else "."))
+    else:
+        print(f"INFO: {len(report.seen)} document(s); {stats.chunks} chunk(s) upserted, "
+              f"{report.deleted} stale chunk(s) deleted.")
+    print(f"INFO: Upsert time {stats.upsert_seconds:.1f}s; embedding cache: {embedding_function.stats()}")
+    print(f"SUCCESS: Collection '{args.collection}' now holds {collection.count()} chunks.")
+
+
+if __name__ == "__main__":
+    main()
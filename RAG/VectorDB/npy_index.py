@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Script: npy_index.py
+Description:
+  A lightweight, in-process vector index built on NumPy only - a local stand-in for
+  a Chroma collection when the corpus is small enough not to need a database.
+
+  Vectors are L2-normalised float32 rows in a memory-mapped .npy file, so cosine
+  similarity is a dot product and the OS page cache, not the Python heap, holds the
+  data. Exact search streams the matrix in blocks of rows, scores each block with one
+  matrix product and keeps the running top-k with argpartition, so memory stays at
+  one block of scores instead of a full N x N (or Q x N) similarity matrix.
+
+  An optional IVF coarse quantiser (spherical k-means over a sample) groups rows into
+  lists; approximate search only scores the rows in the nprobe lists closest to the
+  query. Metadata filters use the same `where` syntax as Chroma ({"topic": "AI"},
+  {"year": {"$gte": 2020}}, {"$and": [...]}, {"$or": [...]}) and are applied before
+  scoring, so filtered queries only touch matching rows.
+
+  To cut resident memory, quantize() adds a compact copy of the vectors - float16
+  (half the size) or int8 with one float32 scale per vector (about a quarter) - that
+  is loaded into RAM. With quantized=True the first stage scores the compact copy and
+  keeps rescore_factor x k candidates, which are then rescored exactly against the
+  float32 rows read lazily from the memory-mapped file. Compact rows are widened into
+  one reused, cache-sized float32 buffer per query: int8 search costs about as much
+  as the exact scan on small indexes and less on large ones (0.64x at 100k x 384),
+  while NumPy's slow float16 conversion makes float16 search about 4-8x slower than
+  exact - it only buys memory. `benchmark` prints the latency relative to exact.
+
+  Index layout (one directory): vectors.npy, ids.json, metadatas.jsonl, ivf.npz,
+  vectors.f16.npy or vectors.i8.npy + scales.npy.
+
+Usage:
+  $ python npy_index.py benchmark [--rows N] [--dim D] [--queries Q] [-k K] [--nlist L] [--nprobe P]
+        [--rescore-factor R]
+
+  from npy_index import NumpyVectorIndex
+  index = NumpyVectorIndex.build("my_index", ids, embeddings, metadatas)
+  index.train_ivf(nlist=256)
+  results = index.query(model.encode(["What is AI?"]), n_results=3, where={"topic": "AI"}, nprobe=8)
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.json"
+METADATAS_FILE = "metadatas.jsonl"
+IVF_FILE = "ivf.npz"
+COMPACT_FILES = {"float16": "vectors.f16.npy", "int8": "vectors.i8.npy"}
+SCALES_FILE = "scales.npy"
+QUANTIZED_BLOCK_ROWS = 512  # Compact rows widened to float32 at a time (the reused buffer stays in L2 cache)
+DEFAULT_RESCORE_FACTOR = 4  # First-stage candidates per requested result when searching compact vectors
+DEFAULT_BLOCK_ROWS = 65536  # Rows scored per matrix product
+KMEANS_SAMPLE_PER_LIST = 64  # Training rows per IVF list
+
+FILTER_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def normalize_rows(vectors):
+    """
+    Returns float32 copies of the rows scaled to unit length (zero rows stay zero).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores, k):
+    """
+    Selects the k highest scores of each row without sorting the whole row.
+
+    Returns:
+        (column indices, scores), both (rows, k) and sorted best-first.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def matches_filter(metadata, where):
+    """
+    Evaluates a Chroma-style `where` filter against one metadata dict.
+    """
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(field)
+            for operator, operand in condition.items():
+                if operator not in FILTER_OPERATORS:
+                    raise ValueError(f"unsupported filter operator '{operator}'")
+                if not FILTER_OPERATORS[operator](value, operand):
+                    return False
+        elif metadata.get(field) != condition:
+            return False
+    return True
+
+
+class NumpyVectorIndex:
+    """
+    Memory-mapped cosine-similarity index with exact and IVF search.
+    """
+
+    def __init__(self, directory, block_rows=DEFAULT_BLOCK_ROWS):
+        self.directory = directory
+        self.block_rows = block_rows
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, IDS_FILE), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        with open(os.path.join(directory, METADATAS_FILE), "r", encoding="utf-8") as f:
+            self.metadatas = [json.loads(line) for line in f]
+        self.centroids = self.list_offsets = self.list_rows = None
+        ivf_path = os.path.join(directory, IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.centroids, self.list_offsets, self.list_rows = ivf["centroids"], ivf["offsets"], ivf["rows"]
+        self.compact = self.scales = None
+        for kind, name in COMPACT_FILES.items():
+            if os.path.exists(os.path.join(directory, name)):
+                self.compact = np.load(os.path.join(directory, name))  # Resident: this is what gets scanned
+                if kind == "int8":
+                    self.scales = np.load(os.path.join(directory, SCALES_FILE))
+        self._filter_rows = functools.lru_cache(maxsize=128)(self._compute_filter_rows)
+        self._row_of = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, directory, ids, vectors, metadatas=None, block_rows=DEFAULT_BLOCK_ROWS):
+        """
+        Writes a new index: vectors are normalised block by block straight into the .npy file.
+
+        Returns:
+            The opened index.
+        """
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError(f"expected {len(ids)} vectors as a 2-D array, got shape {vectors.shape}")
+        if len(set(ids)) != len(ids):
+            raise ValueError("ids must be unique")
+        os.makedirs(directory, exist_ok=True)
+        stored = np.lib.format.open_memmap(
+            os.path.join(directory, VECTORS_FILE), mode="w+", dtype=np.float32, shape=vectors.shape
+        )
+        for start in range(0, len(vectors), block_rows):
+            stored[start:start + block_rows] = normalize_rows(vectors[start:start + block_rows])
+        stored.flush()
+        del stored
+        with open(os.path.join(directory, IDS_FILE), "w", encoding="utf-8") as f:
+            json.dump([str(id) for id in ids], f)
+        with open(os.path.join(directory, METADATAS_FILE), "w", encoding="utf-8") as f:
+            for metadata in metadatas or ({} for _ in ids):
+                f.write(json.dumps(metadata or {}) + "\n")
+        for name in (IVF_FILE, SCALES_FILE, *COMPACT_FILES.values()):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))  # Derived from the previous vectors
+        return cls(directory, block_rows)
+
+    def quantize(self, kind):
+        """
+        Writes and loads a compact copy of the vectors: "float16", or "int8" where
+        each row is scaled so its largest component maps to 127.
+
+        Returns:
+            Bytes of the compact copy (including scales) held in memory.
+        """
+        if kind not in COMPACT_FILES:
+            raise ValueError(f"unsupported quantisation '{kind}' (choose from: {', '.join(COMPACT_FILES)})")
+        for name in (SCALES_FILE, *COMPACT_FILES.values()):
+            if os.path.exists(os.path.join(self.directory, name)):
+                os.remove(os.path.join(self.directory, name))
+        compact = np.empty(self.vectors.shape, dtype=np.float16 if kind == "float16" else np.int8)
+        scales = np.empty(len(self), dtype=np.float32) if kind == "int8" else None
+        for start in range(0, len(self), self.block_rows):
+            block = np.asarray(self.vectors[start:start + self.block_rows])
+            if scales is None:
+                compact[start:start + len(block)] = block
+            else:
+                block_scales = np.abs(block).max(axis=1) / 127
+                block_scales[block_scales == 0] = 1
+                scales[start:start + len(block)] = block_scales
+                compact[start:start + len(block)] = np.rint(block / block_scales[:, np.newaxis])
+        np.save(os.path.join(self.directory, COMPACT_FILES[kind]), compact)
+        if scales is not None:
+            np.save(os.path.join(self.directory, SCALES_FILE), scales)
+        self.compact, self.scales = compact, scales
+        return self.compact_bytes()
+
+    def compact_bytes(self):
+        if self.compact is None:
+            return 0
+        return self.compact.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def train_ivf(self, nlist, iterations=10, seed=0):
+        """
+        Trains the IVF coarse quantiser with spherical k-means on a sample of rows,
+        assigns every row to its nearest centroid and saves the lists to ivf.npz.
+        """
+        if not 1 <= nlist <= len(self):
+            raise ValueError(f"nlist must be between 1 and the number of vectors ({len(self)})")
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(self), nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(len(self), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]  # Re-seed empty lists
+            centroids = normalize_rows(sums)
+
+        assignment = np.concatenate([
+            self._assign(np.asarray(self.vectors[start:start + self.block_rows]), centroids)
+            for start in range(0, len(self), self.block_rows)
+        ])
+        rows = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        np.savez(os.path.join(self.directory, IVF_FILE), centroids=centroids, offsets=offsets, rows=rows)
+        self.centroids, self.list_offsets, self.list_rows = centroids, offsets, rows
+
+    def _assign(self, vectors, centroids):
+        return np.argmax(vectors @ centroids.T, axis=1)
+
+    def _compute_filter_rows(self, where_json):
+        where = json.loads(where_json)
+        return np.fromiter(
+            (row for row, metadata in enumerate(self.metadatas) if matches_filter(metadata, where)), dtype=np.int64
+        )
+
+    def filter_rows(self, where):
+        """
+        Returns the sorted row numbers whose metadata matches `where` (cached per filter).
+        """
+        return self._filter_rows(json.dumps(where, sort_keys=True))
+
+    def rows_for_ids(self, ids):
+        """
+        Returns the sorted row numbers of the given ids; unknown ids are ignored.
+        """
+        if self._row_of is None:
+            self._row_of = {id: row for row, id in enumerate(self.ids)}
+        return np.unique(np.fromiter((self._row_of[id] for id in ids if id in self._row_of), dtype=np.int64))
+
+    def _block_scores(self, queries, rows, buffer=None):
+        """
+        Similarities of the queries to a slice or array of rows: from the file, or
+        with a float32 buffer from the compact copy, widened a buffer at a time.
+        """
+        if buffer is None:
+            return queries @ self.vectors[rows].T
+        block = self.compact[rows]
+        scores = np.empty((len(queries), len(block)), dtype=np.float32)
+        for start in range(0, len(block), len(buffer)):
+            part = block[start:start + len(buffer)]
+            widened = buffer[:len(part)]
+            np.copyto(widened, part, casting="unsafe")
+            np.matmul(queries, widened.T, out=scores[:, start:start + len(part)])
+        if self.scales is not None:
+            scores *= self.scales[rows]  # Scale the (queries x rows) scores, not the wider block
+        return scores
+
+    def _scan(self, queries, k, rows=None, quantized=False):
+        """
+        Top-k over all rows, or over the given row numbers, one block at a time.
+        Exact unless quantized, in which case the compact copy is scored.
+        """
+        count = len(self) if rows is None else len(rows)
+        step = self.block_rows
+        buffer = np.empty((QUANTIZED_BLOCK_ROWS, self.compact.shape[1]), dtype=np.float32) if quantized else None
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, count, step):
+            if rows is None:
+                block_rows = np.arange(start, min(start + step, count))
+                block_scores = self._block_scores(queries, slice(start, start + step), buffer)
+            else:
+                block_rows = rows[start:start + step]
+                block_scores = self._block_scores(queries, block_rows, buffer)
+            columns, scores = top_k(block_scores, k)
+            merged_rows = np.concatenate([best_rows, block_rows[columns]], axis=1)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            columns, best_scores = top_k(merged_scores, k)
+            best_rows = np.take_along_axis(merged_rows, columns, axis=1)
+        return best_rows, best_scores
+
+    def _probe_rows(self, query, nprobe):
+        """Row numbers in the nprobe IVF lists nearest to one query."""
+        lists = top_k((self.centroids @ query)[np.newaxis, :], nprobe)[0][0]
+        return np.sort(np.concatenate(
+            [self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists]
+        ))
+
+    def search(self, query_embeddings, k=10, where=None, nprobe=None, quantized=False,
+               rescore_factor=DEFAULT_RESCORE_FACTOR, ids=None):
+        """
+        Finds the k most similar rows for each query.
+
+        nprobe=None searches exactly; with a trained IVF, nprobe=N searches only the
+        N nearest lists. `where` restricts the search to rows with matching metadata,
+        `ids` (as in Chroma's query) to the given document ids.
+        quantized=True scores the compact copy first and rescores its best
+        rescore_factor * k rows with the float32 vectors (rescore_factor=0: no rescoring).
+
+        Returns:
+            (row numbers, cosine similarities), both (queries, k) best-first; rows
+            with fewer than k candidates are padded with -1 / -inf.
+        """
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        if queries.shape[1] != self.vectors.shape[1]:
+            raise ValueError(f"query dimension {queries.shape[1]} does not match index dimension {self.vectors.shape[1]}")
+        if quantized and self.compact is None:
+            raise ValueError("the index has no compact vectors; call quantize() first")
+        allowed = self.filter_rows(where) if where else None
+        if ids is not None:
+            id_rows = self.rows_for_ids(ids)
+            allowed = id_rows if allowed is None else np.intersect1d(allowed, id_rows, assume_unique=True)
+        candidates_k = k * rescore_factor if quantized and rescore_factor else k
+        if nprobe is None or self.centroids is None:
+            rows, scores = self._pad(*self._scan(queries, candidates_k, allowed, quantized), candidates_k)
+        else:
+            rows = np.full((len(queries), candidates_k), -1, dtype=np.int64)
+            scores = np.full((len(queries), candidates_k), -np.inf, dtype=np.float32)
+            for i, query in enumerate(queries):
+                candidates = self._probe_rows(query, nprobe)
+                if allowed is not None:
+                    candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+                found_rows, found_scores = self._scan(query[np.newaxis, :], candidates_k, candidates, quantized)
+                rows[i, :found_rows.shape[1]] = found_rows[0]
+                scores[i, :found_scores.shape[1]] = found_scores[0]
+        if quantized and rescore_factor:
+            rows, scores = self._rescore(queries, rows, k)
+        return rows, scores
+
+    def _rescore(self, queries, candidate_rows, k):
+        """Exact top-k among each query's candidate rows, reading only those float32 rows."""
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            candidates = np.sort(candidate_rows[i][candidate_rows[i] >= 0])
+            found_rows, found_scores = self._scan(query[np.newaxis, :], k, candidates)
+            rows[i, :found_rows.shape[1]] = found_rows[0]
+            scores[i, :found_scores.shape[1]] = found_scores[0]
+        return rows, scores
+
+    @staticmethod
+    def _pad(rows, scores, k):
+        pad = k - rows.shape[1]
+        if pad > 0:
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return rows, scores
+
+    def query(self, query_embeddings, n_results=10, where=None, nprobe=None, quantized=False, ids=None):
+        """
+        Chroma-shaped search: returns {"ids", "distances", "metadatas"}, one list per
+        query, where distance is cosine distance (1 - similarity).
+        """
+        rows, scores = self.search(query_embeddings, n_results, where, nprobe, quantized, ids=ids)
+        results = {"ids": [], "distances": [], "metadatas": []}
+        for query_rows, query_scores in zip(rows, scores):
+            found = query_rows >= 0
+            results["ids"].append([self.ids[row] for row in query_rows[found]])
+            results["distances"].append([float(1 - score) for score in query_scores[found]])
+            results["metadatas"].append([self.metadatas[row] for row in query_rows[found]])
+        return results
+
+
+def synthetic_corpus(rows, dim, clusters, seed=0):
+    """
+    Clustered unit vectors (like real embeddings, unlike uniform noise) with a
+    'topic' metadata field cycling through five values.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    metadatas = [{"topic": f"topic_{row % 5}"} for row in range(rows)]
+    return normalize_rows(vectors), metadatas
+
+
+def benchmark(args):
+    print(f"INFO: Building a {args.rows} x {args.dim} index in '{args.dir}'...")
+    vectors, metadatas = synthetic_corpus(args.rows, args.dim, args.clusters, args.seed)
+    index = NumpyVectorIndex.build(args.dir, [f"doc_{row}" for row in range(args.rows)], vectors, metadatas)
+    start = time.perf_counter()
+    index.train_ivf(args.nlist, seed=args.seed)
+    print(f"INFO: Trained IVF with {args.nlist} lists in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(args.seed + 1)
+    noise = rng.standard_normal((args.queries, args.dim)) * (0.3 / np.sqrt(args.dim))  # ~0.3 of a unit vector
+    queries = normalize_rows(vectors[rng.choice(args.rows, args.queries)] + noise)
+    where = {"topic": "topic_0"}
+
+    def timed(label, **options):
+        index.search(queries[:1], args.k, **options)  # Warm-up: page in vectors, fill the filter cache
+        start = time.perf_counter()
+        rows = np.concatenate([index.search(query, args.k, **options)[0] for query in queries])
+        per_query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        return label, rows, per_query_ms
+
+    runs = [
+        timed("exact"),
+        timed(f"ivf nprobe={args.nprobe}", nprobe=args.nprobe),
+        timed("exact + where", where=where),
+        timed(f"ivf nprobe={args.nprobe} + where", nprobe=args.nprobe, where=where),
+    ]
+    references = {False: runs[0][1], True: runs[2][1]}
+    full_bytes = index.vectors.nbytes
+    memory = {}
+    for kind in COMPACT_FILES:
+        memory[kind] = index.quantize(kind)
+        runs.append(timed(f"{kind}, no rescoring", quantized=True, rescore_factor=0))
+        runs.append(timed(f"{kind}, rescore x{args.rescore_factor}", quantized=True,
+                          rescore_factor=args.rescore_factor))
+
+    start = time.perf_counter()
+    for query in queries[:10]:
+        top_k((query @ vectors.T)[np.newaxis, :], args.k)
+    naive_ms = (time.perf_counter() - start) * 1000 / 10
+
+    exact_ms = runs[0][2]
+    print(f"\n{'method':<32}{'ms/query':>10}{'vs exact':>10}{'recall@' + str(args.k):>12}")
+    print(f"{'full dot product (in RAM)':<32}{naive_ms:>10.2f}{naive_ms / exact_ms:>9.2f}x{1.0:>12.3f}")
+    for label, rows, per_query_ms in runs:
+        reference = references["where" in label]
+        recall = np.mean([len(np.intersect1d(found, exact)) / args.k for found, exact in zip(rows, reference)])
+        print(f"{label:<32}{per_query_ms:>10.2f}{per_query_ms / exact_ms:>9.2f}x{recall:>12.3f}")
+
+    print(f"\n{'vectors held in RAM':<32}{'MB':>10}{'saving':>12}")
+    print(f"{'float32 (vectors.npy)':<32}{full_bytes / 2 ** 20:>10.1f}{'-':>12}")
+    for kind, compact_bytes in memory.items():
+        print(f"{kind:<32}{compact_bytes / 2 ** 20:>10.1f}{1 - compact_bytes / full_bytes:>12.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy vector index: recall/latency benchmark of exact vs IVF search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench = subparsers.add_parser("benchmark", help="Benchmark exact and IVF search on a synthetic corpus")
+    bench.add_argument("--rows", type=int, default=100_000, help="Vectors in the corpus (default: 100000)")
+    bench.add_argument("--dim", type=int, default=384, help="Vector dimension (default: 384, as all-MiniLM-L6-v2)")
+    bench.add_argument("--clusters", type=int, default=1000, help="Synthetic topic clusters (default: 1000)")
+    bench.add_argument("--queries", type=int, default=200, help="Queries to time (default: 200)")
+    bench.add_argument("-k", type=int, default=10, help="Results per query (default: 10)")
+    bench.add_argument("--nlist", type=int, default=256, help="IVF lists (default: 256)")
+    bench.add_argument("--nprobe", type=int, default=8, help="IVF lists searched per query (default: 8)")
+    bench.add_argument("--rescore-factor", type=int, default=DEFAULT_RESCORE_FACTOR,
+                       help=f"Quantised candidates rescored per result (default: {DEFAULT_RESCORE_FACTOR})")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--dir", default="npy_index_bench", help="Index directory (default: npy_index_bench)")
+    args = parser.parse_args()
+    if min(args.rows, args.dim, args.queries, args.k, args.nlist, args.nprobe) < 1:
+        parser.error("sizes must be at least 1")
+    if args.nlist > args.rows:
+        parser.error("--nlist cannot exceed --rows")
+    benchmark(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
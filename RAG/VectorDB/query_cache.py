@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Script: query_cache.py
+Description:
+  Result cache for `collection.query` in front of a ChromaDB collection.
+
+  CachedCollection wraps a collection and answers repeated queries from memory:
+
+  * query embeddings are cached by normalised query text (whitespace collapsed), so
+    a repeated query never reaches the embedding model again;
+  * result sets are cached per query, keyed by (normalised query, n_results, where,
+    where_document, include, collection version), with LRU eviction and a TTL.
+
+  The collection version is bumped by every add/upsert/update/delete made through the
+  wrapper, which drops all cached results at once; writes made to the underlying
+  collection directly are not seen, so route them through the wrapper. A multi-query
+  call is split per query: cached ones are served from memory and only the misses are
+  sent to Chroma, in one call. stats() reports hit rates, evictions and invalidations.
+
+  from query_cache import CachedCollection
+  cached = CachedCollection(collection, embedding_function, max_entries=10_000, ttl_seconds=300)
+  results = cached.query(query_texts=["What is the capital of France?"], n_results=2)
+"""
+
+import collections
+import json
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_INCLUDE = ("metadatas", "documents", "distances")
+
+
+def normalize_query(text):
+    """
+    Returns the cache form of a query: surrounding whitespace removed, runs of
+    whitespace collapsed to one space. Case is kept, as embeddings are case-sensitive.
+    """
+    return " ".join(text.split())
+
+
+class LRUCache:
+    """
+    Thread-safe LRU mapping whose entries also expire ttl_seconds after insertion
+    (ttl_seconds=None keeps them until evicted).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() > entry[1]:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CachedCollection:
+    """
+    Wraps a Chroma collection with a query-embedding cache and a versioned result cache.
+
+    Attributes not defined here (count, get, peek, name, ...) are passed through to the
+    wrapped collection.
+    """
+
+    def __init__(self, collection, embedding_function=None, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, max_embeddings=DEFAULT_MAX_ENTRIES):
+        self.collection = collection
+        self.embedding_function = embedding_function or getattr(collection, "_embedding_function", None)
+        if self.embedding_function is None:
+            raise ValueError("an embedding_function is needed to embed query_texts")
+        self.results = LRUCache(max_entries, ttl_seconds)
+        self.embeddings = LRUCache(max_embeddings)  # Embeddings do not go stale; LRU only
+        self.version = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def _invalidate(self):
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+        self.results.clear()
+
+    def add(self, *args, **kwargs):
+        result = self.collection.add(*args, **kwargs)
+        self._invalidate()
+        return result
+
+    def upsert(self, *args, **kwargs):
+        result = self.collection.upsert(*args, **kwargs)
+        self._invalidate()
+        return result
+
+    def update(self, *args, **kwargs):
+        result = self.collection.update(*args, **kwargs)
+        self._invalidate()
+        return result
+
+    def delete(self, *args, **kwargs):
+        result = self.collection.delete(*args, **kwargs)
+        self._invalidate()
+        return result
+
+    def embed_queries(self, texts):
+        """
+        Returns the embedding of each text, embedding only those not cached, in one call.
+        """
+        embeddings = [self.embeddings.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            computed = dict(zip(missing, self.embedding_function(missing)))
+            for text, embedding in computed.items():
+                self.embeddings.put(text, embedding)
+            embeddings = [computed[text] if embedding is None else embedding
+                          for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def query(self, query_texts, n_results=10, where=None, where_document=None, include=DEFAULT_INCLUDE):
+        """
+        Same arguments and result shape as collection.query with query_texts.
+        """
+        if isinstance(query_texts, str):
+            query_texts = [query_texts]
+        if not query_texts:  # Nothing to cache; let Chroma answer (or reject) the call as usual
+            return self.collection.query(query_texts=list(query_texts), n_results=n_results, where=where,
+                                         where_document=where_document, include=list(include))
+        texts = [normalize_query(text) for text in query_texts]
+        version = self.version
+        shared_key = (n_results, json.dumps(where, sort_keys=True), json.dumps(where_document, sort_keys=True),
+                      tuple(include), version)
+
+        per_query = [self.results.get((text, shared_key)) for text in texts]
+        missing = list(dict.fromkeys(text for text, result in zip(texts, per_query) if result is None))
+        if missing:
+            fresh = self.collection.query(
+                query_embeddings=self.embed_queries(missing), n_results=n_results,
+                where=where, where_document=where_document, include=list(include),
+            )
+            fields = {name: value for name, value in fresh.items() if name != "included" and value is not None}
+            computed = {}
+            for index, text in enumerate(missing):
+                computed[text] = {name: value[index] for name, value in fields.items()}
+                if self.version == version:  # Do not cache results a concurrent write has outdated
+                    self.results.put((text, shared_key), computed[text])
+            per_query = [computed[text] if result is None else result for text, result in zip(texts, per_query)]
+
+        merged = {name: [result[name] for result in per_query] for name in per_query[0]}
+        merged["included"] = list(include)
+        return merged
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "invalidations": self.invalidations,
+            "results": self.results.stats(),
+            "query_embeddings": self.embeddings.stats(),
+        }
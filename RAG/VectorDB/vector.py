@@ -140,3 +140,120 @@ if filtered_results['documents'][0]:
 else:
     print("No documents found for this query and filter.")
 ```
+
+## To avoid re-computing embeddings when the same documents are ingested again, swap in the cached embedding function from `embedding_cache.py`. Vectors are stored on disk keyed by (model name, content hash), so only new text reaches the model.
+
+```python
+import chromadb
+from embedding_cache import CachedEmbeddingFunction
+
+chroma_client = chromadb.PersistentClient(path="./chroma_db_data")
+
+# Same model as above; misses are embedded in batches of 64 and written to embeddings.db.
+embedding_function = CachedEmbeddingFunction(
+    model_name="all-MiniLM-L6-v2",
+    cache_path="embeddings.db",
+    batch_size=64
+)
+
+collection = chroma_client.get_or_create_collection(
+    name="my_rag_collection",
+    embedding_function=embedding_function
+)
+
+collection.upsert(documents=documents_to_add, metadatas=metadatas, ids=ids)
+print(embedding_function.stats())  # e.g. {'hits': 4, 'misses': 0, 'hit_rate': 1.0, ...} on a re-run
+```
+
+## For more than a few thousand documents, don't build `documents_to_add` in memory: stream them with `ingest.py`. It reads text/JSONL files lazily, chunks them, embeds batches on a thread pool while earlier batches are upserted, and reports docs/sec. Re-running the same command updates in place: unchanged chunks keep their IDs, and chunks left over from an earlier version of a document are deleted. Add `--manifest ingest_manifest.db` to skip unchanged documents entirely on re-runs.
+
+```bash
+python ingest.py corpus.jsonl notes/*.txt --collection my_rag_collection --db ./chroma_db_data \
+    --batch-size 64 --workers 2 --chunk-chars 1000 --overlap 200
+```
+
+## For small corpora you can skip the database altogether. `npy_index.py` keeps normalised vectors in a memory-mapped `.npy` file and answers top-k queries (exact, or approximate with an IVF quantiser) with the same `where` filters, without building an N×N similarity matrix like `model.similarity(embeddings, embeddings)`.
+
+```python
+from sentence_transformers import SentenceTransformer
+from npy_index import NumpyVectorIndex
+
+model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+index = NumpyVectorIndex.build("my_npy_index", ids, model.encode(documents_to_add), metadatas)
+
+results = index.query(model.encode(["What is AI?"]), n_results=1, where={"topic": "AI"})
+print(results["ids"][0], results["distances"][0])
+```
+
+```bash
+# Recall/latency of exact vs IVF search on a synthetic 100k x 384 corpus
+python npy_index.py benchmark --rows 100000 --nlist 256 --nprobe 8
+```
+
+## If the same questions come in again and again, wrap the collection with `query_cache.py`. Repeated queries skip both the embedding model and the search; any `add`/`upsert`/`update`/`delete` made through the wrapper invalidates cached results.
+
+```python
+from query_cache import CachedCollection
+
+cached_collection = CachedCollection(collection, embedding_function, max_entries=10_000, ttl_seconds=300)
+results = cached_collection.query(query_texts=["What is the capital of France?"], n_results=2)
+results = cached_collection.query(query_texts=["What is the capital of France?"], n_results=2)  # served from cache
+print(cached_collection.stats()["results"]["hit_rate"])
+```
+
+## Which of the models above should be the default? `bench_embeddings.py` measures load time, memory, encode throughput per batch size and thread count, and retrieval quality (recall@k, MRR) on the small labelled set in `retrieval_eval.json`. It only uses weights already in the local Hugging Face cache; models that are not cached are replaced by a deterministic stub so the harness still runs.
+
+```bash
+python bench_embeddings.py --batch-sizes 1 16 64 --threads 1 4 --json bench_results.json
+```
+
+## When float32 vectors no longer fit comfortably in RAM, keep a compact copy in memory and leave the full-precision vectors on disk. With `quantized=True`, `npy_index.py` scores the float16 or int8 copy first, then rescores the best `rescore_factor × k` candidates against the memory-mapped float32 file. int8 is also about as fast as exact search (faster on large indexes); float16 saves memory but searches several times slower, because NumPy widens half-precision values slowly.
+
+```python
+index.quantize("int8")  # ~25% of the float32 size resident; "float16" is 50%
+results = index.query(model.encode(["What is AI?"]), n_results=3, quantized=True)
+```
+
+```bash
+# Memory saving and recall@k with and without rescoring, next to the float32 results
+python npy_index.py benchmark --rows 100000 --rescore-factor 4
+```
+
+## Dense similarity alone is weak on exact identifiers (error codes, product names). `hybrid.py` keeps a BM25 inverted index next to the collection, using the same ids and metadata, and fuses both rankings with reciprocal-rank fusion. It can also use BM25 as a cheap first pass so that only its top candidates are scored by the embedding model.
+
+```python
+from hybrid import BM25Index, ChromaDense, HybridRetriever
+
+bm25 = BM25Index()
+bm25.upsert(ids, documents_to_add, metadatas)  # call again (or bm25.delete) whenever the collection changes
+
+retriever = HybridRetriever(bm25, ChromaDense(collection), candidates=200)
+print(retriever.query("What is AI?", n_results=2, where={"topic": "AI"}))                 # RRF fusion
+print(retriever.query("What is AI?", n_results=2, where={"topic": "AI"}, mode="rerank"))  # BM25 candidates, dense rerank
+```
+
+## When the corpus changes a little every day, don't re-ingest all of it. `chunker.py` chunks by characters, sentences or tokens and gives every chunk a content-derived ID; with `--manifest`, `ingest.py` skips unchanged documents, embeds only new chunks, updates the metadata of chunks that moved and deletes the ones that disappeared.
+
+```bash
+python ingest.py corpus.jsonl --collection my_rag_collection --db ./chroma_db_data \
+    --chunk-by sentences --chunk-size 5 --overlap 1 --manifest chunks.db --prune
+
+# See how a file would be chunked
+python chunker.py notes/intro.txt --chunk-by tokens --size 200 --overlap 40
+```
+
+## The snippets above construct `SentenceTransformer(...)` up front, so every run pays the torch import and model load. Scripts that run often should get their encoder from `embedding_server.py` instead: `load_encoder()` loads the model on first `encode()`, or, when the embedding daemon is running, asks it over a Unix socket and gets vectors back in milliseconds. `CachedEmbeddingFunction` (and so `ingest.py`) already does this. Clients only use a socket owned by the current user with mode 0600 and otherwise load the model locally.
+
+```bash
+# Keep the model resident (socket path: $EMBEDDING_SOCKET, else $XDG_RUNTIME_DIR or /tmp)
+python embedding_server.py serve --models all-MiniLM-L6-v2 &
+
+python embedding_server.py encode "What is the capital of France?"   # served by the daemon
+```
+
+```python
+from embedding_server import load_encoder
+
+model = load_encoder("all-MiniLM-L6-v2")  # No torch import yet
+embeddings = model.encode(documents_to_add)
+```
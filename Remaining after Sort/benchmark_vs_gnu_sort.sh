@@ -0,0 +1,68 @@
+#!/bin/bash
+# benchmark_vs_gnu_sort.sh - Times extract_remaining_lines.py --bytes against the
+# equivalent GNU pipeline (LC_ALL=C sort -u + comm -23) and checks the outputs match.
+#
+# Usage: ./benchmark_vs_gnu_sort.sh [SIZE_MB] [JOBS] [WORK_DIR]
+#   SIZE_MB   size of the full-list fixture in MB (default: 10240, i.e. 10 GB)
+#   JOBS      worker processes for run generation (default: number of CPUs)
+#   WORK_DIR  where fixtures and outputs go (default: ./bench_work); needs ~4x SIZE_MB free
+
+set -e
+
+SIZE_MB=${1:-10240}
+JOBS=${2:-$(nproc)}
+WORK_DIR=${3:-./bench_work}
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+MEMORY=${MEMORY:-2G}
+
+mkdir -p "$WORK_DIR"
+cd "$WORK_DIR"
+
+echo "🧪 Generating ${SIZE_MB} MB fixture (full list) and a ~1/3 sized partial list..."
+python3 - "$SIZE_MB" <<'EOF'
+import os, random, sys
+
+# Mixed ASCII / UTF-8 / raw high bytes and CRLF endings, where locale and
+# byte order disagree. Roughly 1 in 4 lines is a duplicate.
+target = int(sys.argv[1]) * 1024 * 1024
+rng = random.Random(42)
+alphabet = [bytes([b]) for b in range(0x21, 0x7f)] + ["é".encode(), "Ü".encode(), "ß".encode(), b"\xff", b"\r"]
+pool = [b"".join(rng.choice(alphabet) for _ in range(rng.randint(4, 40))) for _ in range(200_000)]
+written = 0
+with open("full.txt", "wb") as full, open("partial.txt", "wb") as partial:
+    while written < target:
+        block = b"".join(
+            (rng.choice(pool) if rng.random() < 0.25 else os.urandom(12).hex().encode() + rng.choice(pool)) + b"\n"
+            for _ in range(50_000)
+        )
+        full.write(block)
+        written += len(block)
+        partial.write(b"\n".join(line for line in block.split(b"\n")[::3] if line) + b"\n")
+EOF
+
+echo "⏱️  GNU: LC_ALL=C sort -u (x2) + comm -23 ..."
+GNU_START=$(date +%s%N)
+LC_ALL=C sort -u -S "$MEMORY" --parallel="$JOBS" full.txt > full.sorted
+LC_ALL=C sort -u -S "$MEMORY" --parallel="$JOBS" partial.txt > partial.sorted
+LC_ALL=C comm -23 full.sorted partial.sorted > gnu_remaining.txt
+GNU_END=$(date +%s%N)
+
+echo "⏱️  extract_remaining_lines.py --bytes --jobs $JOBS ..."
+PY_START=$(date +%s%N)
+python3 "$SCRIPT_DIR/extract_remaining_lines.py" --bytes --jobs "$JOBS" --max-memory "$MEMORY" \
+    --temp-dir . full.txt partial.txt py_remaining.txt > /dev/null
+PY_END=$(date +%s%N)
+
+GNU_MS=$(( (GNU_END - GNU_START) / 1000000 ))
+PY_MS=$(( (PY_END - PY_START) / 1000000 ))
+echo "📊 GNU sort pipeline:           ${GNU_MS} ms"
+echo "📊 extract_remaining_lines.py:  ${PY_MS} ms ($(( PY_MS * 100 / (GNU_MS > 0 ? GNU_MS : 1) ))% of GNU)"
+
+if cmp -s gnu_remaining.txt py_remaining.txt; then
+    echo "✅ Outputs are byte-identical ($(wc -l < py_remaining.txt) remaining lines)"
+    rm -f full.sorted partial.sorted
+    exit 0
+else
+    echo "❌ Outputs differ!"
+    exit 1
+fi
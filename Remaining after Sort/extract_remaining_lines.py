@@ -8,87 +8,938 @@ Description:
     3. remaining_list: The output file where the program writes lines that are in full_list
        (after sorting and removing duplicate lines) but not in partial_list (after the same processing).
 
+  Lists do not have to fit in RAM. Each list is sorted with an external merge sort:
+  lines are buffered up to a memory budget, sorted and de-duplicated, and spilled to
+  temporary "run" files, which are then merged lazily with heapq.merge. The difference
+  is computed in a single streaming pass over the two sorted lists, so memory stays
+  bounded by --max-memory regardless of input size.
+
+  With --preserve-order (alias --unsorted-output) nothing is sorted: the partial list is
+  streamed into a hash set, then the full list is streamed once and every line not seen
+  before is written in its original order. --hash-keys stores 64-bit hashes instead of
+  the lines themselves to cut memory on huge lists; --verify-collisions adds an
+  independent fingerprint so a hash collision is detected instead of dropping a line.
+
+  With --expr the same engine evaluates a set-algebra expression over any number of
+  inputs in one k-way merge pass over their sorted runs. Inputs are named A, B, C, ...
+  by position, or explicitly as NAME=PATH. Operators follow Python set precedence:
+  '-' (difference), '&' (intersection), '^' (symmetric difference), '|' (union), with
+  parentheses for grouping. The default three-argument form is the expression 'A - B'.
+
+  With --bytes lines are read, sorted and written as raw bytes: no UTF-8 decoding, no
+  newline translation, and the order is byte order, identical to `LC_ALL=C sort -u`.
+  In bytes mode --jobs N cuts each input into newline-aligned byte ranges and sorts them
+  into runs in N worker processes before the (single-process) merge.
+
+  Lines can be normalised before they are compared: --normalize applies any of crlf
+  (drop a trailing carriage return), strip (surrounding whitespace), casefold and nfc
+  (Unicode NFC) in the order given, and --key-regex then reduces each line to the
+  first capture group (or the whole match) of a pattern. Each line is normalised once,
+  as it is read. The output holds the normalised keys, or with --output-original the
+  original lines: the first occurrence with --preserve-order, otherwise the smallest
+  original line among those sharing a key.
+
+  For repeated runs against a slowly growing partial list, --partial-index PATH keeps
+  the partial list's keys in an SQLite table that is streamed back in sorted order (or
+  probed per line with --preserve-order) instead of re-sorting the list. Each run only
+  parses the lines appended since the previous one; the indexed prefix is re-read just
+  to check its SHA-256, and if the list was edited rather than appended to, the index
+  is rebuilt automatically.
+
 Usage:
   $ python extract_remaining_lines.py <full_list> <partial_list> <remaining_list>
-  
+        [--max-memory SIZE] [--temp-dir DIR]
+        [--preserve-order [--hash-keys [--verify-collisions]]] [--bytes [--jobs N]]
+        [--normalize crlf,strip,casefold,nfc] [--key-regex PATTERN [--output-original]]
+        [--partial-index PATH]
+  $ python extract_remaining_lines.py --expr 'A - (B | C | D)' -o <output> <A> <B> <C> <D>
+  $ python extract_remaining_lines.py --expr 'all - (spam | bounced)' -o <output>
+        all=<list> spam=<list> bounced=<list>
+
 If fewer than three parameters are provided, the script will print an intelligent error message and exit.
 """
 
-import sys
+import argparse
+import concurrent.futures
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import operator
 import os
+import re
+import sqlite3
+import string
+import sys
+import tempfile
+import unicodedata
+
+DEFAULT_MAX_MEMORY = "512M"
+LINE_OVERHEAD = 8  # List slot per buffered line, on top of sys.getsizeof(line)
+PAIR_OVERHEAD = 56  # (key, original) tuple holding a buffered line and its key
+PARALLEL_MEMORY_FACTOR = 3  # Worker peak memory per byte of range: raw data + split lines + slack
+MERGE_FAN_IN = 256  # Maximum run files merged at once (keeps open file handles bounded)
+INDEX_HASH_BLOCK = 1024 ** 2  # Read size when hashing the indexed prefix of the partial list
+MEMORY_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+NORMALIZERS = ("crlf", "strip", "casefold", "nfc")
+TEXT_ONLY_NORMALIZERS = ("casefold", "nfc")
+
+OPERATOR_PRECEDENCE = ("|", "^", "&", "-")  # Lowest to highest, as for Python sets
+TOKEN_PATTERN = re.compile(r"\s*(?:([A-Za-z_][A-Za-z0-9_]*)|([-|&^()]))")
+INPUT_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+_END = object()  # Sentinel for exhausted iterators (lines may be empty strings)
 
-def read_sort_and_deduplicate(file_path):
+
+def parse_memory_size(text):
+    """
+    Parses a memory budget such as '512M', '2G' or '1048576' into bytes.
     """
-    Reads the lines from the given file (assumed UTF-8 encoded),
-    sorts them in alphanumeric order (similar to Linux 'sort'),
-    and removes duplicates (keeping only the first occurrence from a sorted list).
+    value = text.strip().upper().removesuffix("B")
+    unit = value[-1:] if value[-1:] in MEMORY_UNITS else ""
+    number = value[:len(value) - len(unit)]
+    try:
+        size = int(float(number) * MEMORY_UNITS[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid memory size '{text}' (examples: 512M, 2G)")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"memory size must be positive, got '{text}'")
+    return size
 
-    Returns:
-        List of unique sorted lines.
+
+def parse_normalizers(text):
+    """
+    Parses a comma-separated list of normalisation steps such as 'crlf,strip,casefold'.
+    """
+    steps = [step.strip().lower() for step in text.split(",") if step.strip()]
+    unknown = [step for step in steps if step not in NORMALIZERS]
+    if unknown or not steps:
+        raise argparse.ArgumentTypeError(
+            f"invalid normaliser list '{text}' (choose from: {', '.join(NORMALIZERS)})"
+        )
+    return steps
+
+
+def read_lines(file_path, binary=False):
+    """
+    Yields the lines of the given file (assumed UTF-8 encoded, or raw bytes when
+    binary is True) without their trailing newline.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            # Read and remove newlines
-            lines = [line.rstrip("\n") for line in f.readlines()]
+        if binary:
+            with open(file_path, "rb") as f:
+                for line in f:
+                    yield line.rstrip(b"\n")
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n")
     except Exception as e:
         print(f"ERROR: Cannot read file '{file_path}'. Exception: {e}")
         sys.exit(1)
-    
-    # Sort lines in alphanumeric order
-    sorted_lines = sorted(lines)
-    
-    # Remove duplicate consecutive lines (after sort, duplicates are adjacent)
-    unique_lines = []
-    previous_line = None
-    for line in sorted_lines:
-        if line != previous_line:
-            unique_lines.append(line)
-            previous_line = line
-    return unique_lines
 
-def main():
-    # Check for the required three command-line parameters.
-    if len(sys.argv) < 4:
-        print("ERROR: Insufficient parameters provided.")
-        print("Usage: extract_remaining_lines.py <full_list> <partial_list> <remaining_list>")
-        sys.exit(1)
-    
-    full_list_path = sys.argv[1]
-    partial_list_path = sys.argv[2]
-    remaining_list_path = sys.argv[3]
-    
-    # Validate that full_list and partial_list exist and are files.
-    if not os.path.isfile(full_list_path):
-        print(f"ERROR: The file '{full_list_path}' does not exist or is not a valid file.")
-        sys.exit(1)
-    if not os.path.isfile(partial_list_path):
-        print(f"ERROR: The file '{partial_list_path}' does not exist or is not a valid file.")
+
+class LineFormat:
+    """
+    How lines are read, compared, spilled to run files and written out.
+
+    Lines are str (UTF-8) or, in binary mode, raw bytes. As each line is read it
+    is reduced once to its comparison key by the normalisation steps (in the
+    order given, then the optional key regex). A record is that key, or with
+    keep_original a (key, original line) pair so the original can be written
+    out in place of the key.
+    """
+
+    def __init__(self, binary=False, normalize=(), key_regex=None, keep_original=False):
+        self.binary = binary
+        self.newline = b"\n" if binary else "\n"
+        self.steps = list(normalize)
+        self.key_regex = key_regex
+        self._steps = []
+        for step in normalize:
+            if step == "crlf":
+                self._steps.append(operator.methodcaller("rstrip", b"\r" if binary else "\r"))
+            elif step == "strip":
+                self._steps.append(bytes.strip if binary else str.strip)
+            elif step == "casefold":
+                self._steps.append(str.casefold)
+            elif step == "nfc":
+                self._steps.append(functools.partial(unicodedata.normalize, "NFC"))
+        self._key_pattern = None
+        if key_regex is not None:
+            self._key_pattern = re.compile(key_regex.encode("utf-8") if binary else key_regex)
+            self._key_group = 1 if self._key_pattern.groups else 0
+            self._steps.append(self._extract_key)
+        self.normalizing = bool(self._steps)
+        self.paired = keep_original and self.normalizing
+
+    def _extract_key(self, line):
+        """Key regex step: first capture group (or whole match); unmatched lines keep the whole line."""
+        match = self._key_pattern.search(line)
+        key = match.group(self._key_group) if match else None
+        return line if key is None else key
+
+    def to_key(self, line):
+        for step in self._steps:
+            line = step(line)
+        return line
+
+    def records(self, lines):
+        """Turns raw lines into records."""
+        if not self.normalizing:
+            return lines
+        if self.paired:
+            return ((self.to_key(line), line) for line in lines)
+        return map(self.to_key, lines)
+
+    def read_records(self, file_path):
+        return self.records(read_lines(file_path, self.binary))
+
+    def key(self, record):
+        return record[0] if self.paired else record
+
+    def output(self, record):
+        return record[1] if self.paired else record
+
+    def record_size(self, record):
+        """Estimated resident size of a buffered record, in bytes."""
+        if self.paired:
+            return sys.getsizeof(record[0]) + sys.getsizeof(record[1]) + PAIR_OVERHEAD + LINE_OVERHEAD
+        return sys.getsizeof(record) + LINE_OVERHEAD
+
+    def open(self, file, mode):
+        """Opens a run file as UTF-8 text with '\\n'-only line endings, or as raw bytes."""
+        if self.binary:
+            return open(file, mode + "b")
+        return open(file, mode, encoding="utf-8", newline="\n")
+
+    def write_records(self, run_file, records):
+        """Writes records to a run file; a pair takes two lines (key, then original)."""
+        newline = self.newline
+        if self.paired:
+            run_file.writelines(key + newline + original + newline for key, original in records)
+        else:
+            run_file.writelines(record + newline for record in records)
+
+    def read_run(self, run_path):
+        """Yields the records of a run file."""
+        with self.open(run_path, "r") as run_file:
+            if self.paired:
+                for key in run_file:
+                    yield key[:-1], next(run_file)[:-1]
+            else:
+                for line in run_file:
+                    yield line[:-1]
+
+
+def unique_sorted(records, paired=False):
+    """
+    Yields each record of a sorted iterable once (duplicates are adjacent after sorting).
+
+    Paired (key, original) records are de-duplicated on the key alone, keeping the
+    first, i.e. the one with the smallest original line.
+    """
+    previous = _END
+    if paired:
+        for record in records:
+            if record[0] != previous:
+                yield record
+                previous = record[0]
+    else:
+        for record in records:
+            if record != previous:
+                yield record
+                previous = record
+
+
+def write_sorted_run(records, run_dir, fmt):
+    """
+    Sorts the buffered records in place, de-duplicates them and writes them to a new run file.
+
+    Returns:
+        Path of the run file.
+    """
+    records.sort()
+    fd, run_path = tempfile.mkstemp(dir=run_dir, suffix=".run")
+    with fmt.open(fd, "w") as run_file:
+        fmt.write_records(run_file, unique_sorted(records, fmt.paired))
+    return run_path
+
+
+def merge_runs(run_paths, run_dir, fmt):
+    """
+    Lazily merges sorted run files into one sorted, de-duplicated stream.
+
+    More than MERGE_FAN_IN runs are first merged in groups into intermediate runs.
+    """
+    while len(run_paths) > MERGE_FAN_IN:
+        merged_paths = []
+        for start in range(0, len(run_paths), MERGE_FAN_IN):
+            group = run_paths[start:start + MERGE_FAN_IN]
+            fd, merged_path = tempfile.mkstemp(dir=run_dir, suffix=".run")
+            with fmt.open(fd, "w") as merged_file:
+                merged = heapq.merge(*(fmt.read_run(path) for path in group))
+                fmt.write_records(merged_file, unique_sorted(merged, fmt.paired))
+            for path in group:
+                os.remove(path)
+            merged_paths.append(merged_path)
+        run_paths = merged_paths
+    return unique_sorted(heapq.merge(*(fmt.read_run(path) for path in run_paths)), fmt.paired)
+
+
+def sort_byte_range(file_path, start, end, run_dir, fmt):
+    """
+    Worker task: sorts and de-duplicates the raw lines in file_path[start:end]
+    and writes them to a new run file. The range must start and end on line
+    boundaries.
+
+    Returns:
+        Path of the run file.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.split(b"\n")
+    if data.endswith(b"\n"):
+        lines.pop()  # Empty string after the final newline, not a line
+    del data
+    if fmt.normalizing:
+        lines = list(fmt.records(lines))
+    return write_sorted_run(lines, run_dir, fmt)
+
+
+def line_aligned_ranges(file_path, range_bytes):
+    """
+    Splits a file into consecutive byte ranges of about range_bytes each,
+    extending every range to the end of the line it stops in.
+    """
+    file_size = os.path.getsize(file_path)
+    start = 0
+    with open(file_path, "rb") as f:
+        while start < file_size:
+            f.seek(min(start + range_bytes, file_size))
+            end = f.tell() + len(f.readline())
+            yield start, end
+            start = end
+
+
+def parallel_sort(file_path, max_memory, run_dir, jobs, fmt):
+    """
+    Generates sorted runs for a raw-bytes file in `jobs` worker processes.
+
+    Each worker sorts one newline-aligned byte range into one run; ranges are
+    sized so that `jobs` concurrent workers stay within max_memory.
+
+    Returns:
+        (iterator of unique sorted records, number of run files written)
+    """
+    range_bytes = max(max_memory // (jobs * PARALLEL_MEMORY_FACTOR), 1)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(sort_byte_range, file_path, start, end, run_dir, fmt)
+                for start, end in line_aligned_ranges(file_path, range_bytes)
+            ]
+            run_paths = [future.result() for future in futures]
+    except Exception as e:
+        print(f"ERROR: Cannot sort file '{file_path}'. Exception: {e}")
         sys.exit(1)
-    
-    print("INFO: Both input files exist. Beginning to process files...")
-    
-    # Process the full_list file.
-    full_unique_lines = read_sort_and_deduplicate(full_list_path)
-    print(f"INFO: Processed '{full_list_path}' with {len(full_unique_lines)} unique sorted lines.")
-    
-    # Process the partial_list file.
-    partial_unique_lines = read_sort_and_deduplicate(partial_list_path)
-    print(f"INFO: Processed '{partial_list_path}' with {len(partial_unique_lines)} unique sorted lines.")
-    
-    # Compute the difference: lines in full_unique_lines but not in partial_unique_lines.
-    partial_set = set(partial_unique_lines)
-    remaining_lines = [line for line in full_unique_lines if line not in partial_set]
-    print(f"INFO: Found {len(remaining_lines)} lines in '{full_list_path}' that are not in '{partial_list_path}'.")
-    
-    # Write the remaining lines to the output file.
+    return merge_runs(run_paths, run_dir, fmt), len(run_paths)
+
+
+def external_sort(file_path, max_memory, run_dir, fmt):
+    """
+    Reads the lines from the given file (assumed UTF-8 encoded, or raw bytes in
+    binary mode) and sorts their keys in alphanumeric order (similar to Linux
+    'sort'; byte order in binary mode, like `LC_ALL=C sort`), removing duplicates.
+
+    Records are buffered until their estimated size reaches max_memory bytes,
+    then sorted and spilled to a run file in run_dir. A file that fits in the
+    budget never touches the disk.
+
+    Returns:
+        (iterator of unique sorted records, number of run files written)
+    """
+    run_paths = []
+    buffered = []
+    buffered_bytes = 0
+    for record in fmt.read_records(file_path):
+        buffered.append(record)
+        buffered_bytes += fmt.record_size(record)
+        if buffered_bytes >= max_memory:
+            run_paths.append(write_sorted_run(buffered, run_dir, fmt))
+            buffered = []
+            buffered_bytes = 0
+
+    if not run_paths:
+        buffered.sort()
+        return unique_sorted(buffered, fmt.paired), 0
+    if buffered:
+        run_paths.append(write_sorted_run(buffered, run_dir, fmt))
+    return merge_runs(run_paths, run_dir, fmt), len(run_paths)
+
+
+class CountingIterator:
+    """
+    Wraps an iterator and counts the items taken from it.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._iterator)
+        self.count += 1
+        return item
+
+
+def tokenize_expression(text):
+    """
+    Splits a set expression into name and operator tokens.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ValueError(f"unexpected character {text[position:].lstrip()[:1]!r} at position {position}")
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+    return tokens
+
+
+def parse_expression(text):
+    """
+    Parses a set expression such as 'A - (B | C | D)' into a tree of
+    ("name", NAME) leaves and (OPERATOR, left, right) nodes.
+
+    Operators are left-associative and bind like Python set operators:
+    '-' tightest, then '&', then '^', then '|'.
+    """
+    tokens = tokenize_expression(text)
+    position = 0
+
+    def parse_level(level):
+        nonlocal position
+        if level == len(OPERATOR_PRECEDENCE):
+            return parse_atom()
+        node = parse_level(level + 1)
+        while position < len(tokens) and tokens[position] == OPERATOR_PRECEDENCE[level]:
+            position += 1
+            node = (OPERATOR_PRECEDENCE[level], node, parse_level(level + 1))
+        return node
+
+    def parse_atom():
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError("unexpected end of expression")
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            node = parse_level(0)
+            if position >= len(tokens) or tokens[position] != ")":
+                raise ValueError("missing ')'")
+            position += 1
+            return node
+        if INPUT_NAME_PATTERN.fullmatch(token):
+            return ("name", token)
+        raise ValueError(f"unexpected {token!r}")
+
+    tree = parse_level(0)
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position]!r}")
+    return tree
+
+
+def expression_names(tree):
+    """
+    Returns the set of input names referenced by an expression tree.
+    """
+    if tree[0] == "name":
+        return {tree[1]}
+    return expression_names(tree[1]) | expression_names(tree[2])
+
+
+def compile_predicate(tree, bits):
+    """
+    Turns an expression tree into a function of a membership bitmask.
+
+    bits maps each input name to its bit; the returned function is True when a
+    line present in exactly the inputs set in the mask belongs to the result.
+    Results are cached per mask, since only a handful of masks ever occur.
+    """
+    def build(node):
+        if node[0] == "name":
+            bit = bits[node[1]]
+            return lambda mask: mask & bit != 0
+        symbol, left, right = node[0], build(node[1]), build(node[2])
+        if symbol == "|":
+            return lambda mask: left(mask) or right(mask)
+        if symbol == "&":
+            return lambda mask: left(mask) and right(mask)
+        if symbol == "^":
+            return lambda mask: left(mask) != right(mask)
+        return lambda mask: left(mask) and not right(mask)
+
+    return functools.lru_cache(maxsize=None)(build(tree))
+
+
+def evaluate_sorted(streams, predicate, paired=False):
+    """
+    Yields the records selected by predicate from several sorted, de-duplicated streams.
+
+    All streams are consumed together in a single k-way merge; the records equal to
+    each other arrive adjacently, so their membership bitmask (bit i set when the
+    record is in streams[i]) is complete once the next distinct record shows up.
+    Paired (key, original) records are compared on the key alone.
+    """
+    tagged = (zip(stream, itertools.repeat(1 << index)) for index, stream in enumerate(streams))
+    current = _END
+    current_key = _END
+    mask = 0
+    for record, bit in heapq.merge(*tagged):
+        key = record[0] if paired else record
+        if key == current_key:
+            mask |= bit
+            continue
+        if current is not _END and predicate(mask):
+            yield current
+        current = record
+        current_key = key
+        mask = bit
+    if current is not _END and predicate(mask):
+        yield current
+
+
+def name_inputs(arguments):
+    """
+    Assigns names to input arguments: NAME=PATH keeps its name, a bare path is
+    named by position (A, B, C, ...).
+
+    Returns:
+        Dict of name -> path, in argument order.
+    """
+    inputs = {}
+    for index, argument in enumerate(arguments):
+        name, separator, path = argument.partition("=")
+        if not separator or not INPUT_NAME_PATTERN.fullmatch(name):
+            if index >= len(string.ascii_uppercase):
+                raise ValueError(f"more than 26 inputs: name '{argument}' explicitly as NAME=PATH")
+            name, path = string.ascii_uppercase[index], argument
+        if name in inputs:
+            raise ValueError(f"input name '{name}' is used more than once")
+        inputs[name] = path
+    return inputs
+
+
+class SeenSet:
+    """
+    Membership set for the order-preserving mode.
+
+    Stores lines as-is, or with hash_keys=True only their 64-bit hash(), which
+    is a fraction of the size of a str object. With verify=True each key also
+    carries an independent 64-bit BLAKE2b fingerprint: a key match with a
+    different fingerprint is a detected collision, and the colliding lines fall
+    back to exact string membership instead of being silently dropped.
+    """
+
+    def __init__(self, hash_keys=False, verify=False):
+        self.hash_keys = hash_keys or verify
+        self.verify = verify
+        self.collisions = 0
+        self._keys = {} if verify else set()
+        self._collided = set()
+
+    def __len__(self):
+        return len(self._keys) + len(self._collided)
+
+    def add(self, line):
+        """
+        Adds a line to the set.
+
+        Returns:
+            True if the line was not in the set before.
+        """
+        key = hash(line) if self.hash_keys else line
+        if not self.verify:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
+        data = line if isinstance(line, bytes) else line.encode("utf-8")
+        fingerprint = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+        stored = self._keys.get(key)
+        if stored is None:
+            self._keys[key] = fingerprint
+            return True
+        if stored == fingerprint or line in self._collided:
+            return False
+        self.collisions += 1
+        self._collided.add(line)
+        return True
+
+
+class PartialIndex:
+    """
+    Persistent, incrementally updated index of the partial list's keys.
+
+    Keys live in an SQLite WITHOUT ROWID table, i.e. a B-tree ordered by key, so
+    they can be streamed back in sorted order (SQLite compares UTF-8 text and
+    blobs bytewise, which matches Python's str and bytes order) or probed one at
+    a time. The meta table records how much of the partial list is indexed, the
+    SHA-256 of that prefix and the number of keys; when the prefix still hashes
+    the same, just the appended lines are parsed and inserted. Any other change
+    (edited, rewritten or truncated file, different path or normalisation)
+    rebuilds the index from scratch.
+    """
+
+    def __init__(self, index_path, fmt):
+        self.fmt = fmt
+        self.format = json.dumps({
+            "binary": fmt.binary, "steps": fmt.steps, "key_regex": fmt.key_regex,
+        })
+        self._db = sqlite3.connect(index_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS keys (key PRIMARY KEY) WITHOUT ROWID")
+        self.count = 0  # Unique keys in the index, kept in the meta table by update()
+
+    def __contains__(self, key):
+        return self._db.execute("SELECT 1 FROM keys WHERE key = ?", (key,)).fetchone() is not None
+
+    def close(self):
+        self._db.close()
+
+    @staticmethod
+    def _hash_range(f, digest, start, end):
+        """Feeds f[start:end] into digest."""
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(remaining, INDEX_HASH_BLOCK))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+
+    def _reusable_offset(self, f, source, size, digest):
+        """
+        Hashes the indexed prefix of f into digest.
+
+        Returns:
+            (byte offset up to which the existing index still matches the file, or 0
+            if it has to be rebuilt; number of keys in the existing index)
+        """
+        meta = dict(self._db.execute("SELECT name, value FROM meta"))
+        offset, count = meta.get("offset", 0), meta.get("count")
+        if count is None:  # Empty, or written by a version that did not record a count
+            return 0, self._db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        if (meta.get("format") != self.format or meta.get("source") != source
+                or offset > size or (offset < size and not meta.get("terminated"))):
+            return 0, count
+        self._hash_range(f, digest, 0, offset)
+        if digest.hexdigest() != meta.get("sha256"):
+            return 0, count
+        return offset, count
+
+    def update(self, partial_path):
+        """
+        Brings the index up to date with partial_path, reading only lines
+        appended since the last update when possible.
+
+        Returns:
+            (number of lines read, True if the index was rebuilt)
+        """
+        source = os.path.abspath(partial_path)
+        digest = hashlib.sha256()
+        with open(partial_path, "rb") as f, self._db:
+            offset, previous_count = self._reusable_offset(f, source, os.fstat(f.fileno()).st_size, digest)
+            rebuilt = offset == 0 and previous_count > 0
+            if offset == 0:
+                self._db.execute("DELETE FROM keys")
+                digest = hashlib.sha256()
+                previous_count = 0
+
+            f.seek(offset)
+            lines = f if self.fmt.binary else io.TextIOWrapper(f, encoding="utf-8")
+            newline = self.fmt.newline
+            delta = CountingIterator(self.fmt.to_key(line.rstrip(newline)) for line in lines)
+            inserted = self._db.executemany("INSERT OR IGNORE INTO keys VALUES (?)", ((key,) for key in delta))
+            if lines is not f:
+                lines.detach()
+
+            end = f.tell()
+            self._hash_range(f, digest, offset, end)  # Extend the prefix hash over the appended lines
+            f.seek(max(end - 1, 0))
+            terminated = end == 0 or f.read(1) == b"\n"
+            self.count = previous_count + inserted.rowcount
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("format", self.format), ("source", source), ("offset", end), ("terminated", terminated),
+                ("sha256", digest.hexdigest()), ("count", self.count),
+            ])
+        return delta.count, rebuilt
+
+    def sorted_keys(self):
+        """Yields the indexed keys in sorted order."""
+        for (key,) in self._db.execute("SELECT key FROM keys ORDER BY key"):
+            yield key
+
+
+def ordered_difference(full_records, partial_records, seen, fmt):
+    """
+    Yields records of full_records whose key is not in partial_records,
+    de-duplicated, in their original order of first appearance.
+
+    The partial list is loaded into seen first; the full list is then streamed once.
+    """
+    for record in partial_records:
+        seen.add(fmt.key(record))
+    for record in full_records:
+        if seen.add(fmt.key(record)):
+            yield record
+
+
+def indexed_difference(full_records, index, seen, fmt):
+    """
+    Like ordered_difference, but probes a PartialIndex instead of loading the
+    partial list into memory; seen only holds the keys of the full list.
+    """
+    for record in full_records:
+        key = fmt.key(record)
+        if key not in index and seen.add(key):
+            yield record
+
+
+def write_lines(records, output_path, fmt):
+    """
+    Writes records to output_path, one line each (the original line for paired records).
+
+    Returns:
+        Number of lines written.
+    """
+    written = 0
+    newline = fmt.newline
     try:
-        with open(remaining_list_path, "w", encoding="utf-8") as outfile:
-            for line in remaining_lines:
-                outfile.write(line + "\n")
-        print(f"SUCCESS: Remaining lines have been successfully written to '{remaining_list_path}'.")
+        with (open(output_path, "wb") if fmt.binary else open(output_path, "w", encoding="utf-8")) as outfile:
+            for record in records:
+                outfile.write(fmt.output(record) + newline)
+                written += 1
     except Exception as e:
-        print(f"ERROR: Failed to write to '{remaining_list_path}'. Exception: {e}")
+        print(f"ERROR: Failed to write to '{output_path}'. Exception: {e}")
         sys.exit(1)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write the lines of full_list that are not in partial_list "
+                    "(both sorted and de-duplicated) to remaining_list, or evaluate "
+                    "a set expression over several lists with --expr."
+    )
+    parser.add_argument(
+        "paths", nargs="+", metavar="PATH",
+        help="full_list partial_list remaining_list; with --expr, the input lists "
+             "(bare paths are named A, B, C, ... or use NAME=PATH)"
+    )
+    parser.add_argument(
+        "--expr", metavar="EXPRESSION",
+        help="Set expression over the inputs, e.g. 'A - (B | C | D)'; "
+             "operators: - & ^ | and parentheses"
+    )
+    parser.add_argument(
+        "--output", "-o", metavar="PATH",
+        help="Output file for --expr results"
+    )
+    parser.add_argument(
+        "--max-memory", type=parse_memory_size, default=DEFAULT_MAX_MEMORY, metavar="SIZE",
+        help=f"Memory budget for buffered lines, e.g. 256M or 4G (default: {DEFAULT_MAX_MEMORY})"
+    )
+    parser.add_argument(
+        "--temp-dir", default=None, metavar="DIR",
+        help="Directory for sorted run files (default: system temp directory)"
+    )
+    parser.add_argument(
+        "--preserve-order", "--unsorted-output", dest="preserve_order", action="store_true",
+        help="Skip sorting: hash the partial list, stream the full list once and keep "
+             "first occurrences in their original order"
+    )
+    parser.add_argument(
+        "--hash-keys", action="store_true",
+        help="With --preserve-order, store 64-bit line hashes instead of the lines"
+    )
+    parser.add_argument(
+        "--verify-collisions", action="store_true",
+        help="With --hash-keys, also keep a 64-bit fingerprint per key so collisions are "
+             "detected and resolved exactly (implies --hash-keys)"
+    )
+    parser.add_argument(
+        "--bytes", dest="binary", action="store_true",
+        help="Compare raw byte lines without decoding; sort order matches `LC_ALL=C sort`"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1, metavar="N",
+        help="With --bytes, generate sorted runs in N worker processes (default: 1)"
+    )
+    parser.add_argument(
+        "--normalize", type=parse_normalizers, default=[], metavar="STEPS",
+        help=f"Comma-separated normalisation applied to every line before comparing, "
+             f"in order: {', '.join(NORMALIZERS)}"
+    )
+    parser.add_argument(
+        "--key-regex", metavar="PATTERN",
+        help="Compare only the first capture group (or whole match) of PATTERN; "
+             "lines that do not match are compared whole"
+    )
+    parser.add_argument(
+        "--output-original", action="store_true",
+        help="Write the original lines instead of their normalised keys"
+    )
+    parser.add_argument(
+        "--partial-index", metavar="PATH",
+        help="SQLite index of partial_list's keys, created on first use and then updated "
+             "with only the lines appended since the previous run"
+    )
+    args = parser.parse_args()
+    if (args.hash_keys or args.verify_collisions) and not args.preserve_order:
+        parser.error("--hash-keys and --verify-collisions require --preserve-order")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.jobs > 1 and not args.binary:
+        parser.error("--jobs requires --bytes")
+    if args.jobs > 1 and args.preserve_order:
+        parser.error("--jobs does not apply to --preserve-order (nothing is sorted)")
+    if args.binary and set(args.normalize) & set(TEXT_ONLY_NORMALIZERS):
+        parser.error(f"--normalize {'/'.join(TEXT_ONLY_NORMALIZERS)} require decoded text (drop --bytes)")
+    if args.output_original and not (args.normalize or args.key_regex):
+        parser.error("--output-original requires --normalize or --key-regex")
+    try:
+        fmt = LineFormat(args.binary, args.normalize, args.key_regex, args.output_original)
+    except re.error as e:
+        parser.error(f"invalid --key-regex: {e}")
+
+    if args.expr is None:
+        # Classic form: full_list partial_list remaining_list, i.e. 'A - B'.
+        if len(args.paths) != 3:
+            print("ERROR: Insufficient parameters provided." if len(args.paths) < 3
+                  else "ERROR: Too many parameters provided (use --expr for more than two lists).")
+            print("Usage: extract_remaining_lines.py <full_list> <partial_list> <remaining_list>")
+            sys.exit(1)
+        if args.output:
+            parser.error("--output is only used with --expr")
+        full_list_path, partial_list_path, output_path = args.paths
+        if args.partial_index and os.path.abspath(args.partial_index) in map(os.path.abspath, args.paths):
+            parser.error("--partial-index must not be one of the list files")
+        inputs = {"A": full_list_path, "B": partial_list_path}
+        tree = parse_expression("A - B")
+    else:
+        if not args.output:
+            parser.error("--expr requires --output")
+        if args.preserve_order:
+            parser.error("--preserve-order only supports the two-list difference")
+        if args.partial_index:
+            parser.error("--partial-index only supports the two-list difference")
+        output_path = args.output
+        try:
+            inputs = name_inputs(args.paths)
+            tree = parse_expression(args.expr)
+        except ValueError as e:
+            print(f"ERROR: Invalid expression or inputs: {e}")
+            sys.exit(1)
+        unknown = expression_names(tree) - inputs.keys()
+        if unknown:
+            print(f"ERROR: Expression refers to undefined input(s): {', '.join(sorted(unknown))}")
+            sys.exit(1)
+        for name in inputs.keys() - expression_names(tree):
+            print(f"WARNING: Input {name}='{inputs.pop(name)}' is not used by the expression; skipping it.")
+
+    # Validate that every input exists and is a file.
+    for path in inputs.values():
+        if not os.path.isfile(path):
+            print(f"ERROR: The file '{path}' does not exist or is not a valid file.")
+            sys.exit(1)
+
+    print(f"INFO: All {len(inputs)} input files exist. Beginning to process files...")
+
+    partial_index = None
+    if args.partial_index:
+        try:
+            partial_index = PartialIndex(args.partial_index, fmt)
+            delta_count, rebuilt = partial_index.update(partial_list_path)
+        except (sqlite3.Error, OSError, UnicodeDecodeError) as e:
+            print(f"ERROR: Cannot update partial index '{args.partial_index}'. Exception: {e}")
+            sys.exit(1)
+        print(f"INFO: {'Rebuilt' if rebuilt else 'Updated'} partial index '{args.partial_index}' "
+              f"with {delta_count} new line(s) from '{partial_list_path}' ({partial_index.count} unique keys).")
+
+    if args.preserve_order:
+        seen = SeenSet(args.hash_keys, args.verify_collisions)
+        full_lines = CountingIterator(fmt.read_records(full_list_path))
+        if partial_index is not None:
+            remaining_count = write_lines(
+                indexed_difference(full_lines, partial_index, seen, fmt), output_path, fmt
+            )
+            partial_index.close()
+        else:
+            partial_lines = CountingIterator(fmt.read_records(partial_list_path))
+            remaining_count = write_lines(
+                ordered_difference(full_lines, partial_lines, seen, fmt), output_path, fmt
+            )
+            print(f"INFO: Processed '{partial_list_path}' with {partial_lines.count} lines "
+                  f"({'hashed' if seen.hash_keys else 'exact'} keys).")
+
+        print(f"INFO: Processed '{full_list_path}' with {full_lines.count} lines in original order.")
+        if seen.collisions:
+            print(f"WARNING: Detected and resolved {seen.collisions} hash collision(s).")
+        print(f"INFO: Found {remaining_count} lines in '{full_list_path}' that are not in '{partial_list_path}'.")
+        print(f"SUCCESS: Remaining lines have been successfully written to '{output_path}'.")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="extract_remaining_", dir=args.temp_dir) as run_dir:
+        # All inputs are merged at the same time, so they share the budget.
+        # Parallel sorting spills everything to runs, so each input may use all of it.
+        # An indexed partial list is read back already sorted and needs none.
+        sorted_inputs = len(inputs) - (partial_index is not None)
+        input_budget = args.max_memory if args.jobs > 1 else args.max_memory // sorted_inputs
+
+        labels = [f"{name}='{path}'" if args.expr else f"'{path}'" for name, path in inputs.items()]
+        streams = []
+        for label, path in zip(labels, inputs.values()):
+            if partial_index is not None and path == partial_list_path:
+                keys = partial_index.sorted_keys()
+                streams.append(CountingIterator(((key, key) for key in keys) if fmt.paired else keys))
+                continue
+            if args.jobs > 1:
+                sorted_lines, run_count = parallel_sort(path, input_budget, run_dir, args.jobs, fmt)
+            else:
+                sorted_lines, run_count = external_sort(path, input_budget, run_dir, fmt)
+            print(f"INFO: Sorted {label} ({run_count} run file(s) spilled to disk).")
+            streams.append(CountingIterator(sorted_lines))
+
+        # One streaming k-way merge evaluates the whole expression.
+        bits = {name: 1 << index for index, name in enumerate(inputs)}
+        predicate = compile_predicate(tree, bits)
+        result_count = write_lines(evaluate_sorted(streams, predicate, fmt.paired), output_path, fmt)
+        if partial_index is not None:
+            partial_index.close()
+
+    for label, stream in zip(labels, streams):
+        print(f"INFO: Processed {label} with {stream.count} unique sorted lines.")
+    if args.expr is None:
+        print(f"INFO: Found {result_count} lines in '{full_list_path}' that are not in '{partial_list_path}'.")
+        print(f"SUCCESS: Remaining lines have been successfully written to '{output_path}'.")
+    else:
+        print(f"INFO: Expression '{args.expr}' selected {result_count} lines.")
+        print(f"SUCCESS: Result has been successfully written to '{output_path}'.")
 
 if __name__ == "__main__":
     main()